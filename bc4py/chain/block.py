@@ -1,6 +1,7 @@
 from bc4py import __block_version__
 from bc4py.config import C, V
 from bc4py.chain.utils import DEFAULT_TARGET, bits2target
+from bc4py.chain.tx import LazyTX
 from bc4py.database import obj
 from bc4py_extension import sha256d_hash, merkleroot_hash
 from logging import getLogger
@@ -205,7 +206,7 @@ class Block(object):
 
     @property
     def recode_flag(self) -> str:
-        if self in obj.chain_builder.best_chain:
+        if obj.chain_builder.is_best_block(self):
             return "memory"
         elif self.hash in obj.chain_builder.chain:
             return "orphan"
@@ -214,7 +215,7 @@ class Block(object):
 
     @property
     def is_orphan(self) -> bool:
-        if self in obj.chain_builder.best_chain:
+        if obj.chain_builder.is_best_block(self):
             return False
         elif self.hash in obj.chain_builder.chain:
             return True
@@ -258,8 +259,33 @@ class Block(object):
         self.serialize()
 
 
+class LazyBlock(Block):
+    """Block read from database, txs are decoded on first access"""
+    __slots__ = ("raw_txs",)
+
+    def __init__(self):
+        # [(b_tx, b_sign, R),..] not decoded yet
+        self.raw_txs = None
+        super().__init__()
+
+    @property
+    def txs(self):
+        if self.raw_txs is not None:
+            raw_txs = self.raw_txs
+            self.raw_txs = None
+            Block.txs.__set__(self, [
+                LazyTX.from_database(b_tx, b_sign, R, self.height) for b_tx, b_sign, R in raw_txs])
+        return Block.txs.__get__(self, Block)
+
+    @txs.setter
+    def txs(self, value):
+        self.raw_txs = None
+        Block.txs.__set__(self, value)
+
+
 __all__ = [
     "BlockHeader",
     "get_block_header_from_bin",
     "Block",
+    "LazyBlock",
 ]
@@ -1,9 +1,12 @@
 from bc4py.config import V, stream, BlockChainError
 from bc4py.chain.checking.checkblock import check_block, check_block_time
 from bc4py.chain.checking.checktx import check_tx, check_tx_time
+from bc4py.chain.checking.context import ValidationContext
+from bc4py.chain.checking.admission import tx_admission, new_insert_tx
 from bc4py.chain.signature import fill_verified_addr_single
 from bc4py.database import obj
 from bc4py.database.create import create_db
+from bc4py.for_debug import block_accept_latency
 from logging import getLogger
 from time import time
 import asyncio
@@ -11,6 +14,8 @@ import asyncio
 new_block_lock = asyncio.Lock()
 log = getLogger('bc4py')
 
+SLOW_ACCEPT_TIME = 1.0  # Sec
+
 
 async def new_insert_block(block, f_time=True, f_sign=True):
     t = time()
@@ -29,8 +34,11 @@ async def new_insert_block(block, f_time=True, f_sign=True):
             check_block(block)
             if f_sign:
                 await fill_verified_addr_single(block)
+            # inputs of all txs are resolved by one pass
+            ctx = ValidationContext(include_block=block)
+            ctx.prefetch(block.txs)
             for tx in block.txs:
-                check_tx(tx=tx, include_block=block)
+                check_tx(tx=tx, include_block=block, ctx=ctx)
                 if f_time:
                     check_tx_time(tx)
             # Recode
@@ -40,11 +48,13 @@ async def new_insert_block(block, f_time=True, f_sign=True):
                 for tx in block.txs:
                     await obj.account_builder.affect_new_tx(cur=cur, tx=tx)
                 await db.commit()
-            # insert database
-            await obj.chain_builder.batch_apply()
+            # insert database on background, wait only when flush is behind
+            obj.chain_builder.schedule_batch_apply()
+            await obj.chain_builder.wait_for_flush()
             # inner streaming
             if not stream.is_disposed:
                 stream.on_next(block)
+            block_accept_latency.add(time() - t, SLOW_ACCEPT_TIME)
             log.info("check success {}Sec {}".format(round(time() - t, 3), block))
             return True
         except BlockChainError as e:
@@ -59,8 +69,11 @@ async def new_insert_block(block, f_time=True, f_sign=True):
 
 __all__ = [
     "new_insert_block",
+    "new_insert_tx",
+    "tx_admission",
     "check_block",
     "check_block_time",
     "check_tx",
     "check_tx_time",
+    "ValidationContext",
 ]
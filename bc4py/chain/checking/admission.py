@@ -0,0 +1,145 @@
+from bc4py.config import C, V, BlockChainError
+from bc4py.chain.checking.checktx import check_tx, check_tx_time
+from bc4py.chain.checking.context import ValidationContext
+from bc4py.chain.signature import fill_verified_addr_txs
+from bc4py.database import obj
+from bc4py.database.create import create_db
+from logging import getLogger
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+from time import time
+import asyncio
+
+log = getLogger('bc4py')
+
+"""
+mempool admission
+====
+incoming txs are collected for a few milliseconds and admitted by one batch
+signatures by one `verify_auto_multi` call, checks by one validation context (conflicts in batch are found by it)
+accepted txs are pushed to memory pool in order, account movements are committed by one SQLite transaction
+"""
+
+if TYPE_CHECKING:
+    from bc4py.chain.tx import TX
+
+ADMISSION_WAIT = 0.005  # Sec to collect txs
+ADMISSION_MAX_TXS = 500  # txs of one batch
+
+
+class TxAdmission(object):
+
+    def __init__(self, wait=ADMISSION_WAIT, max_txs=ADMISSION_MAX_TXS):
+        self.wait = wait
+        self.max_txs = max_txs
+        self.queue: List[Tuple['TX', asyncio.Future]] = list()
+        self.full = asyncio.Event()
+        self.worker: Optional[asyncio.Future] = None
+        self.batches = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.admit_time = 0.0
+
+    def __repr__(self):
+        return "<TxAdmission queue={} batches={} accepted={} rejected={}>".format(
+            len(self.queue), self.batches, self.accepted, self.rejected)
+
+    async def put(self, tx: 'TX') -> bool:
+        """wait for admission of the batch, raise the reason if rejected"""
+        future = asyncio.get_event_loop().create_future()
+        self.queue.append((tx, future))
+        if self.max_txs <= len(self.queue):
+            self.full.set()
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.ensure_future(self.flush_loop())
+        return await future
+
+    async def flush_loop(self):
+        while len(self.queue) > 0:
+            try:
+                await asyncio.wait_for(self.full.wait(), self.wait)
+            except asyncio.TimeoutError:
+                pass
+            batch, self.queue = self.queue[:self.max_txs], self.queue[self.max_txs:]
+            if len(self.queue) < self.max_txs:
+                self.full.clear()
+            try:
+                results = await self.admit([tx for tx, _future in batch])
+            except Exception as e:
+                log.error("tx admission exception", exc_info=True)
+                results = [e] * len(batch)
+            for (_tx, future), result in zip(batch, results):
+                if future.done():
+                    continue  # caller is canceled
+                elif isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def admit(self, txs: List['TX']) -> List[Union[bool, Exception]]:
+        """True if accepted, False if already unconfirmed or chained"""
+        t = time()
+        results: List[Union[bool, Exception]] = [False] * len(txs)
+        checked = list()
+        for index, tx in enumerate(txs):
+            try:
+                check_tx_time(tx)
+                if tx.type == C.TX_POS_REWARD or not all(isinstance(sign, tuple) for sign in tx.signature):
+                    raise BlockChainError('not allowed tx format {}'.format(tx))
+                checked.append(tx)
+            except Exception as e:
+                results[index] = e
+        # verify signatures of all txs
+        await fill_verified_addr_txs(checked)
+        # check by one context, loop is not released until pushed to memory pool
+        ctx = ValidationContext()
+        ctx.prefetch(checked)
+        accepted = list()
+        for index, tx in enumerate(txs):
+            if isinstance(results[index], Exception):
+                continue
+            try:
+                check_tx(tx=tx, include_block=None, ctx=ctx)
+                if obj.tx_builder.add_unconfirmed(tx):
+                    ctx.add_unconfirmed(tx)
+                    accepted.append(tx)
+                    results[index] = True
+            except Exception as e:
+                ctx.release(tx)
+                results[index] = e
+        # account movements
+        if len(accepted) > 0:
+            async with create_db(V.DB_ACCOUNT_PATH) as db:
+                cur = await db.cursor()
+                for tx in accepted:
+                    await obj.tx_builder.notify_unconfirmed(cur=cur, tx=tx)
+                await db.commit()
+        self.batches += 1
+        self.accepted += len(accepted)
+        self.rejected += sum(isinstance(result, Exception) for result in results)
+        self.admit_time += time() - t
+        log.debug("admit {}/{} txs by {}sec".format(len(accepted), len(txs), round(time() - t, 3)))
+        return results
+
+    def getinfo(self):
+        return {
+            'queue': len(self.queue),
+            'batches': self.batches,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'avg_batch_ms': round(self.admit_time / self.batches * 1000, 3) if self.batches else None,
+        }
+
+
+tx_admission = TxAdmission()
+
+
+async def new_insert_tx(tx: 'TX') -> bool:
+    """admit unconfirmed tx by the batch of the moment"""
+    return await tx_admission.put(tx)
+
+
+__all__ = [
+    "TxAdmission",
+    "tx_admission",
+    "new_insert_tx",
+]
@@ -4,6 +4,7 @@ from bc4py.chain.block import Block
 from bc4py.chain.checking.tx_reward import *
 from bc4py.chain.checking.tx_mintcoin import *
 from bc4py.chain.checking.utils import *
+from bc4py.chain.checking.context import ValidationContext
 from logging import getLogger
 from time import time
 import hashlib
@@ -12,7 +13,7 @@ import hashlib
 log = getLogger('bc4py')
 
 
-def check_tx(tx, include_block):
+def check_tx(tx, include_block, ctx: ValidationContext = None):
     # TXの正当性チェック
     f_inputs_origin_check = True
     f_amount_check = True
@@ -35,16 +36,17 @@ def check_tx(tx, include_block):
         elif tx.type in (C.TX_POS_REWARD, C.TX_POW_REWARD):
             raise BlockChainError('{} index is not 0 idx:{}'.format(tx, include_block.txs.index(tx)))
 
-    # 各々のタイプで検査
     if tx.type == C.TX_GENESIS:
         return
+    ctx = get_context(tx, include_block, ctx)
 
-    elif tx.type == C.TX_POS_REWARD:
+    # 各々のタイプで検査
+    if tx.type == C.TX_POS_REWARD:
         f_amount_check = False
         f_minimum_fee_check = False
         # TODO: POS tx need Multisig? f_signature_check
         if include_block.flag == C.BLOCK_COIN_POS:
-            check_tx_pos_reward(tx=tx, include_block=include_block)
+            check_tx_pos_reward(tx=tx, include_block=include_block, ctx=ctx)
         elif include_block.flag == C.BLOCK_CAP_POS:
             f_signature_check = False
             f_inputs_origin_check = False
@@ -70,22 +72,22 @@ def check_tx(tx, include_block):
         f_amount_check = False
         f_minimum_fee_check = False
         f_signature_check = False
-        check_tx_mint_coin(tx=tx, include_block=include_block)
+        check_tx_mint_coin(tx=tx, include_block=include_block, ctx=ctx)
 
     else:
         raise BlockChainError('Unknown tx type "{}"'.format(tx.type))
 
     # Inputs origin チェック
     if f_inputs_origin_check:
-        inputs_origin_check(tx=tx, include_block=include_block)
+        inputs_origin_check(tx=tx, include_block=include_block, ctx=ctx)
 
     # 残高移動チェック
     if f_amount_check:
-        amount_check(tx=tx, payfee_coin_id=payfee_coin_id, include_block=include_block)
+        amount_check(tx=tx, payfee_coin_id=payfee_coin_id, include_block=include_block, ctx=ctx)
 
     # 署名チェック
     if f_signature_check:
-        signature_check(tx=tx, include_block=include_block)
+        signature_check(tx=tx, include_block=include_block, ctx=ctx)
 
     # hash-locked check
     if tx.message_type == C.MSG_HASHLOCKED:
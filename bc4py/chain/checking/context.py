@@ -0,0 +1,114 @@
+from bc4py.config import C, BlockChainError
+from bc4py.database import obj
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Set, Tuple
+
+"""
+validation context
+====
+inputs of one block (or one mempool admission) are resolved once and shared by all `check_*` functions
+database unused index is read by one sweep, memory by the overlay of the block's chain
+spends by txs of the context are recorded, an outpoint can be spent only once in it
+"""
+
+if TYPE_CHECKING:
+    from bc4py.chain.block import Block
+    from bc4py.chain.tx import TX
+    from bc4py_extension import PyAddress
+
+
+class ValidationContext(object):
+
+    def __init__(self, include_block: Optional['Block'] = None):
+        self.include_block = include_block
+        if include_block is None:
+            self.best_chain = obj.chain_builder.best_chain
+        else:
+            _, self.best_chain = obj.chain_builder.get_best_chain(include_block)
+        self.overlay = obj.chain_builder.get_overlay(self.best_chain)
+        self.limit_height = obj.chain_builder.best_block.height - C.MATURE_HEIGHT
+        # {(txhash, txindex): (address, coin_id, amount) or None}
+        self.outputs: Dict[Tuple[bytes, int], Optional[Tuple['PyAddress', int, int]]] = dict()
+        # outpoints found on database unused index
+        self.on_database: Set[Tuple[bytes, int]] = set()
+        # {(txhash, txindex): spending txhash} by checked txs
+        self.spent: Dict[Tuple[bytes, int], bytes] = dict()
+        # {txhash: mature or not}
+        self.mature: Dict[bytes, bool] = dict()
+        # {txhash: index of include block}
+        if include_block is None:
+            self.tx_index: Dict[bytes, int] = dict()
+        else:
+            self.tx_index = {tx.hash: index for index, tx in enumerate(include_block.txs)}
+
+    def __repr__(self):
+        return "<ValidationContext block={} outputs={} spent={}>".format(
+            self.include_block, len(self.outputs), len(self.spent))
+
+    def prefetch(self, txs: Iterable['TX']):
+        """resolve all inputs of txs"""
+        self.prefetch_inputs(pair for tx in txs for pair in tx.inputs)
+
+    def prefetch_inputs(self, inputs: Iterable[Tuple[bytes, int]]):
+        pairs = {pair for pair in inputs if pair not in self.outputs}
+        if len(pairs) == 0:
+            return
+        # database
+        for pair, output in obj.tables.read_unused_index_many(pairs).items():
+            if output is not None:
+                self.outputs[pair] = output
+                self.on_database.add(pair)
+        # memory and unconfirmed
+        for txhash, txindex in pairs - self.on_database:
+            output = self.overlay.get_output(txhash, txindex)
+            if output is None and self.include_block is None:
+                outputs = obj.tx_builder.get_unconfirmed_outputs(txhash)
+                if outputs is not None and txindex < len(outputs):
+                    output = outputs[txindex]
+            self.outputs[(txhash, txindex)] = output
+
+    def get_output(self, txhash, txindex) -> Optional[Tuple['PyAddress', int, int]]:
+        pair = (txhash, txindex)
+        if pair not in self.outputs:
+            self.prefetch_inputs((pair,))
+        return self.outputs[pair]
+
+    def is_unused_except(self, txhash, txindex, except_hash) -> bool:
+        """same as `is_unused_index_except_me` with spends of checked txs"""
+        pair = (txhash, txindex)
+        spender = self.spent.get(pair)
+        if spender is not None and spender != except_hash:
+            return False
+        info = self.overlay.get_spent(txhash, txindex)
+        if info is not None and info[0] != except_hash:
+            return False
+        if self.include_block is None:
+            spender = obj.tx_builder.get_unconfirmed_spender(txhash, txindex)
+            if spender is not None and spender != except_hash:
+                return False
+        if self.get_output(txhash, txindex) is None:
+            return False
+        return pair in self.on_database or txhash != except_hash
+
+    def spend(self, tx: 'TX'):
+        """record inputs of checked tx"""
+        for pair in tx.inputs:
+            spender = self.spent.get(pair)
+            if spender is not None and spender != tx.hash:
+                raise BlockChainError('2 Input of {} is already used by {}'.format(tx, spender.hex()))
+            self.spent[pair] = tx.hash
+
+    def release(self, tx: 'TX'):
+        """drop inputs of rejected tx, other txs of the context can spend them"""
+        for pair in tx.inputs:
+            if self.spent.get(pair) == tx.hash:
+                del self.spent[pair]
+
+    def add_unconfirmed(self, tx: 'TX'):
+        """outputs of accepted unconfirmed tx, later txs of the context can spend them"""
+        for index, output in enumerate(tx.outputs):
+            self.outputs[(tx.hash, index)] = output
+
+
+__all__ = [
+    "ValidationContext",
+]
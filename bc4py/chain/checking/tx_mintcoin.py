@@ -5,7 +5,7 @@ from bc4py.user import Balance
 from bc4py_extension import PyAddress
 
 
-def check_tx_mint_coin(tx, include_block):
+def check_tx_mint_coin(tx, include_block, ctx=None):
     if not (0 < len(tx.inputs) and 0 < len(tx.outputs)):
         raise BlockChainError('Input and output is more than 1')
     elif tx.message_type != C.MSG_MSGPACK:
@@ -26,7 +26,7 @@ def check_tx_mint_coin(tx, include_block):
     if isinstance(result, str):
         raise BlockChainError('Failed check mintcoin block={}: {}'.format(include_block, result))
     # signature check
-    require_cks, coins = input_output_digest(tx=tx)
+    require_cks, coins = input_output_digest(tx=tx, ctx=ctx)
     if m_before.address:
         require_cks.add(PyAddress.from_string(m_before.address))
     signed_cks = set(tx.verified_list)
@@ -63,12 +63,15 @@ def check_tx_mint_coin(tx, include_block):
         raise BlockChainError('Unexpected include_coin_ids, {}'.format(include_coin_ids))
 
 
-def input_output_digest(tx):
+def input_output_digest(tx, ctx=None):
     require_cks = set()
     coins = Balance()
     # inputs
     for txhash, txindex in tx.inputs:
-        pair = get_output_from_input(txhash, txindex)
+        if ctx is None:
+            pair = get_output_from_input(txhash, txindex)
+        else:
+            pair = ctx.get_output(txhash, txindex)
         if pair is None:
             raise BlockChainError('input tx is None. {}:{}'.format(txhash.hex(), txindex))
         address, coin_id, amount = pair
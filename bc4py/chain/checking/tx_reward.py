@@ -36,7 +36,7 @@ def check_tx_pow_reward(tx, include_block):
                               .format(total_output_amount, reward, income_fee, extra_output_fee))
 
 
-def check_tx_pos_reward(tx, include_block):
+def check_tx_pos_reward(tx, include_block, ctx=None):
     # POS報酬TXの検査
     if not (len(tx.inputs) == len(tx.outputs) == 1):
         raise BlockChainError('Inputs and outputs is only 1 len')
@@ -52,7 +52,10 @@ def check_tx_pos_reward(tx, include_block):
     txhash, txindex = tx.inputs[0]
     if not is_mature_input(base_hash=txhash, limit_height=include_block.height - C.MATURE_HEIGHT):
         raise BlockChainError('Source is not mature, {} {}'.format(include_block.height, txhash.hex()))
-    base_pair = get_output_from_input(txhash, txindex, best_block=include_block)
+    if ctx is None:
+        base_pair = get_output_from_input(txhash, txindex, best_block=include_block)
+    else:
+        base_pair = ctx.get_output(txhash, txindex)
     if base_pair is None:
         raise BlockChainError('Not found PosBaseTX:{} of {}'.format(txhash.hex(), tx))
     input_address, input_coin_id, input_amount = base_pair
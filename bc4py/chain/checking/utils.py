@@ -1,7 +1,7 @@
 from bc4py.config import C, V, BlockChainError
 from bc4py.bip32 import is_address
 from bc4py.database import obj
-from bc4py.database.tools import is_unused_index_except_me, get_output_from_input
+from bc4py.chain.checking.context import ValidationContext
 from bc4py.user import Balance
 from hashlib import sha256
 from typing import TYPE_CHECKING, Optional
@@ -13,31 +13,40 @@ if TYPE_CHECKING:
     from bc4py.chain.block import Block
 
 
-def inputs_origin_check(tx: 'TX', include_block: Optional['Block']):
+def get_context(tx: 'TX', include_block: Optional['Block'], ctx: Optional[ValidationContext]):
+    """context passed by caller or new one for the tx"""
+    if ctx is None:
+        ctx = ValidationContext(include_block)
+        ctx.prefetch((tx,))
+    return ctx
+
+
+def inputs_origin_check(tx: 'TX', include_block: Optional['Block'], ctx: ValidationContext = None):
     """check the TX inputs for inconsistencies"""
     # check if the same input is used in same tx
     if len(tx.inputs) != len(set(tx.inputs)):
         raise BlockChainError(f"input has same origin {len(tx.inputs)}!={len(set(tx.inputs))}")
 
-    limit_height = obj.chain_builder.best_block.height - C.MATURE_HEIGHT
+    ctx = get_context(tx, include_block, ctx)
+    limit_height = ctx.limit_height
     for txhash, txindex in tx.inputs:
-        pair = get_output_from_input(input_hash=txhash, input_index=txindex, best_block=include_block)
+        pair = ctx.get_output(txhash, txindex)
         if pair is None:
             raise BlockChainError('Not found input tx. {}:{}'.format(txhash.hex(), txindex))
 
         if obj.tx_builder.memory_pool.exist(txhash):
             # input of tx is not unconfirmed or include at former index
             if include_block is not None:
-                for dep_index, dep_tx in enumerate(include_block.txs):
-                    if dep_tx.hash == txhash:
-                        break
-                else:
+                dep_index = ctx.tx_index.get(txhash)
+                if dep_index is None:
                     raise Exception('cannot find dep tx? {}'.format(txhash.hex()))
-                if include_block.txs.index(tx) <= dep_index:
+                if ctx.tx_index[tx.hash] <= dep_index:
                     raise BlockChainError('inputs depends later TX on block. {} {}'.format(tx, txhash.hex()))
 
         # mined output is must mature the height
-        if not is_mature_input(base_hash=txhash, limit_height=limit_height):
+        if txhash not in ctx.mature:
+            ctx.mature[txhash] = is_mature_input(base_hash=txhash, limit_height=limit_height)
+        if not ctx.mature[txhash]:
             check_tx = obj.tx_builder.get_memorized_tx(txhash)
             if check_tx is None:
                 raise Exception('cannot get tx, memory block number is too few')
@@ -45,29 +54,20 @@ def inputs_origin_check(tx: 'TX', include_block: Optional['Block']):
                 raise BlockChainError('input origin is proof tx, {}>{}'.format(check_tx.height, limit_height))
 
         # check unused input
-        if not is_unused_index_except_me(
-                input_hash=txhash,
-                input_index=txindex,
-                except_hash=tx.hash,
-                best_block=include_block):
+        if not ctx.is_unused_except(txhash, txindex, tx.hash):
             raise BlockChainError('1 Input of {} is already used! {}:{}'.format(tx, txhash.hex(), txindex))
 
-        # check if the same input is used by another tx in block
-        if include_block:
-            for input_tx in include_block.txs:
-                if input_tx is tx:
-                    continue
-                for input_hash, input_index in input_tx.inputs:
-                    if input_hash == txhash and input_index == txindex:
-                        raise BlockChainError('2 Input of {} is already used by {}'.format(tx, input_tx))
+    # check if the same input is used by another tx in block
+    ctx.spend(tx)
 
 
-def amount_check(tx, payfee_coin_id, include_block):
+def amount_check(tx, payfee_coin_id, include_block, ctx: ValidationContext = None):
     """check tx sum of inputs and outputs amount"""
     # Inputs
     input_coins = Balance()
+    ctx = get_context(tx, include_block, ctx)
     for txhash, txindex in tx.inputs:
-        pair = get_output_from_input(input_hash=txhash, input_index=txindex, best_block=include_block)
+        pair = ctx.get_output(txhash, txindex)
         if pair is None:
             raise BlockChainError('Not found input tx {}'.format(txhash.hex()))
         address, coin_id, amount = pair
@@ -90,12 +90,13 @@ def amount_check(tx, payfee_coin_id, include_block):
             remain_amount, input_coins, output_coins, fee_coins))
 
 
-def signature_check(tx, include_block):
+def signature_check(tx, include_block, ctx: ValidationContext = None):
     require_cks = set()
     checked_cks = set()
     signed_cks = set(tx.verified_list)
+    ctx = get_context(tx, include_block, ctx)
     for txhash, txindex in tx.inputs:
-        pair = get_output_from_input(txhash, txindex, best_block=include_block)
+        pair = ctx.get_output(txhash, txindex)
         if pair is None:
             raise BlockChainError('Not found input tx {}'.format(txhash.hex()))
         address, coin_id, amount = pair
@@ -130,12 +131,11 @@ def is_mature_input(base_hash, limit_height) -> bool:
         return False
 
     # from memory
-    for block in obj.chain_builder.best_chain:
-        if block.height < limit_height:
-            return True
-        for tx in block.txs:
-            if tx.hash == base_hash:
-                return False
+    height = obj.chain_builder.best_overlay.get_height(base_hash)
+    if height is not None:
+        return height < limit_height
+    if obj.chain_builder.root_block.height < limit_height:
+        return True
 
     # from database
     height = obj.chain_builder.root_block.height
@@ -151,6 +151,7 @@ def is_mature_input(base_hash, limit_height) -> bool:
 
 
 __all__ = [
+    "get_context",
     "inputs_origin_check",
     "amount_check",
     "signature_check",
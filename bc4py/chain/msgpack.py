@@ -1,9 +1,24 @@
-from bc4py.chain.block import Block
-from bc4py.chain.tx import TX
+from bc4py.chain.block import Block, LazyBlock
+from bc4py.chain.tx import TX, LazyTX
 import msgpack
 
 
 def default_hook(obj):
+    if isinstance(obj, LazyBlock) and obj.raw_txs is not None:
+        # forward database binary without decoding txs, signature is packed binary
+        return {
+            '_bc4py_class_': 'Block',
+            'binary': obj.b,
+            'height': obj.height,
+            'flag': obj.flag,
+            'txs': [{
+                '_bc4py_class_': 'TX',
+                'binary': bytes(b_tx),
+                'height': obj.height,
+                'signature': bytes(b_sign),
+                'R': bytes(R)
+            } for b_tx, b_sign, R in obj.raw_txs]
+        }
     if isinstance(obj, Block):
         return {
             '_bc4py_class_': 'Block',
@@ -12,6 +27,14 @@ def default_hook(obj):
             'flag': obj.flag,
             'txs': [default_hook(tx) for tx in obj.txs]
         }
+    if isinstance(obj, LazyTX) and obj._lazy_signature is not None:
+        return {
+            '_bc4py_class_': 'TX',
+            'binary': obj.b,
+            'height': obj.height,
+            'signature': obj._lazy_signature,
+            'R': obj.R
+        }
     if isinstance(obj, TX):
         return {
             '_bc4py_class_': 'TX',
@@ -34,6 +57,9 @@ def object_hook(dct):
                 tx.height = block.height
             return block
         elif dct['_bc4py_class_'] == 'TX':
+            if isinstance(dct['signature'], bytes):
+                # packed signature is decoded on first access
+                return LazyTX.from_database(dct['binary'], dct['signature'], dct['R'], dct['height'])
             tx = TX.from_binary(binary=dct['binary'])
             tx.height = dct['height']
             tx.signature.extend(tuple(sig) for sig in dct['signature'])
@@ -1,8 +1,10 @@
 from bc4py.config import C, V
 from bc4py.bip32 import get_address
 from multi_party_schnorr import verify_auto_multi
+from collections import OrderedDict
 from logging import getLogger
-from os import cpu_count
+from hashlib import sha256
+from os import cpu_count, urandom
 from time import time
 import asyncio
 
@@ -10,6 +12,55 @@ loop = asyncio.get_event_loop()
 log = getLogger('bc4py')
 n_workers = cpu_count()
 
+SIGNATURE_CACHE_SIZE = 200000  # verified signatures, about 100 bytes each
+
+
+class SignatureCache(object):
+    """
+    LRU of verified (pk, r, s, sighash), shared by mempool and block validation
+    key is salted by random of this process, peers cannot choose keys to evict others
+    """
+
+    def __init__(self, maxsize=SIGNATURE_CACHE_SIZE):
+        self.salt = urandom(32)
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hit = 0
+        self.miss = 0
+
+    def __repr__(self):
+        return "<SignatureCache {}/{} hit={} miss={}>".format(len(self.cache), self.maxsize, self.hit, self.miss)
+
+    def get_key(self, pk, r, s, binary) -> bytes:
+        sighash = sha256(binary).digest()
+        return sha256(self.salt + pk + len(r).to_bytes(1, 'big') + r + s + sighash).digest()
+
+    def contains(self, key) -> bool:
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hit += 1
+            return True
+        self.miss += 1
+        return False
+
+    def add(self, key):
+        self.cache[key] = None
+        if self.maxsize < len(self.cache):
+            self.cache.popitem(last=False)
+
+    def getinfo(self):
+        total = self.hit + self.miss
+        return {
+            'size': len(self.cache),
+            'maxsize': self.maxsize,
+            'hit': self.hit,
+            'miss': self.miss,
+            'hit_ratio': round(self.hit / total, 4) if total else None,
+        }
+
+
+signature_cache = SignatureCache()
+
 
 async def fill_verified_addr_single(block):
     # format check
@@ -33,7 +84,8 @@ async def fill_verified_addr_many(blocks):
             for sign in tx.signature:
                 assert isinstance(sign, tuple), tx.getinfo()
         # get data to verify
-        tasks.update(get_verify_tasks(block))
+        for key, txs in get_verify_tasks(block).items():
+            tasks.setdefault(key, list()).extend(txs)
     # throw task
     if len(tasks) == 0:
         return
@@ -49,11 +101,31 @@ async def fill_verified_addr_tx(tx):
     # get data to verify
     tasks = dict()
     for pk, r, s in tx.signature:
-        tasks[(s, r, pk, tx.b)] = tx
+        tasks[(s, r, pk, tx.b)] = [tx]
+    # throw task
+    if len(tasks) == 0:
+        return
+    await throw_tasks(tasks, V.BECH32_HRP, C.ADDR_NORMAL_VER)
+
+
+async def fill_verified_addr_txs(txs):
+    """unconfirmed txs of mempool admission by one call"""
+    t = time()
+    tasks = dict()
+    for tx in txs:
+        assert tx.type != C.TX_POS_REWARD
+        # format check
+        for sign in tx.signature:
+            assert isinstance(sign, tuple), tx.getinfo()
+        # get data to verify
+        # same tx may be included twice, all objects are filled
+        for pk, r, s in tx.signature:
+            tasks.setdefault((s, r, pk, tx.b), list()).append(tx)
     # throw task
     if len(tasks) == 0:
         return
     await throw_tasks(tasks, V.BECH32_HRP, C.ADDR_NORMAL_VER)
+    log.debug("verify {} signs of {} txs by {}sec".format(len(tasks), len(txs), round(time() - t, 3)))
 
 
 def get_verify_tasks(block):
@@ -66,31 +138,50 @@ def get_verify_tasks(block):
         if len(tx.verified_list) == len(tx.signature):
             continue
         for pk, r, s in tx.signature:
-            tasks[(s, r, pk, binary)] = tx
+            tasks.setdefault((s, r, pk, binary), list()).append(tx)
     return tasks
 
 
+def fill_verified_addr(tx, pk, hrp, ver):
+    address = get_address(pk=pk, hrp=hrp, ver=ver)
+    if address not in tx.verified_list:
+        tx.verified_list.append(address)
+
+
 async def throw_tasks(tasks, hrp, ver):
-    task_list = list(tasks.keys())
+    """tasks is {(s, r, pk, binary): [tx, ..]}, one signature is verified once"""
+    # verified before
+    task_list = list()
+    cache_keys = list()
+    for key, txs in tasks.items():
+        s, r, pk, binary = key
+        cache_key = signature_cache.get_key(pk, r, s, binary)
+        if signature_cache.contains(cache_key):
+            for tx in txs:
+                fill_verified_addr(tx, pk, hrp, ver)
+        else:
+            task_list.append(key)
+            cache_keys.append(cache_key)
+    if len(task_list) == 0:
+        return
     future: asyncio.Future = loop.run_in_executor(
         None, verify_auto_multi, task_list, n_workers, False)
     await asyncio.wait_for(future, 120.0)
     result_list = future.result()
     # fill result
-    for is_verify, key in zip(result_list, task_list):
+    for is_verify, key, cache_key in zip(result_list, task_list, cache_keys):
         if not is_verify:
             continue
-        if key not in tasks:
-            continue
+        signature_cache.add(cache_key)
         s, r, pk, binary = key
-        address = get_address(pk=pk, hrp=hrp, ver=ver)
-        verified_list = tasks[key].verified_list
-        if address not in verified_list:
-            verified_list.append(address)
+        for tx in tasks[key]:
+            fill_verified_addr(tx, pk, hrp, ver)
 
 
 __all__ = [
+    "signature_cache",
     "fill_verified_addr_single",
     "fill_verified_addr_many",
     "fill_verified_addr_tx",
+    "fill_verified_addr_txs",
 ]
@@ -1,6 +1,7 @@
 from bc4py import __chain_version__
 from bc4py.config import C, V, BlockChainError
 from bc4py.bip32 import ADDR_SIZE
+from bc4py.chain.utils import bin2signature
 from bc4py.database import obj
 from bc4py_extension import sha256d_hash, PyAddress
 from typing import Optional, List
@@ -82,7 +83,8 @@ class TX(object):
     @classmethod
     def from_binary(cls, binary):
         self = cls()
-        self.b = binary
+        # memoryview of block file is copied only tx size
+        self.b = binary if isinstance(binary, bytes) else bytes(binary)
         self.deserialize()
         return self
 
@@ -133,11 +135,8 @@ class TX(object):
             self.inputs.append(struct_inputs.unpack_from(self.b, pos))
             pos += struct_inputs.size
         # outputs
-        self.outputs = list()
-        for i in range(outputs_len):
-            b_address, coin_id, amount = struct_outputs.unpack_from(self.b, pos)
-            self.outputs.append((PyAddress.from_binary(V.BECH32_HRP, b_address), coin_id, amount))
-            pos += struct_outputs.size
+        self.outputs = self.decode_outputs(pos, outputs_len)
+        pos += outputs_len * struct_outputs.size
         # msg
         self.message = self.b[pos:pos + msg_len]
         pos += msg_len
@@ -148,6 +147,14 @@ class TX(object):
                 self.b = self.b[first_pos:pos]
         self.hash = sha256d_hash(self.b)
 
+    def decode_outputs(self, pos, outputs_len):
+        outputs = list()
+        for i in range(outputs_len):
+            b_address, coin_id, amount = struct_outputs.unpack_from(self.b, pos)
+            outputs.append((PyAddress.from_binary(V.BECH32_HRP, b_address), coin_id, amount))
+            pos += struct_outputs.size
+        return outputs
+
     def getinfo(self):
         r = dict()
         r['hash'] = self.hash.hex()
@@ -216,6 +223,57 @@ class TX(object):
         self.serialize()
 
 
+class LazyTX(TX):
+    """TX read from database, outputs and signature are decoded on first access"""
+    __slots__ = ("_lazy_outputs", "_lazy_signature")
+
+    def __init__(self):
+        self._lazy_outputs = None
+        self._lazy_signature = None
+        super().__init__()
+
+    @classmethod
+    def from_database(cls, b_tx, b_sign, R, height):
+        self = cls.from_binary(binary=b_tx)
+        self.height = height
+        self._lazy_signature = bytes(b_sign)
+        self.R = bytes(R)
+        return self
+
+    def decode_outputs(self, pos, outputs_len):
+        self._lazy_outputs = (pos, outputs_len)
+        return None
+
+    @property
+    def outputs(self):
+        if self._lazy_outputs is not None:
+            pos, outputs_len = self._lazy_outputs
+            self._lazy_outputs = None
+            TX.outputs.__set__(self, TX.decode_outputs(self, pos, outputs_len))
+        return TX.outputs.__get__(self, TX)
+
+    @outputs.setter
+    def outputs(self, value):
+        # note: None is set while deserialize
+        if value is not None:
+            self._lazy_outputs = None
+        TX.outputs.__set__(self, value)
+
+    @property
+    def signature(self):
+        if self._lazy_signature is not None:
+            b_sign = self._lazy_signature
+            self._lazy_signature = None
+            TX.signature.__set__(self, bin2signature(b_sign))
+        return TX.signature.__get__(self, TX)
+
+    @signature.setter
+    def signature(self, value):
+        self._lazy_signature = None
+        TX.signature.__set__(self, value)
+
+
 __all__ = [
     "TX",
+    "LazyTX",
 ]
@@ -95,7 +95,6 @@ class C:  # Constant
     # Block/TX/Fee limit
     SIZE_BLOCK_LIMIT = 300 * 1000  # 300kb block
     SIZE_TX_LIMIT = 100 * 1000  # 100kb tx
-    MEMORY_FILE_REFRESH_SPAN = 101  # memory_file refresh span
     MEMORY_CACHE_LIMIT = 250  # max memorized block size, means re-org limit
     MEMORY_BATCH_SIZE = 30
     MINTCOIN_GAS = int(10 * pow(10, 6))  # 新規Mintcoin発行GasFee
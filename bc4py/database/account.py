@@ -45,6 +45,17 @@ async def read_movelog_iter(cur: Cursor, start=0):
         c += 1
 
 
+async def read_inner_movelog_sum(cur: Cursor) -> Accounting:
+    """sum of all inner movements, they are not related to blocks"""
+    await cur.execute("""
+        SELECT `user`,`coin_id`,SUM(`amount`) FROM `log` WHERE `type`=? GROUP BY `user`,`coin_id`
+    """, (C.TX_INNER,))
+    movement = Accounting()
+    for user, coin_id, amount in await cur.fetchall():
+        movement[user][coin_id] += amount
+    return movement
+
+
 async def insert_movelog(movements, cur: Cursor, ntype=None, ntime=None, txhash=None):
     """recode account balance movement"""
     assert isinstance(movements, Accounting), 'movements is Accounting'
@@ -344,6 +355,7 @@ class MoveLog(object):
 __all__ = [
     "read_txhash2movelog",
     "read_movelog_iter",
+    "read_inner_movelog_sum",
     "insert_movelog",
     "delete_movelog",
     "read_address2keypair",
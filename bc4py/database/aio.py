@@ -0,0 +1,94 @@
+from bc4py.chain.block import LazyBlock
+from bc4py.database import obj
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Dict, List, Optional
+from time import time
+import asyncio
+
+loop = asyncio.get_event_loop()
+log = getLogger('bc4py')
+
+"""
+async storage
+====
+blocking LevelDB calls run on dedicated I/O threads and the event loop only awaits them
+multi block reads see one LevelDB snapshot, commit is serialized by batch event as before
+note: UTXO cache is not thread safe, outpoint lookups stay on the event loop
+"""
+
+IO_THREADS = 4
+READ_CHUNK_SIZE = 500  # blocks read by one I/O job
+
+executor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix='db-io')
+
+
+class IOStats(object):
+    """time spent on I/O threads by kind"""
+
+    def __init__(self):
+        self.count: Dict[str, int] = dict()
+        self.spent: Dict[str, float] = dict()
+        self.running = 0
+
+    def add(self, name, spent):
+        self.count[name] = self.count.get(name, 0) + 1
+        self.spent[name] = self.spent.get(name, 0.0) + spent
+
+    def getinfo(self):
+        return {
+            'threads': IO_THREADS,
+            'running': self.running,
+            'jobs': {
+                name: {'count': count, 'avg_ms': round(self.spent[name] / count * 1000, 3)}
+                for name, count in self.count.items()},
+        }
+
+
+io_stats = IOStats()
+
+
+async def run_io(name, fnc, *args):
+    """run blocking function on I/O thread"""
+    s = time()
+    io_stats.running += 1
+    try:
+        return await loop.run_in_executor(executor, fnc, *args)
+    finally:
+        io_stats.running -= 1
+        io_stats.add(name, time() - s)
+
+
+async def read_block(blockhash):
+    return await run_io('read_block', obj.tables.read_block, blockhash)
+
+
+async def read_block_many(blockhashs: List[bytes]) -> List[Optional[LazyBlock]]:
+    """read blocks of one snapshot, return list of block or None"""
+    return await run_io('read_block_many', obj.tables.read_block_many, blockhashs)
+
+
+async def read_block_iter(start_height, stop_height):
+    """async iterator of (height, block) on database, read by chunk"""
+    for chunk_start in range(start_height, stop_height, READ_CHUNK_SIZE):
+        chunk_stop = min(stop_height, chunk_start + READ_CHUNK_SIZE)
+        blockhashs = obj.tables.read_block_hash_range(chunk_start, chunk_stop)
+        blocks = await read_block_many(blockhashs)
+        for height, block in enumerate(blocks, chunk_start):
+            yield height, block
+
+
+async def write_batch(fnc):
+    """write prepared batches on I/O thread"""
+    return await run_io('write_batch', fnc)
+
+
+__all__ = [
+    "IO_THREADS",
+    "io_stats",
+    "run_io",
+    "read_block",
+    "read_block_many",
+    "read_block_iter",
+    "write_batch",
+]
@@ -0,0 +1,140 @@
+from logging import getLogger
+from typing import Dict, List, Optional, Tuple
+from threading import Lock
+import struct
+import mmap
+import re
+import os
+
+log = getLogger('bc4py')
+
+"""
+append only block files
+====
+serialized blocks are appended to `blocks/blkNNNNN.dat` and LevelDB `_block` keeps only a locator,
+large values are out of LevelDB compaction and reads are zero-copy slices of a mmap
+files are never truncated, bytes of a rollback batch are left as dead space (live maps may cover them)
+written by event loop (and commit on I/O thread), read by any thread, only writer touches `fp`
+"""
+
+struct_locator = struct.Struct('>IQI')  # [file number][offset][length]
+MAX_BLOCK_FILE_SIZE = 128 * 1024 * 1024
+BLOCK_FILE_RE = re.compile(r'^blk(\d{5})\.dat$')
+
+
+def is_locator(b) -> bool:
+    """`_block` value is a locator or a serialized block"""
+    return len(b) == struct_locator.size
+
+
+class BlockFiles(object):
+
+    def __init__(self, dirs, max_file_size=MAX_BLOCK_FILE_SIZE):
+        self.dirs = os.path.join(dirs, 'blocks')
+        self.max_file_size = max_file_size
+        if not os.path.exists(self.dirs):
+            os.mkdir(self.dirs)
+        numbers = [int(m.group(1)) for m in map(BLOCK_FILE_RE.match, os.listdir(self.dirs)) if m]
+        self.file_no = max(numbers) if numbers else 0
+        self.fp = open(self.get_path(self.file_no), mode='ab')
+        # rollback point (file_no, position) of the batch
+        self.batch_start: Optional[Tuple[int, int]] = None
+        # maps are replaced when file grows, old maps are closed after views are released
+        self.lock = Lock()
+        self.maps: Dict[int, mmap.mmap] = dict()
+        self.retired: List[mmap.mmap] = list()
+        log.debug("open block files {} last=blk{:05d}.dat".format(self.dirs, self.file_no))
+
+    def get_path(self, file_no):
+        return os.path.join(self.dirs, 'blk{:05d}.dat'.format(file_no))
+
+    def close(self):
+        self.fp.close()
+        with self.lock:
+            self.retired.extend(self.maps.values())
+            self.maps.clear()
+            self.close_retired()
+
+    def close_retired(self):
+        """close replaced maps without exported views, call with lock"""
+        alive = list()
+        for m in self.retired:
+            try:
+                m.close()
+            except BufferError:
+                alive.append(m)  # still referred by a view
+        self.retired = alive
+
+    def begin(self):
+        """mark rollback point"""
+        self.batch_start = (self.file_no, self.fp.tell())
+
+    def append(self, b) -> bytes:
+        """append serialized block and return locator"""
+        position = self.fp.tell()
+        if 0 < position and self.max_file_size < position + len(b):
+            self.rotate()
+            position = 0
+        self.fp.write(b)
+        return struct_locator.pack(self.file_no, position, len(b))
+
+    def rotate(self):
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.fp.close()
+        self.file_no += 1
+        self.fp = open(self.get_path(self.file_no), mode='ab')
+        log.debug("rotate block file to blk{:05d}.dat".format(self.file_no))
+
+    def commit(self, sync=False):
+        """flush appended blocks before locators are written"""
+        self.fp.flush()
+        if sync:
+            os.fsync(self.fp.fileno())
+        self.batch_start = None
+
+    def rollback(self):
+        """blocks appended after rollback point are dead space, no locator refers them"""
+        if self.batch_start is None:
+            return
+        file_no, position = self.batch_start
+        self.fp.flush()
+        log.debug("rollback block files, dead space from blk{:05d}.dat:{} to blk{:05d}.dat:{}".format(
+            file_no, position, self.file_no, self.fp.tell()))
+        self.batch_start = None
+
+    def remove_before(self, file_no):
+        """remove block files of pruned blocks, current file is never removed"""
+        file_no = min(file_no, self.file_no)
+        for name in os.listdir(self.dirs):
+            m = BLOCK_FILE_RE.match(name)
+            if m and int(m.group(1)) < file_no:
+                with self.lock:
+                    old = self.maps.pop(int(m.group(1)), None)
+                    if old is not None:
+                        self.retired.append(old)
+                    self.close_retired()
+                os.remove(os.path.join(self.dirs, name))
+                log.debug("remove pruned block file {}".format(name))
+
+    def read(self, locator) -> memoryview:
+        """zero-copy view of serialized block, locator is committed so bytes are already flushed"""
+        file_no, offset, length = struct_locator.unpack(locator)
+        with self.lock:
+            m = self.maps.get(file_no)
+            if m is None or len(m) < offset + length:
+                with open(self.get_path(file_no), mode='rb') as fp:
+                    new = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+                if m is not None:
+                    self.retired.append(m)
+                self.close_retired()
+                self.maps[file_no] = m = new
+            view = memoryview(m)
+        return view[offset:offset + length]
+
+
+__all__ = [
+    "struct_locator",
+    "is_locator",
+    "BlockFiles",
+]
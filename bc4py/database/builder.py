@@ -2,15 +2,24 @@ from bc4py.config import C, V, stream
 from bc4py.bip32 import ADDR_SIZE
 from bc4py.chain.utils import signature2bin, bin2signature
 from bc4py.chain.tx import TX
-from bc4py.chain.block import Block, get_block_header_from_bin
-import bc4py.chain.msgpack as bc4py_msgpack
+from bc4py.chain.block import Block, LazyBlock, BlockHeader, get_block_header_from_bin
 from bc4py.user import Balance, Accounting
 from bc4py.database import obj
 from bc4py.database.account import *
 from bc4py.database.create import create_db
+from bc4py.database.storage import *
+from bc4py.database.blockfile import BlockFiles, is_locator, struct_locator
+from bc4py.database.headers import struct_header, HeaderArray
+from bc4py.database.utxo import UTXO_CACHE_SIZE, UTXOCache
+from bc4py.database.snapshot import dump_snapshot, is_importing
+from bc4py.database.forktree import ForkTree
+from bc4py.database.journal import Journal, read_memory_file
+from bc4py.database.overlay import MemoryOverlay, ForkOverlay
+from bc4py.database import aio
 from bc4py_extension import sha256d_hash, PyAddress, MemoryPool
 from msgpack import unpackb, packb
-from typing import Optional, Dict, List, Tuple, MutableMapping
+from typing import Optional, Dict, List, Tuple, Iterable, MutableMapping
+from collections import defaultdict
 from weakref import WeakValueDictionary
 from logging import getLogger, INFO
 from time import time
@@ -27,30 +36,60 @@ getLogger('plyvel').setLevel(INFO)
 
 struct_block = struct.Struct('>I32s80sBI')
 struct_tx = struct.Struct('>2IB')
-struct_unused_idx = struct.Struct('>{}sIQ'.format(ADDR_SIZE))
 struct_address = struct.Struct('>{}s32sB'.format(ADDR_SIZE))
 struct_address_idx = struct.Struct('>IQ?')
 struct_coins = struct.Struct('>III')
+struct_address_balance = struct.Struct('>QI')
+struct_address_unspent = struct.Struct('>IQI?')
+struct_spent = struct.Struct('>32sBI')
 
 # constant
 ITER_ORDER = 'big'
 DB_VERSION = 0  # increase if you change database structure
+HEADER_BUILD_CHUNK_SIZE = 10000
+MIN_PRUNE_HEIGHTS = 288  # keep bodies for mature check and peers syncing recent blocks
+PRUNE_CHUNK_SIZE = 500
+STATE_PRUNED_HEIGHT = b'pruned_height'  # bodies of 0 < height < pruned_height are not served
+STATE_PRUNE_PROGRESS = b'prune_progress'  # bodies of 0 < height < prune_progress are deleted
+STATE_ACCOUNT_CHECKPOINT = b'account_checkpoint'  # account balance applied blocks until the height
 
 
 class Tables(object):
     table_config = {
         'txindex': True,
         'addrindex': True,
+        'addrbalance': False,  # balance and unspent-only index of address
+        'spentindex': False,  # outpoint -> spending tx index
+        'prune': 0,  # keep only last N block bodies, 0 is disable
+        'single_db': False,
+        'options': dict(),  # LevelDB options {table: {name: value}}
+        'blockfile': False,  # write blocks to flat files, `_block` keeps locator
+        'utxo_cache_size': UTXO_CACHE_SIZE,  # memory budget of UTXO cache (bytes)
         'timeout': None,
         'sync': False,
     }
     table_list = [
-        "_block",  # [blockhash] -> [height, time, work, b_block, flag, tx_len][txhash0]..[txhashN]
+        "_block",  # [blockhash] -> [height, time, work, b_block, flag, tx_len][txhash0]..[txhashN] or [locator]
         "_tx_index",  # [txhash] -> [height][offset]
         "_unused_index",  # [txhash][txindex] -> [address][coin_id][amount]
         "_block_index",  # [height] -> [blockhash]
         "_address_index",  # [address][txhash][index] -> [coin_id, amount, f_used]
         "_coins",  # [coin_id][height][index] -> [txhash][params, setting]
+        "_block_header",  # [height] -> [blockhash][work][b_block][flag]
+        "_address_balance",  # [address][coin_id] -> [amount][utxo_count]
+        "_address_unspent",  # [address][txhash][index] -> [coin_id][amount][height][f_reward]
+        "_spent_index",  # [txhash][index] -> [spending txhash][input index][height]
+        "_state",  # [name] -> [value]
+    ]
+    # tables read on snapshots while batch is written, bodies by hash never change and state is put directly
+    shielded_list = [name for name in table_list if name not in ('_block', '_state')]
+    # tables added after release, created on old database too
+    added_table_list = [
+        "_block_header",
+        "_address_balance",
+        "_address_unspent",
+        "_spent_index",
+        "_state",
     ]
 
     def __init__(self, **kwargs):
@@ -65,48 +104,346 @@ class Tables(object):
             log.debug('No database directory found')
             os.mkdir(dirs)
             f_create = True
-        self._block = plyvel.DB(os.path.join(dirs, 'block'), create_if_missing=f_create)
-        self._tx_index = plyvel.DB(os.path.join(dirs, 'tx_index'), create_if_missing=f_create)
-        self._unused_index = plyvel.DB(os.path.join(dirs, 'unused_index'), create_if_missing=f_create)
-        self._block_index = plyvel.DB(os.path.join(dirs, 'block_index'), create_if_missing=f_create)
-        self._address_index = plyvel.DB(os.path.join(dirs, 'address_index'), create_if_missing=f_create)
-        self._coins = plyvel.DB(os.path.join(dirs, 'coins'), create_if_missing=f_create)
+        single_path = os.path.join(dirs, SINGLE_DB_NAME)
+        if os.path.exists(single_path):
+            # already migrated, cannot go back to six databases
+            self.table_config['single_db'] = True
+        if self.table_config['single_db']:
+            db_options = merge_db_options([self.get_db_options(name) for name in self.table_list])
+            if not f_create and not os.path.exists(single_path):
+                log.info("migrate six databases to single database")
+                migrate_to_single_db(dirs, {name: self.table_prefix(name) for name in self.table_list},
+                                     **db_options)
+            # all tables on one database, separated by 1byte prefix
+            self._db = plyvel.DB(single_path, create_if_missing=True, **db_options)
+            for name in self.table_list:
+                setattr(self, name, self._db.prefixed_db(self.table_prefix(name)))
+        else:
+            self._db = None
+            for name in self.table_list:
+                setattr(self, name, plyvel.DB(
+                    get_legacy_path(dirs, name),
+                    create_if_missing=f_create or name in self.added_table_list,
+                    **self.get_db_options(name)))
+        # block files, old blocks on LevelDB are readable too
+        self.block_files: Optional[BlockFiles] = None
+        if self.table_config['blockfile'] or os.path.exists(os.path.join(dirs, 'blocks')):
+            self.block_files = BlockFiles(dirs)
         # batch objects
         self.event = asyncio.Event()
         self.event.set()
         self.batch: Dict[str, plyvel._plyvel.WriteBatch] = dict()
+        self.root_batch: Optional[plyvel._plyvel.WriteBatch] = None
         self.batch_task: Optional[asyncio.Task] = None
         self.batch_time = time()
+        # incremented by commit, read views of old generation keep their snapshots
+        self.generation = 0
+        self.writing = False
+        # database handles, shielded table attributes are snapshots while batch is written
+        self.dbs = {name: getattr(self, name) for name in self.table_list}
+        # unused outputs
+        self.utxo_cache = UTXOCache(self._unused_index, self.table_config['utxo_cache_size'])
+        # pruned block bodies
+        self.pruned_height = int.from_bytes(self.read_state(STATE_PRUNED_HEIGHT, b'\x00' * 4), ITER_ORDER)
+        self.prune_progress = int.from_bytes(self.read_state(STATE_PRUNE_PROGRESS, b'\x00\x00\x00\x01'),
+                                             ITER_ORDER)
+        self.prune_task: Optional[asyncio.Future] = None
+        # bodies after the height are needed to apply to accounts, pruning stops before it
+        self.account_checkpoint_height = 0
+        self.account_checkpoint_pending: Optional[int] = None
+        if self.pruned_height and not self.table_config['prune']:
+            log.warning("database is already pruned to {}, old bodies cannot be restored".format(
+                self.pruned_height))
+        # committed block headers
+        self.headers = HeaderArray()
+        self.headers_pending: List[Tuple[int, bytes]] = list()
+        self.load_headers()
+        # (address, coin_id) -> [amount, utxo_count] changed by the batch
+        self.address_balance_pending: Dict[Tuple[bytes, int], List[int]] = defaultdict(lambda: [0, 0])
+        self.check_address_balance()
+        self.check_spent_index()
         log.debug(':create database connect path={}'.format(dirs.replace("\\", "/")))
 
     def close(self):
-        for name in self.table_list:
-            getattr(self, name).close()
+        if self.block_files:
+            self.block_files.close()
+        if self._db is None:
+            for name in self.table_list:
+                getattr(self, name).close()
+        else:
+            self._db.close()
         log.info("close database connection")
 
+    def load_headers(self):
+        """load header array, build `_block_header` from `_block` on first boot after upgrade"""
+        s = time()
+        if next(self._block_header.iterator(include_value=False), None) is None \
+                and next(self._block_index.iterator(include_value=False), None) is not None:
+            log.info("build header table from block table")
+            count = 0
+            batch = self._block_header.write_batch()
+            for b_height, blockhash in self._block_index.iterator():
+                height, work, b_block, flag, _tx_len = struct_block.unpack_from(self.read_block_binary(blockhash))
+                batch.put(bytes(b_height), struct_header.pack(bytes(blockhash), work, b_block, flag))
+                count += 1
+                if count % HEADER_BUILD_CHUNK_SIZE == 0:
+                    batch.write()
+                    batch = self._block_header.write_batch()
+                    log.debug("build header table {} headers".format(count))
+            batch.write()
+        for b_height, b in self._block_header.iterator():
+            self.headers.append_binary(int.from_bytes(b_height, ITER_ORDER), b)
+        log.debug("load {} {}Sec".format(self.headers, round(time() - s, 3)))
+
+    def check_address_balance(self):
+        """build address balance index when enabled, drop when disabled not to be stale"""
+        has_index = next(self._address_unspent.iterator(include_value=False), None) is not None
+        if self.table_config['addrbalance']:
+            if has_index or len(self.headers) == 0:
+                return
+            if self.pruned_height:
+                raise BlockBuilderError('cannot build address balance index, block bodies are pruned')
+            s = time()
+            log.info("build address balance index from {} blocks".format(len(self.headers)))
+            balances = defaultdict(lambda: [0, 0])
+            batch = self._address_unspent.write_batch()
+            count = 0
+            for height in range(len(self.headers)):
+                block = self.read_block(self.headers.get_hash(height))
+                for tx in block.txs:
+                    f_reward = tx.type in (C.TX_POW_REWARD, C.TX_POS_REWARD)
+                    for index, (address, coin_id, amount) in enumerate(tx.outputs):
+                        if self.read_unused_index(tx.hash, index) is None:
+                            continue  # used
+                        b_address = address.binary()
+                        batch.put(b_address + tx.hash + index.to_bytes(1, ITER_ORDER),
+                                  struct_address_unspent.pack(coin_id, amount, height, f_reward))
+                        balances[(b_address, coin_id)][0] += amount
+                        balances[(b_address, coin_id)][1] += 1
+                        count += 1
+                        if count % HEADER_BUILD_CHUNK_SIZE == 0:
+                            batch.write()
+                            batch = self._address_unspent.write_batch()
+            batch.write()
+            batch = self._address_balance.write_batch()
+            for (b_address, coin_id), (amount, utxo_count) in balances.items():
+                batch.put(b_address + coin_id.to_bytes(4, ITER_ORDER),
+                          struct_address_balance.pack(amount, utxo_count))
+            batch.write()
+            log.info("finish address balance index {} unspents {}Sec".format(count, round(time() - s, 3)))
+        elif has_index:
+            log.info("remove address balance index because disabled")
+            self.clear_table('_address_balance')
+            self.clear_table('_address_unspent')
+
+    def check_spent_index(self):
+        """build spent index when enabled, drop when disabled not to be stale"""
+        has_index = next(self._spent_index.iterator(include_value=False), None) is not None
+        if self.table_config['spentindex']:
+            if has_index or len(self.headers) == 0:
+                return
+            if self.pruned_height:
+                raise BlockBuilderError('cannot build spent index, block bodies are pruned')
+            s = time()
+            log.info("build spent index from {} blocks".format(len(self.headers)))
+            batch = self._spent_index.write_batch()
+            count = 0
+            for height in range(len(self.headers)):
+                block = self.read_block(self.headers.get_hash(height))
+                for tx in block.txs:
+                    for input_index, (txhash, txindex) in enumerate(tx.inputs):
+                        batch.put(txhash + txindex.to_bytes(1, ITER_ORDER),
+                                  struct_spent.pack(tx.hash, input_index, height))
+                        count += 1
+                        if count % HEADER_BUILD_CHUNK_SIZE == 0:
+                            batch.write()
+                            batch = self._spent_index.write_batch()
+            batch.write()
+            log.info("finish spent index {} inputs {}Sec".format(count, round(time() - s, 3)))
+        elif has_index:
+            log.info("remove spent index because disabled")
+            self.clear_table('_spent_index')
+
+    def read_state(self, name, default=None) -> Optional[bytes]:
+        b = self._state.get(name, default=None)
+        return default if b is None else bytes(b)
+
+    def write_state(self, name, value):
+        """note: written immediately, not by batch"""
+        self._state.put(name, value, sync=self.table_config['sync'])
+
+    def read_account_checkpoint(self) -> Optional[Tuple[int, bytes, Accounting]]:
+        """(height, blockhash, balance) of blocks applied to accounts, None if not on this chain"""
+        b = self.read_state(STATE_ACCOUNT_CHECKPOINT)
+        if b is None:
+            return None
+        height, blockhash, balance = unpackb(b, raw=True, use_list=False)
+        if self.read_block_hash(height) != blockhash:
+            log.warning("ignore account checkpoint not on chain height={}".format(height))
+            return None
+        if self.is_pruned(height + 1):
+            # blocks after checkpoint cannot be applied again
+            log.warning("ignore account checkpoint {} under pruned {}".format(height, self.pruned_height))
+            return None
+        self.account_checkpoint_height = height
+        movement = Accounting()
+        for user, coin_id, amount in balance:
+            movement[user][coin_id] += amount
+        return height, blockhash, movement
+
+    def write_account_checkpoint(self, height, blockhash, balance: Accounting):
+        """written with the batch if on the way of batch, else immediately"""
+        balance = [(user, coin_id, amount) for user, coins in balance.items() for coin_id, amount in coins]
+        b = packb((height, blockhash, balance), use_bin_type=True)
+        if self.batch:
+            self.batch['_state'].put(STATE_ACCOUNT_CHECKPOINT, b)
+            self.account_checkpoint_pending = height
+        else:
+            self.write_state(STATE_ACCOUNT_CHECKPOINT, b)
+            self.account_checkpoint_height = height
+
+    def is_pruned(self, height) -> bool:
+        """block body of the height is pruned, genesis is always kept"""
+        return 0 < height < self.pruned_height
+
+    def set_pruned(self, height):
+        """mark bodies of 0 < height < pruned_height are already deleted"""
+        self.pruned_height = self.prune_progress = height
+        self.write_state(STATE_PRUNED_HEIGHT, height.to_bytes(4, ITER_ORDER))
+        self.write_state(STATE_PRUNE_PROGRESS, height.to_bytes(4, ITER_ORDER))
+
+    def schedule_prune(self, root_height):
+        """advance pruned height and delete old bodies on background, not over account checkpoint"""
+        if not self.table_config['prune']:
+            return
+        root_height = min(root_height, self.account_checkpoint_height)
+        target = root_height + 1 - max(MIN_PRUNE_HEIGHTS, self.table_config['prune'])
+        if self.pruned_height < target:
+            # advertise first, readers refuse the heights before bodies are deleted
+            self.pruned_height = target
+            self.write_state(STATE_PRUNED_HEIGHT, target.to_bytes(4, ITER_ORDER))
+        if self.prune_progress < self.pruned_height and (self.prune_task is None or self.prune_task.done()):
+            self.prune_task = asyncio.ensure_future(self.prune_blocks())
+
+    async def prune_blocks(self):
+        """delete bodies by small chunks not to stall block insertion"""
+        s = time()
+        start = self.prune_progress
+        if self.block_files:
+            self.keep_genesis_body()
+        while self.prune_progress < self.pruned_height:
+            stop = min(self.pruned_height, self.prune_progress + PRUNE_CHUNK_SIZE)
+            batch = self._block.write_batch()
+            for blockhash in self.read_block_hash_range(self.prune_progress, stop):
+                batch.delete(blockhash)
+            batch.write()
+            self.prune_progress = stop
+            self.write_state(STATE_PRUNE_PROGRESS, stop.to_bytes(4, ITER_ORDER))
+            if self.block_files:
+                locator = self._block.get(self.read_block_hash(stop), default=None)
+                if locator is not None and is_locator(locator):
+                    self.block_files.remove_before(struct_locator.unpack(locator)[0])
+            await asyncio.sleep(0.0)
+        log.info("pruned block bodies {}->{} {}Sec".format(start, self.prune_progress, round(time() - s, 3)))
+
+    def keep_genesis_body(self):
+        """move genesis body from block file to LevelDB, the file will be removed by pruning"""
+        blockhash = self.read_block_hash(0)
+        b = self._block.get(blockhash, default=None)
+        if b is not None and is_locator(b):
+            self._block.put(blockhash, bytes(self.block_files.read(b)), sync=True)
+            log.debug("move genesis body to database")
+
+    def clear_table(self, name):
+        db = getattr(self, name)
+        batch = db.write_batch()
+        for k in db.iterator(include_value=False):
+            batch.delete(k)
+        batch.write()
+
+    def get_db_options(self, name) -> dict:
+        """LevelDB options of the table"""
+        return get_db_options(name, self.table_config['options'])
+
+    def table_prefix(self, name) -> bytes:
+        """key prefix of the table on single database mode"""
+        return self.table_list.index(name).to_bytes(1, ITER_ORDER)
+
     async def batch_create(self):
         assert len(self.batch) == 0, 'batch is already start'
         await asyncio.wait_for(self.event.wait(), self.table_config['timeout'])
         self.event.clear()
         self.batch_time = time()
-        for name in self.table_list:
-            self.batch[name] = getattr(self, name).write_batch(sync=self.table_config['sync'])
+        if self.block_files:
+            self.block_files.begin()
+        if self._db is None:
+            for name in self.table_list:
+                self.batch[name] = getattr(self, name).write_batch(sync=self.table_config['sync'])
+        else:
+            # one atomic batch for all tables
+            self.root_batch = self._db.write_batch(sync=self.table_config['sync'])
+            for name in self.table_list:
+                self.batch[name] = PrefixedWriteBatch(self.root_batch, self.table_prefix(name))
         self.batch_task = asyncio.Task.current_task()
         log.debug(":Create database batch")
 
     async def batch_commit(self):
         assert self.batch, 'Not created batch'
-        for batch in self.batch.values():
-            batch.write()
+        self.utxo_cache.flush(self.batch['_unused_index'])
+        self.flush_address_balance()
+        # readers on event loop see the state before write until cache, headers and memory chain change
+        # views acquired while writing share the snapshots taken here
+        from bc4py.database.view import pin_snapshots
+        snapshots = pin_snapshots()
+        snapshots.refs += 1
+        for name in self.shielded_list:
+            setattr(self, name, snapshots.tables[name])
+        self.utxo_cache.db = self._unused_index
+        self.writing = True
+        try:
+            await aio.write_batch(self._write_batch)
+        finally:
+            self.writing = False
+            for name in self.shielded_list:
+                setattr(self, name, self.dbs[name])
+            self.utxo_cache.db = self._unused_index
+            snapshots.release()
+        self.root_batch = None
+        self.generation += 1
+        self.utxo_cache.commit()
+        if self.account_checkpoint_pending is not None:
+            self.account_checkpoint_height = self.account_checkpoint_pending
+            self.account_checkpoint_pending = None
+        for height, b in self.headers_pending:
+            self.headers.append_binary(height, b)
+        self.headers_pending.clear()
         self.batch.clear()
         self.batch_task = None
         self.event.set()
         log.debug(f"commit success {int((time()-self.batch_time)*1000)}mS")
 
+    def _write_batch(self):
+        """run on I/O thread"""
+        if self.block_files:
+            # blocks must be on disk before locators
+            self.block_files.commit(sync=self.table_config['sync'])
+        if self.root_batch is None:
+            for batch in self.batch.values():
+                batch.write()
+        else:
+            self.root_batch.write()
+
     def batch_rollback(self):
+        if self.block_files:
+            self.block_files.rollback()
         for batch in self.batch.values():
             batch.clear()
         self.batch.clear()
+        self.root_batch = None
+        self.utxo_cache.rollback()
+        self.account_checkpoint_pending = None
+        self.address_balance_pending.clear()
+        self.headers_pending.clear()
         self.batch_task = None
         self.event.set()
         log.debug("Rollback database")
@@ -114,18 +451,33 @@ class Tables(object):
     def is_batch_thread(self):
         return 0 < len(self.batch) and self.batch_task is asyncio.Task.current_task()
 
-    def read_block(self, blockhash):
-        b = self._block.get(blockhash, default=None)
+    def read_block_binary(self, blockhash, db=None):
+        """serialized block, memoryview of block file or bytes of LevelDB, db is `_block` or its snapshot"""
+        if self.pruned_height:
+            height = self.headers.get_height(blockhash)
+            if height is not None and self.is_pruned(height):
+                return None
+        b = (db or self._block).get(blockhash, default=None)
+        if b is None:
+            return None
+        elif is_locator(b):
+            return self.block_files.read(b)
+        else:
+            return b
+
+    def read_block(self, blockhash, db=None) -> Optional[LazyBlock]:
+        """return block, txs are decoded when accessed"""
+        b = self.read_block_binary(blockhash, db)
         if b is None:
             return None
-        b = bytes(b)
         offset = 0
         height, work, b_block, flag, tx_len = struct_block.unpack_from(b, offset)
         offset += struct_block.size
-        block = Block.from_binary(binary=b_block)
+        block = LazyBlock.from_binary(binary=b_block)
         block.height = height
         block.work_hash = work
         block.flag = flag
+        raw_txs = list()
         for _ in range(tx_len):
             bin_len, sign_len, r_len = struct_tx.unpack_from(b, offset)
             offset += struct_tx.size
@@ -135,29 +487,30 @@ class Tables(object):
             offset += sign_len
             R = b[offset:offset+r_len]
             offset += r_len
-            tx = TX.from_binary(binary=b_tx)
-            tx.height = height
-            tx.signature = bin2signature(b_sign)
-            tx.R = R
-            block.txs.append(tx)
+            raw_txs.append((b_tx, b_sign, R))
         assert offset == len(b), "Block size on database is not match {}={}".format(offset, len(b))
+        block.raw_txs = raw_txs
         return block
 
-    def read_block_header(self, blockhash):
-        b = self._block.get(blockhash, default=None)
-        if b is None:
-            return None
-        b = bytes(b)
-        height, work, b_block, flag, tx_len = struct_block.unpack_from(b)
-        return get_block_header_from_bin(height, work, b_block, flag)
+    def read_block_many(self, blockhashs) -> List[Optional[LazyBlock]]:
+        """read blocks on one snapshot, not broken by commit or prune on the way"""
+        snapshot = self._block.snapshot()
+        try:
+            return [self.read_block(blockhash, snapshot) for blockhash in blockhashs]
+        finally:
+            snapshot.close()
 
-    def read_block_hash(self, height):
-        b_height = height.to_bytes(4, ITER_ORDER)
-        b = self._block_index.get(b_height, default=None)
-        if b is None:
-            return None
-        else:
-            return bytes(b)
+    def read_block_header(self, blockhash) -> Optional[BlockHeader]:
+        """header from memory array, block body is not read"""
+        return self.headers.get_header_by_hash(blockhash)
+
+    def read_block_hash(self, height) -> Optional[bytes]:
+        return self.headers.get_hash(height)
+
+    def read_block_hash_range(self, start, stop) -> List[bytes]:
+        """blockhash list of height start <= height < stop"""
+        stop = min(stop, len(self.headers))
+        return [self.headers.get_hash(height) for height in range(max(0, start), stop)]
 
     def read_block_hash_iter(self, start_height=0):
         start = start_height.to_bytes(4, ITER_ORDER)
@@ -179,13 +532,34 @@ class Tables(object):
         if blockhash is None:
             return None
         # blockhash -> block_bin
-        b = self._block.get(blockhash, default=None)
+        b = self.read_block_binary(blockhash)
         if b is None:
             return None
-        # block_bin -> tx
+        return self._read_tx_from_block_binary(b, offset, txhash, int.from_bytes(b_height, ITER_ORDER))
+
+    def read_tx_many(self, txhashs: Iterable[bytes]) -> Dict[bytes, Optional[TX]]:
+        """read txs by one index sweep, txs in a same block share one block read"""
+        result = dict.fromkeys(txhashs)
+        # height -> [(txhash, offset),..]
+        positions = defaultdict(list)
+        for txhash, b in seek_many(self._tx_index, result):
+            if b is not None:
+                b_height, offset = struct.unpack('>4sI', b)
+                positions[int.from_bytes(b_height, ITER_ORDER)].append((txhash, offset))
+        # height -> block_bin -> tx
+        for height in sorted(positions):
+            blockhash = self.read_block_hash(height)
+            b = None if blockhash is None else self.read_block_binary(blockhash)
+            if b is None:
+                continue
+            for txhash, offset in positions[height]:
+                result[txhash] = self._read_tx_from_block_binary(b, offset, txhash, height)
+        return result
+
+    def _read_tx_from_block_binary(self, b, offset, txhash, height) -> Optional[TX]:
         bin_len, sign_len, r_len = struct_tx.unpack_from(b, offset)
         offset += struct_tx.size
-        b_tx = b[offset:offset + bin_len]
+        b_tx = bytes(b[offset:offset + bin_len])
         offset += bin_len
         b_sign = b[offset:offset + sign_len]
         offset += sign_len
@@ -194,9 +568,9 @@ class Tables(object):
         if txhash != sha256d_hash(b_tx):
             return None  # will be forked
         tx = TX.from_binary(binary=b_tx)
-        tx.height = int.from_bytes(b_height, ITER_ORDER)
+        tx.height = height
         tx.signature = bin2signature(b_sign)
-        tx.R = R
+        tx.R = bytes(R)
         return tx
 
     def have_tx(self, txhash) -> bool:
@@ -208,14 +582,16 @@ class Tables(object):
     def read_unused_index(self, txhash, txindex) -> Optional[Tuple[PyAddress, int, int]]:
         """return unused outputs info"""
         key = txhash + txindex.to_bytes(1, ITER_ORDER)
-        b = self._unused_index.get(key, default=None)
         # return None -> not found or already used
         # return tuple -> unused
-        if b is None:
-            return None
-        else:
-            b_address, coin_id, amount = struct_unused_idx.unpack(b)
-            return PyAddress.from_binary(V.BECH32_HRP, b_address), coin_id, amount
+        return self.utxo_cache.get(key, with_dirty=self.is_batch_thread())
+
+    def read_unused_index_many(self, pairs: Iterable[Tuple[bytes, int]]) \
+            -> Dict[Tuple[bytes, int], Optional[Tuple[PyAddress, int, int]]]:
+        """return unused outputs info of many inputs, database is read by one sweep"""
+        keys = {txhash + txindex.to_bytes(1, ITER_ORDER): (txhash, txindex) for txhash, txindex in pairs}
+        outputs = self.utxo_cache.get_many(keys, with_dirty=self.is_batch_thread())
+        return {pair: outputs[key] for key, pair in keys.items()}
 
     def read_address_idx(self, address: PyAddress, txhash, index):
         k = address.binary() + txhash + index.to_bytes(1, ITER_ORDER)
@@ -236,6 +612,37 @@ class Tables(object):
             # address, txhash, index, coin_id, amount, f_used
             yield struct_address.unpack(k) + struct_address_idx.unpack(v)
 
+    def read_address_balance(self, address: PyAddress) -> Dict[int, Tuple[int, int]]:
+        """return {coin_id: (amount, utxo_count)} of address on database"""
+        data = dict()
+        for k, v in self._address_balance.iterator(prefix=address.binary()):
+            coin_id = int.from_bytes(k[-4:], ITER_ORDER)
+            data[coin_id] = struct_address_balance.unpack(v)
+        return data
+
+    def read_address_unspent_iter(self, address: PyAddress):
+        """unspent outputs of address on database"""
+        b_address = address.binary()
+        for k, v in self._address_unspent.iterator(prefix=b_address):
+            k = bytes(k)
+            txhash, index = k[ADDR_SIZE:ADDR_SIZE+32], k[-1]
+            # txhash, index, coin_id, amount, height, f_reward
+            yield (txhash, index) + struct_address_unspent.unpack(v)
+
+    def read_spent_index(self, txhash, txindex) -> Optional[Tuple[bytes, int, int]]:
+        """return (spending txhash, input index, height) or None if unspent or not indexed"""
+        b = self._spent_index.get(txhash + txindex.to_bytes(1, ITER_ORDER), default=None)
+        if b is None:
+            return None
+        return struct_spent.unpack(b)
+
+    def read_spent_index_many(self, pairs: Iterable[Tuple[bytes, int]]) \
+            -> Dict[Tuple[bytes, int], Optional[Tuple[bytes, int, int]]]:
+        """batched `read_spent_index`, database is read by one sweep"""
+        keys = {txhash + txindex.to_bytes(1, ITER_ORDER): (txhash, txindex) for txhash, txindex in pairs}
+        return {keys[key]: (None if b is None else struct_spent.unpack(b))
+                for key, b in seek_many(self._spent_index, keys)}
+
     def read_coins_iter(self, coin_id):
         b_coin_id = coin_id.to_bytes(4, ITER_ORDER)
         start = b_coin_id + b'\x00'*8
@@ -269,21 +676,26 @@ class Tables(object):
             b += b_sign
             b += tx.R
             # log.debug("Insert new tx {}".format(tx))
+        if self.table_config['blockfile']:
+            # LevelDB keeps only locator
+            b = self.block_files.append(b)
         self.batch['_block'].put(block.hash, b)
         self.batch['_block_index'].put(b_height, block.hash)
+        b_header = struct_header.pack(block.hash, block.work_hash, block.b, block.flag)
+        self.batch['_block_header'].put(b_height, b_header)
+        self.headers_pending.append((block.height, b_header))
         log.debug("Insert new block {}".format(block))
 
     def write_unused_index(self, txhash, txindex, address, coin_id, amount):
         assert self.is_batch_thread()
         assert isinstance(address, PyAddress)
         k = txhash + txindex.to_bytes(1, ITER_ORDER)
-        v = struct_unused_idx.pack(address.binary(), coin_id, amount)
-        self.batch['_unused_index'].put(k, v)
+        self.utxo_cache.put(k, (address, coin_id, amount))
 
     def remove_unused_index(self, txhash, txindex):
         assert self.is_batch_thread()
         k = txhash + txindex.to_bytes(1, ITER_ORDER)
-        self.batch['_unused_index'].delete(k)
+        self.utxo_cache.delete(k)
 
     def write_address_idx(self, address: PyAddress, txhash, index, coin_id, amount, f_used):
         assert self.is_batch_thread()
@@ -292,6 +704,46 @@ class Tables(object):
         self.batch['_address_index'].put(k, v)
         log.debug("Insert new address idx {}".format(address))
 
+    def write_address_unspent(self, address: PyAddress, txhash, index, coin_id, amount, height, f_reward):
+        assert self.is_batch_thread()
+        b_address = address.binary()
+        k = b_address + txhash + index.to_bytes(1, ITER_ORDER)
+        v = struct_address_unspent.pack(coin_id, amount, height, f_reward)
+        self.batch['_address_unspent'].put(k, v)
+        pending = self.address_balance_pending[(b_address, coin_id)]
+        pending[0] += amount
+        pending[1] += 1
+
+    def remove_address_unspent(self, address: PyAddress, txhash, index, coin_id, amount):
+        assert self.is_batch_thread()
+        b_address = address.binary()
+        k = b_address + txhash + index.to_bytes(1, ITER_ORDER)
+        self.batch['_address_unspent'].delete(k)
+        pending = self.address_balance_pending[(b_address, coin_id)]
+        pending[0] -= amount
+        pending[1] -= 1
+
+    def flush_address_balance(self):
+        """add balance changes of the batch to database values"""
+        for (b_address, coin_id), (amount, utxo_count) in self.address_balance_pending.items():
+            k = b_address + coin_id.to_bytes(4, ITER_ORDER)
+            b = self._address_balance.get(k, default=None)
+            if b is not None:
+                old_amount, old_count = struct_address_balance.unpack(b)
+                amount += old_amount
+                utxo_count += old_count
+            if utxo_count == 0:
+                assert amount == 0, "no unspent but remain amount {}".format(amount)
+                self.batch['_address_balance'].delete(k)
+            else:
+                self.batch['_address_balance'].put(k, struct_address_balance.pack(amount, utxo_count))
+        self.address_balance_pending.clear()
+
+    def write_spent_index(self, txhash, txindex, spent_txhash, input_index, height):
+        assert self.is_batch_thread()
+        k = txhash + txindex.to_bytes(1, ITER_ORDER)
+        self.batch['_spent_index'].put(k, struct_spent.pack(spent_txhash, input_index, height))
+
     def write_coins(self, coin_id, height, index, txhash, params, setting):
         assert self.is_batch_thread()
         k = struct_coins.pack(coin_id, height, index)
@@ -322,20 +774,43 @@ class ChainBuilder(object):
         self.best_chain: Optional[List[Block]] = None
         self.root_block: Optional[Block] = None
         self.best_block: Optional[Block] = None
+        self.fork_tree: Optional[ForkTree] = None
+        self.journal: Optional[Journal] = None
+        # indexes of best_chain, replaced with it by `set_best_chain()`
+        self.best_height2block: Dict[int, Block] = dict()
+        self.best_hash2index: Dict[bytes, int] = dict()
+        # outputs created and spent by best_chain, updated in place with it
+        self.best_overlay = MemoryOverlay()
+        # (best_chain of fork, best_chain of base, fork overlay) of last `get_overlay()`
+        self.fork_overlay_cache: Optional[tuple] = None
+        # background batch apply
+        self.flush_task: Optional[asyncio.Future] = None
+        self.flush_lock = asyncio.Lock()
 
     async def close(self):
         # require manual close
+        if self.flush_task and not self.flush_task.done():
+            await self.flush_task
         if obj.tables.batch_task:
             await obj.tables.batch_task
+        if obj.tables.prune_task and not obj.tables.prune_task.done():
+            # progress is recorded by chunk, restart from it
+            obj.tables.prune_task.cancel()
+            await asyncio.wait([obj.tables.prune_task])
+        if self.journal:
+            self.journal.close()
         obj.tables.close()
 
-    async def init(self, genesis_block: Block, batch_size=None):
+    async def init(self, genesis_block: Block, batch_size=None, verify_level=None):
         assert obj.tables, 'Why database connection failed?'
         # return status
         # True  = Only genesisBlock, recommend to import bootstrap.dat.gz first
         # False = Many blocks in LevelDB, sync by network
+        # verify_level: None = check header linkage, `header`/`pow`/`full` = parallel verification
         if batch_size is None:
             batch_size = self.cache_limit
+        if is_importing():
+            raise BlockBuilderError("snapshot import is interrupted, import the snapshot again")
         # GenesisBlockか確認
         t = time()
         try:
@@ -352,7 +827,10 @@ class ChainBuilder(object):
             self.root_block = Block()
             self.root_block.hash = b'\xff' * 32
             self.chain[genesis_block.hash] = genesis_block
-            self.best_chain = [genesis_block]
+            self.fork_tree = ForkTree(self.root_block)
+            self.fork_tree.add(genesis_block)
+            self.journal = Journal(obj.tables.dirs)
+            self.set_best_chain([genesis_block], connect=(genesis_block,))
             self.best_block = genesis_block
             log.info("Set dummy block, genesisBlock={}".format(genesis_block))
             async with create_db(V.DB_ACCOUNT_PATH) as db:
@@ -363,22 +841,48 @@ class ChainBuilder(object):
 
         async with create_db(V.DB_ACCOUNT_PATH) as db:
             cur = await db.cursor()
-            await obj.account_builder.init(cur=cur)
+            last_height = len(obj.tables.headers) - 1
+            checkpoint = obj.tables.read_account_checkpoint()
+            if checkpoint is None:
+                # move logs of txs on database are the balance, no block is applied again
+                applied_height = last_height
+                await obj.account_builder.init(cur=cur)
+            else:
+                applied_height, _, balance = checkpoint
+                await obj.account_builder.init(cur=cur, checkpoint=balance)
             # 0HeightよりBlockを取得して確認
             before_block = genesis_block
+            before_hash, before_height = genesis_block.hash, genesis_block.height
             batch_blocks = list()
-            for height, blockhash in obj.tables.read_block_hash_iter(start_height=1):
-                block = obj.tables.read_block(blockhash)
-                if block.previous_hash != before_block.hash:
-                    raise BlockBuilderError("PreviousHash != BlockHash [{}!={}]".format(block, before_block))
+            # bodies are pruned or already applied to accounts, check headers only
+            start_height = max(1, min(max(obj.tables.pruned_height, applied_height), last_height))
+            if verify_level is None:
+                for height in range(1, start_height):
+                    header = obj.tables.headers.get_header(height)
+                    if header is None or header.previous_hash != before_hash:
+                        raise BlockBuilderError("PreviousHash != BlockHash on header {}".format(height))
+                    before_hash, before_height = obj.tables.read_block_hash(height), height
+            else:
+                from bc4py.database.verify import verify_chain
+                await aio.run_io('verify_chain', verify_chain, obj.tables, verify_level, 1, last_height + 1)
+                before_hash, before_height = obj.tables.read_block_hash(start_height - 1), start_height - 1
+            log.debug("check {} headers {}Sec".format(start_height, round(time() - t, 3)))
+            async for height, block in aio.read_block_iter(start_height, last_height + 1):
+                if block is None:
+                    raise BlockBuilderError("Not found block body on height {}".format(height))
+                elif block.previous_hash != before_hash:
+                    raise BlockBuilderError("PreviousHash != BlockHash [{}!={}]".format(block, before_hash.hex()))
                 elif block.height != height:
                     raise BlockBuilderError("BlockHeight != DBHeight [{}!={}]".format(block.height, height))
-                elif height != before_block.height + 1:
+                elif height != before_height + 1:
                     raise BlockBuilderError("DBHeight != BeforeHeight+1 [{}!={}+1]".format(
-                        height, before_block.height))
+                        height, before_height))
 
                 # confirm the block
                 before_block = block
+                before_hash, before_height = block.hash, block.height
+                if height <= applied_height:
+                    continue
                 batch_blocks.append(block)
                 if len(batch_blocks) >= batch_size:
                     await obj.account_builder.new_batch_apply(cur=cur, batched_blocks=batch_blocks)
@@ -386,108 +890,79 @@ class ChainBuilder(object):
                     log.debug("AccountBuilder batched at {} height".format(block.height))
             # load and rebuild memory section
             self.root_block = before_block
-            memorized_blocks, self.best_block = self.recover_from_memory_file(before_block)
+            self.fork_tree = ForkTree(self.root_block)
+            self.journal = Journal(obj.tables.dirs)
+            for block in self.recover_memory(before_block):
+                self.chain[block.hash] = block
+                self.fork_tree.add(block)
+            memorized_blocks = list(reversed(self.fork_tree.best_chain()))
+            self.best_block = memorized_blocks[-1] if memorized_blocks else self.root_block
+            # AccountBuilder update, memory blocks are not on database balance
+            await obj.account_builder.new_batch_apply(cur=cur, batched_blocks=batch_blocks)
             # Memory化されたChainを直接復元
             for block in memorized_blocks:
-                batch_blocks.append(block)
-                self.chain[block.hash] = block
+                for tx in block.txs:
+                    tx.height = block.height
                 for tx in block.txs:
                     await obj.account_builder.affect_new_tx(cur=cur, tx=tx)
                     if tx.hash not in obj.tx_builder.chained_tx:
                         obj.tx_builder.chained_tx[tx.hash] = tx
                     if obj.tx_builder.memory_pool.exist(tx.hash):
-                        obj.tx_builder.memory_pool.remove(tx.hash)
-            self.best_chain = list(reversed(memorized_blocks))
-            # AccountBuilder update
-            await obj.account_builder.new_batch_apply(cur=cur, batched_blocks=batch_blocks)
+                        obj.tx_builder.remove_unconfirmed(tx.hash)
+            self.set_best_chain(list(reversed(memorized_blocks)), connect=memorized_blocks)
             await db.commit()
+        if checkpoint is None or applied_height < self.root_block.height:
+            obj.tables.write_account_checkpoint(
+                self.root_block.height, self.root_block.hash, obj.account_builder.chain_balance)
         log.info("Init finished, last block is {} {}Sec".format(before_block, round(time() - t, 3)))
         return False
 
-    def write_to_memory_file(self, new_block: Block):
-        """add new block to memory_file"""
-        path = os.path.join(obj.tables.dirs, 'memory.mpac')
+    def write_to_journal(self, new_block: Block):
+        """add new block to memory journal"""
         try:
-            if new_block.height % C.MEMORY_FILE_REFRESH_SPAN == 0:
-                # clear
-                with open(path, mode='bw') as fp:
-                    for block in reversed(self.best_chain):
-                        bc4py_msgpack.dump((block, block.work_hash), fp)
-                log.debug(f"refresh memory_file height={new_block.height}")
-            else:
-                # append
-                with open(path, mode='ba') as fp:
-                    bc4py_msgpack.dump((new_block, new_block.work_hash), fp)
+            self.journal.append(new_block)
         except Exception as e:
             log.warning(f"failed to recode memory block by '{str(e)}'")
 
-    def recover_from_memory_file(self, root_block: Block) -> (List[Block], Block):
-        """recover memory from memory_file"""
+    def recover_memory(self, root_block: Block) -> List[Block]:
+        """recover memory blocks from journal, old memory file is moved to journal"""
+        s = time()
+        blocks = self.journal.recover(root_block)
         path = os.path.join(obj.tables.dirs, 'memory.mpac')
-        memorized_blocks = list()
-        if not os.path.exists(path):
-            log.debug("no memory file found")
-            return memorized_blocks, root_block
-        try:
-            with open(path, mode='br') as fp:
-                block_list: List[Block] = list()
-                for block, work_hash in reversed(tuple(bc4py_msgpack.stream_unpacker(fp))):
-                    block.work_hash = work_hash
-                    if len(block_list) == 0 or block.hash == block_list[0].previous_hash:
-                        block_list.insert(0, block)
-                for block in block_list:
-                    if root_block.hash == block.previous_hash:
-                        memorized_blocks.append(block)
-                        root_block = block
-        except Exception:
-            log.warning(f"failed to recover from memory_file", exc_info=True)
-        return memorized_blocks, root_block
+        if os.path.exists(path):
+            if len(blocks) == 0:
+                blocks = read_memory_file(path, root_block)
+                for block in blocks:
+                    self.journal.append(block)
+            os.remove(path)
+            log.info("move memory file to journal {} blocks".format(len(blocks)))
+        log.debug("recover {} memory blocks from {} {}Sec".format(len(blocks), self.journal, round(time() - s, 3)))
+        return blocks
+
+    async def dump_snapshot(self, path) -> Tuple[int, bytes]:
+        """dump UTXO snapshot of root block, return height and commitment"""
+        assert self.root_block and self.root_block.height is not None, 'Do not init'
+        return await dump_snapshot(path)
 
     def get_best_chain(self, best_block=None):
         assert self.root_block, 'Do not init'
         if best_block:
-            best_sets = {best_block}
-            previous_hash = best_block.previous_hash
-            while self.root_block.hash != previous_hash:
-                if previous_hash not in self.chain:
-                    raise BlockBuilderError('Cannot find previousHash, may not main-chain. {}'.format(
-                        previous_hash.hex()))
-                block = self.chain[previous_hash]
-                previous_hash = block.previous_hash
-                best_sets.add(block)
+            if best_block.hash in self.fork_tree:
+                best_chain = self.fork_tree.chain_of(best_block.hash)
+            elif best_block.previous_hash == self.root_block.hash:
+                best_chain = [best_block]
+            elif best_block.previous_hash in self.fork_tree:
+                # not inserted yet, on the check
+                best_chain = [best_block] + self.fork_tree.chain_of(best_block.previous_hash)
+            else:
+                raise BlockBuilderError('Cannot find previousHash, may not main-chain. {}'.format(
+                    best_block.previous_hash.hex()))
             # best_chain = [<height=n>, <height=n-1>, ...]
-            best_chain = sorted(best_sets, key=lambda x: x.height, reverse=True)
             return best_block, best_chain
         # BestBlockがchainにおける
-        best_score = 0.0
-        best_block = None
-        best_sets = set()
-        for block in sorted(self.chain.values(), key=lambda x: x.create_time, reverse=True):
-            if block in best_sets:
-                continue
-            tmp_best_score = block.score
-            tmp_best_block = block
-            tmp_best_sets = {block}
-            while block.previous_hash in self.chain:
-                block = self.chain[block.previous_hash]
-                tmp_best_score += block.score
-                tmp_best_sets.add(block)
-            else:
-                if self.root_block.hash != block.previous_hash:
-                    continue
-            if best_score > tmp_best_score:
-                continue
-            best_score = tmp_best_score
-            best_block = tmp_best_block
-            best_sets = tmp_best_sets
-        # txのheightを揃える
-        for block in best_sets:
-            for tx in block.txs:
-                tx.height = block.height
-        assert best_block, 'Cannot find best_block on get_best_chain? chain={}'.format(list(self.chain.values()))
+        assert self.fork_tree.best, 'Cannot find best_block on get_best_chain? {}'.format(self.fork_tree)
         # best_chain = [<height=n>, <height=n-1>, ...]
-        best_chain = sorted(best_sets, key=lambda x: x.height, reverse=True)
-        return best_block, best_chain
+        return self.fork_tree.best.block, self.fork_tree.best_chain()
 
     async def batch_apply(self):
         # 無チェックで挿入するから要注意
@@ -496,18 +971,13 @@ class ChainBuilder(object):
         # cache許容量を上回っているので記録
         await obj.tables.batch_create()
         log.debug("Start batch apply chain={}".format(len(self.chain)))
-        best_chain = self.best_chain.copy()
-        batch_count = self.batch_size
-        batched_blocks = list()
-        unused_index_cache = dict()
+        # 古いものから順に, new blocks cannot reorg them until commit
+        batched_blocks = list(reversed(self.best_chain[-self.batch_size:]))
+        self.fork_tree.pin(batched_blocks[-1].hash)
         async with create_db(V.DB_ACCOUNT_PATH) as db:
             cur = await db.cursor()
             try:
-                block = None
-                while batch_count > 0 and len(best_chain) > 0:
-                    batch_count -= 1
-                    block = best_chain.pop()  # 古いものから順に
-                    batched_blocks.append(block)
+                for block in batched_blocks:
                     assert len(block.txs) > 0, "found no tx in {}".format(block)
 
                     account_tx = set()
@@ -522,10 +992,7 @@ class ChainBuilder(object):
                         # inputs
                         for index, pair in enumerate(tx.inputs):
                             txhash, txindex = pair
-                            if pair in unused_index_cache:
-                                address, coin_id, amount = unused_index_cache.pop(pair)
-                            else:
-                                address, coin_id, amount = obj.tables.read_unused_index(txhash, txindex)
+                            address, coin_id, amount = obj.tables.read_unused_index(txhash, txindex)
                             # add address index only you need or add all index
                             if is_account_tx:
                                 is_account_input = (await read_address2userid(address=address, cur=cur)) is not None
@@ -535,6 +1002,10 @@ class ChainBuilder(object):
                                 obj.tables.write_address_idx(address, txhash, txindex, coin_id, amount, True)
                             # remove unused output index
                             obj.tables.remove_unused_index(txhash, txindex)
+                            if obj.tables.table_config['addrbalance']:
+                                obj.tables.remove_address_unspent(address, txhash, txindex, coin_id, amount)
+                            if obj.tables.table_config['spentindex']:
+                                obj.tables.write_spent_index(txhash, txindex, tx.hash, index, block.height)
 
                         # outputs
                         for index, (address, coin_id, amount) in enumerate(tx.outputs):
@@ -547,7 +1018,10 @@ class ChainBuilder(object):
                                 obj.tables.write_address_idx(address, tx.hash, index, coin_id, amount, False)
                             # add unused output index
                             obj.tables.write_unused_index(tx.hash, index, address, coin_id, amount)
-                            unused_index_cache[(tx.hash, index)] = (address, coin_id, amount)
+                            if obj.tables.table_config['addrbalance']:
+                                obj.tables.write_address_unspent(
+                                    address, tx.hash, index, coin_id, amount, block.height,
+                                    tx.type in (C.TX_POW_REWARD, C.TX_POS_REWARD))
 
                         # TXの種類による追加操作
                         if tx.type == C.TX_GENESIS:
@@ -568,10 +1042,21 @@ class ChainBuilder(object):
                     # write block with txindex
                     obj.tables.write_block(block, account_tx)
 
+                # balance after the batch is recorded atomically with blocks
+                # blocks after checkpoint are applied again on boot, their bodies are not pruned until committed
+                obj.tables.write_account_checkpoint(
+                    batched_blocks[-1].height, batched_blocks[-1].hash,
+                    await obj.account_builder.get_batch_balance(cur=cur, batched_blocks=batched_blocks))
                 # block挿入終了
-                self.best_chain = best_chain
-                self.root_block = block
                 await obj.tables.batch_commit()
+                # root moves with database generation
+                self.root_block = batched_blocks[-1]
+                # dead forks are not linked to new root
+                for block in self.fork_tree.set_root(self.root_block):
+                    self.chain.pop(block.hash, None)
+                self.fork_tree.unpin()
+                self.set_best_chain(self.fork_tree.best_chain(), disconnect=batched_blocks)
+                self.journal.truncate(self.root_block.height)
                 # root_blockよりHeightの小さいBlockを消す
                 for blockhash, block in self.chain.copy().items():
                     if self.root_block.height >= block.height:
@@ -580,11 +1065,38 @@ class ChainBuilder(object):
                 # アカウントへ反映↓
                 await obj.account_builder.new_batch_apply(cur=cur, batched_blocks=batched_blocks)
                 await db.commit()
+                obj.tables.schedule_prune(self.root_block.height)
                 return batched_blocks  # [<height=n>, <height=n+1>, .., <height=n+m>]
             except Exception as e:
                 obj.tables.batch_rollback()
                 log.warning("Failed batch block builder. '{}'".format(e), exc_info=True)
                 return list()
+            finally:
+                old_best = self.fork_tree.best
+                if self.fork_tree.unpin():
+                    # failed batch, a fork arrived while pinned has higher score
+                    self.switch_best(old_best)
+
+    def schedule_batch_apply(self):
+        """start background flush of old blocks if memory cache is full"""
+        if self.cache_limit <= len(self.chain) and (self.flush_task is None or self.flush_task.done()):
+            self.flush_task = asyncio.ensure_future(self.flush_memory())
+
+    async def flush_memory(self):
+        """batch apply until memory cache is under the limit, new blocks are accepted meanwhile"""
+        async with self.flush_lock:
+            while self.cache_limit <= len(self.chain):
+                s = time()
+                if len(await self.batch_apply()) == 0:
+                    break
+                log.debug("flush memory {}Sec chain={}".format(round(time() - s, 3), len(self.chain)))
+
+    async def wait_for_flush(self):
+        """backpressure, wait flush only when memory is over the limit by a batch"""
+        if self.cache_limit + self.batch_size <= len(self.chain) \
+                and self.flush_task is not None and not self.flush_task.done():
+            log.debug("wait for flush chain={}".format(len(self.chain)))
+            await asyncio.shield(self.flush_task)
 
     def new_block(self, new_block):
         """insert new block, Block/TX format is already checked"""
@@ -594,31 +1106,31 @@ class ChainBuilder(object):
         # meet chain order: root_block < new_block
         self.chain[new_block.hash] = new_block
         # BestChainの変化を調べる
-        new_best_block, new_best_chain = self.get_best_chain()
-        if self.best_block and new_best_block == self.best_block:
+        old_best = self.fork_tree.best
+        if not self.fork_tree.add(new_block):
             return  # 操作を加える必要は無い
+        self.switch_best(old_best)
+        self.write_to_journal(new_block)
+
+    def switch_best(self, old_best):
+        """apply best tip changed on fork tree"""
+        # old tip -> common ancestor -> new tip
+        disconnect, connect = self.fork_tree.reorg(old_best, self.fork_tree.best)
         # tx heightを合わせる
-        old_best_chain = self.best_chain.copy()
-        new_best_sets = set(new_best_chain) - set(old_best_chain)
-        old_best_sets = set(old_best_chain) - set(new_best_chain)
-        for index, block in enumerate(old_best_sets):
-            try:
-                old_best_chain[index + 1].next_hash = None
-            except IndexError:
-                pass
+        for block in disconnect:
+            block.next_hash = None
             for tx in block.txs:
                 tx.height = None
-        for index, block in enumerate(new_best_sets):
-            try:
-                new_best_chain[index + 1].next_hash = block.hash
-            except IndexError:
-                pass
+        fork_block = self.chain.get(connect[0].previous_hash, self.root_block)
+        for block in connect:
+            fork_block.next_hash = block.hash
+            fork_block = block
             for tx in block.txs:
                 tx.height = block.height
         # 変化しているので反映する
-        self.best_block, self.best_chain = new_best_block, new_best_chain
-        obj.tx_builder.affect_new_chain(new_best_sets=new_best_sets, old_best_sets=old_best_sets)
-        self.write_to_memory_file(new_block)
+        self.best_block = self.fork_tree.best.block
+        self.set_best_chain(self.fork_tree.best_chain(), disconnect=disconnect, connect=connect)
+        obj.tx_builder.affect_new_chain(new_best_sets=connect, old_best_sets=disconnect)
 
     def get_block(self, blockhash=None, height=None):
         if height is not None:
@@ -634,6 +1146,24 @@ class ChainBuilder(object):
             block = obj.tables.read_block(blockhash)
         return block
 
+    async def get_block_range(self, start, stop) -> List[Block]:
+        """blocks of start <= height < stop, database blocks are read on I/O thread"""
+        blocks = list()
+        blockhashs = list()
+        for height in range(start, stop):
+            blockhash = self.get_block_hash(height=height)
+            if blockhash is None:
+                break
+            blockhashs.append(blockhash)
+        db_hashs = [blockhash for blockhash in blockhashs if blockhash not in self.chain]
+        db_blocks = dict(zip(db_hashs, await aio.read_block_many(db_hashs))) if db_hashs else dict()
+        for blockhash in blockhashs:
+            block = self.chain[blockhash] if blockhash in self.chain else db_blocks[blockhash]
+            if block is None:
+                break
+            blocks.append(block)
+        return blocks
+
     def get_block_header(self, blockhash=None, height=None):
         if height is not None:
             blockhash = self.get_block_hash(height=height)
@@ -650,15 +1180,69 @@ class ChainBuilder(object):
             block_header = obj.tables.read_block_header(blockhash)
         return block_header
 
+    def set_best_chain(self, best_chain: List[Block], disconnect=(), connect=()):
+        """
+        replace best_chain with its height and hash indexes, overlay is updated in place by the difference
+        cost is related to changed blocks only, applied blocks are undone if failed on the way
+        """
+        overlay = self.best_overlay
+        undo = list()
+        try:
+            for block in disconnect:
+                undo.append((overlay.connect, block))
+                overlay.disconnect(block)
+            for block in connect:
+                undo.append((overlay.disconnect, block))
+                overlay.connect(block)
+        except Exception:
+            for fnc, block in reversed(undo):
+                fnc(block)
+            raise
+        self.best_height2block = {block.height: block for block in best_chain}
+        self.best_hash2index = {block.hash: index for index, block in enumerate(best_chain)}
+        self.best_chain = best_chain
+
+    def get_overlay(self, best_chain: List[Block] = None):
+        """
+        overlay of the chain, a fork is delta from best chain
+        note: best overlay is updated in place by new block, do not keep it over await
+        """
+        if best_chain is None or best_chain is self.best_chain:
+            return self.best_overlay
+        cache = self.fork_overlay_cache
+        if cache and cache[0] is best_chain and cache[1] is self.best_chain:
+            return cache[2]
+        # walk to the block on best chain
+        connect = list()
+        for block in best_chain:
+            index = self.best_hash2index.get(block.hash)
+            if index is not None:
+                break
+            connect.append(block)
+        else:
+            if best_chain and best_chain[-1].previous_hash != self.root_block.hash:
+                # root moved after the chain is taken
+                return MemoryOverlay.from_blocks(reversed(best_chain))
+            index = len(self.best_chain)
+        if index == 0 and len(connect) == 0:
+            return self.best_overlay
+        overlay = ForkOverlay(self.best_overlay, self.best_chain[:index], reversed(connect))
+        self.fork_overlay_cache = (best_chain, self.best_chain, overlay)
+        return overlay
+
+    def is_best_block(self, block: Block) -> bool:
+        """block is on memory section of best chain"""
+        return block.hash in self.best_hash2index
+
     def get_block_hash(self, height):
         if height > self.best_block.height:
             return None
         elif height < 0:
             return None
         # Memory
-        for block in self.best_chain:
-            if height == block.height:
-                return block.hash
+        block = self.best_height2block.get(height)
+        if block is not None:
+            return block.hash
         # Tables
         return obj.tables.read_block_hash(height)
 
@@ -668,12 +1252,24 @@ class TransactionBuilder(object):
     def __init__(self):
         # TXs that Blocks don't contain
         self.memory_pool = MemoryPool()
+        # indexes of memory pool, pool may drop txs by itself so owner is checked on lookup
+        # {(txhash, txindex): spending unconfirmed txhash}
+        self.unconfirmed_spent: Dict[Tuple[bytes, int], bytes] = dict()
+        # {unconfirmed txhash: outputs}
+        self.unconfirmed_outputs: Dict[bytes, list] = dict()
         # TXs that MAIN chain contains
         self.chained_tx: MutableMapping[bytes, TX] = WeakValueDictionary()
         # Tables contains TXs
         self.cache: MutableMapping[bytes, TX] = WeakValueDictionary()
 
     async def put_unconfirmed(self, cur, tx) -> bool:
+        if not self.add_unconfirmed(tx):
+            return False
+        await self.notify_unconfirmed(cur=cur, tx=tx)
+        return True
+
+    def add_unconfirmed(self, tx) -> bool:
+        """push to memory pool, account movement is notified by `notify_unconfirmed()`"""
         assert tx.height is None, 'Not unconfirmed tx {}'.format(tx)
         if tx.type in (C.TX_POW_REWARD, C.TX_POS_REWARD):
             return False  # It is Reword tx
@@ -685,18 +1281,76 @@ class TransactionBuilder(object):
             return False
         # push unconfirmed
         tx.create_time = time()
-        depends = tuple(txhash for txhash, _txindex in tx.inputs)
-        self.memory_pool.push(tx, tx.hash, depends, tx.gas_price, tx.time, tx.deadline, tx.size)
+        self.push_unconfirmed(tx)
+        return True
+
+    async def notify_unconfirmed(self, cur, tx):
         # notify account movement
         movement = await obj.account_builder.affect_new_tx(cur=cur, tx=tx)
         if not stream.is_disposed:
             stream.on_next(tx)
             if movement is not None:
                 stream.on_next(movement)
-        return True
 
-    def get_tx(self, txhash, default=None):
-        """get memory or unconfirmed or accounted txs"""
+    def push_unconfirmed(self, tx):
+        depends = tuple(txhash for txhash, _txindex in tx.inputs)
+        self.memory_pool.push(tx, tx.hash, depends, tx.gas_price, tx.time, tx.deadline, tx.size)
+        for pair in tx.inputs:
+            self.unconfirmed_spent[pair] = tx.hash
+        self.unconfirmed_outputs[tx.hash] = tx.outputs
+
+    def remove_unconfirmed(self, txhash):
+        tx = self.memory_pool.get_obj(txhash)
+        self.memory_pool.remove(txhash)
+        self.drop_unconfirmed_index(txhash, tx.inputs)
+
+    def drop_unconfirmed_index(self, txhash, inputs):
+        for pair in inputs:
+            if self.unconfirmed_spent.get(pair) == txhash:
+                del self.unconfirmed_spent[pair]
+        self.unconfirmed_outputs.pop(txhash, None)
+
+    def clear_unconfirmed_by_deadline(self, deadline):
+        """remove expired unconfirmed txs and rebuild indexes if removed"""
+        removed = self.memory_pool.clear_by_deadline(deadline)
+        if removed:
+            self.refresh_unconfirmed_index()
+        return removed
+
+    def refresh_unconfirmed_index(self):
+        self.unconfirmed_spent.clear()
+        self.unconfirmed_outputs.clear()
+        for tx in self.memory_pool.list_all_obj(False):
+            for pair in tx.inputs:
+                self.unconfirmed_spent[pair] = tx.hash
+            self.unconfirmed_outputs[tx.hash] = tx.outputs
+
+    def get_unconfirmed_spender(self, txhash, txindex) -> Optional[bytes]:
+        """unconfirmed txhash spending the output"""
+        spender = self.unconfirmed_spent.get((txhash, txindex))
+        if spender is not None and not self.memory_pool.exist(spender):
+            self.drop_unconfirmed_index(spender, ((txhash, txindex),))
+            return None
+        return spender
+
+    def get_unconfirmed_outputs(self, txhash) -> Optional[list]:
+        """outputs of unconfirmed tx"""
+        outputs = self.unconfirmed_outputs.get(txhash)
+        if outputs is not None and not self.memory_pool.exist(txhash):
+            del self.unconfirmed_outputs[txhash]
+            return None
+        return outputs
+
+    def get_unconfirmed_spent_iter(self):
+        """(outpoint, spender) of unconfirmed txs"""
+        for pair, spender in list(self.unconfirmed_spent.items()):
+            if self.memory_pool.exist(spender):
+                yield pair, spender
+            else:
+                self.drop_unconfirmed_index(spender, (pair,))
+
+    def get_tx(self, txhash, default=None, view=None):
+        """get memory or unconfirmed or accounted txs, database is read on the view if given"""
 
         # warning: WeakValueDictionary delete when out of reference
         cached_tx = self.cache.get(txhash)
@@ -716,17 +1370,33 @@ class TransactionBuilder(object):
                 log.warning("Is unconfirmed. {}".format(tx))
         else:
             # Databaseより
-            tx = obj.tables.read_tx(txhash)
+            tx = (obj.tables if view is None else view).read_tx(txhash)
             if tx:
                 self.cache[txhash] = tx
             else:
                 return default
         return tx
 
-    def get_memorized_tx(self, txhash, default=None):
+    def get_tx_many(self, txhashs, view=None) -> Dict[bytes, Optional[TX]]:
+        """batched `get_tx`, txs on database are read by one sweep"""
+        result = dict()
+        missed = list()
+        for txhash in txhashs:
+            if txhash in self.cache or txhash in self.chained_tx or self.memory_pool.exist(txhash):
+                result[txhash] = self.get_tx(txhash)
+            else:
+                missed.append(txhash)
+        if missed:
+            for txhash, tx in (obj.tables if view is None else view).read_tx_many(missed).items():
+                if tx:
+                    self.cache[txhash] = tx
+                result[txhash] = tx
+        return result
+
+    def get_memorized_tx(self, txhash, default=None, view=None):
         """get memorized tx (memory or unconfirmed)"""
         if txhash in self.chained_tx or self.memory_pool.exist(txhash):
-            return self.get_tx(txhash, default)
+            return self.get_tx(txhash, default, view)
         else:
             return default
 
@@ -742,8 +1412,7 @@ class TransactionBuilder(object):
         for block in old_best_sets:
             for tx in block.txs:
                 if not self.memory_pool.exist(tx.hash) and tx.type not in (C.TX_POW_REWARD, C.TX_POS_REWARD):
-                    depends = tuple(txhash for txhash, _txindex in tx.inputs)
-                    self.memory_pool.push(tx, tx.hash, depends, tx.gas_price, tx.time, tx.deadline, tx.size)
+                    self.push_unconfirmed(tx)
                 if tx.hash in self.chained_tx:
                     del self.chained_tx[tx.hash]
         # 新規に反映する
@@ -752,11 +1421,11 @@ class TransactionBuilder(object):
                 if tx.hash not in self.chained_tx:
                     self.chained_tx[tx.hash] = tx
                 if self.memory_pool.exist(tx.hash):
-                    self.memory_pool.remove(tx.hash)
+                    self.remove_unconfirmed(tx.hash)
 
         # delete expired unconfirmed txs
         deadline = int(time() - V.BLOCK_GENESIS_TIME - C.ACCEPT_MARGIN_TIME)
-        removed = self.memory_pool.clear_by_deadline(deadline)
+        removed = self.clear_unconfirmed_by_deadline(deadline)
 
         if removed:
             log.debug("removed expired unconfirmed txs {}".format(removed))
@@ -766,18 +1435,39 @@ class AccountBuilder(object):
 
     def __init__(self):
         self.db_balance = Accounting()
+        # balance moved by blocks on database, recoded as checkpoint
+        self.chain_balance = Accounting()
         # {txhash: (ntype, movement, ntime),..}
         self.memory_movement = dict()
         self.pre_fetch_addr = dict()
 
-    async def init(self, cur, f_delete=False):
+    async def init(self, cur, f_delete=False, checkpoint: Optional[Accounting] = None):
+        await self.init_balance(cur, f_delete, checkpoint)
+        await self.init_prefetch(cur)
+
+    async def init_balance(self, cur, f_delete=False, checkpoint: Optional[Accounting] = None):
+        """
+        db_balance is chain_balance + inner movements on every boot
+        chain_balance is checkpoint (blocks after it are applied by caller)
+        or sum of move logs of txs on database (no block is applied again)
+        """
+        if checkpoint is None:
+            self.chain_balance = await self.read_chain_movelog_sum(cur, f_delete)
+            log.info("account balance from move logs")
+        else:
+            self.chain_balance = checkpoint.copy()
+            log.info("account balance from checkpoint")
+        self.db_balance = self.chain_balance + await read_inner_movelog_sum(cur)
+
+    async def read_chain_movelog_sum(self, cur, f_delete) -> Accounting:
+        """sum of move logs of txs on database"""
         deleted = 0
         ignored = 0
         memory_sum = Accounting()
         async for move_log in read_movelog_iter(cur):
             # logに記録されてもBlockに取り込まれていないならTXは存在せず
             if move_log.type == C.TX_INNER:
-                memory_sum += move_log.movement
+                continue
             elif obj.tables.have_tx(move_log.txhash):
                 memory_sum += move_log.movement
             elif f_delete:
@@ -786,9 +1476,10 @@ class AccountBuilder(object):
             else:
                 ignored += 1
         log.info(f"move_logs ignored={ignored} deleted={deleted}")
-        self.db_balance += memory_sum
+        return memory_sum
 
-        # prefetch addresses for wallet
+    async def init_prefetch(self, cur):
+        """prefetch addresses for wallet"""
         user = 0
         user_gap = C.GAP_USER_LIMIT
         while 0 < user_gap:
@@ -895,6 +1586,19 @@ class AccountBuilder(object):
                 else:
                     yield move_log.get_tuple_data()
 
+    async def get_batch_balance(self, cur, batched_blocks) -> Accounting:
+        """chain_balance after `new_batch_apply()` of the blocks, nothing is changed"""
+        balance = self.chain_balance.copy()
+        for block in batched_blocks:
+            for tx in block.txs:
+                move_log = await read_txhash2movelog(tx.hash, cur)
+                if move_log:
+                    balance += move_log.movement
+                elif tx.hash in self.memory_movement:
+                    ntype, movement, ntime = self.memory_movement[tx.hash].get_tuple_data()
+                    balance += movement
+        return balance
+
     async def new_batch_apply(self, cur, batched_blocks):
         for block in batched_blocks:
             for tx in block.txs:
@@ -902,6 +1606,7 @@ class AccountBuilder(object):
                 if move_log:
                     # User操作の記録
                     self.db_balance += move_log.movement
+                    self.chain_balance += move_log.movement
                     if tx.hash in self.memory_movement:
                         del self.memory_movement[tx.hash]
                     # log.debug("Already recoded log {}".format(tx))
@@ -909,6 +1614,7 @@ class AccountBuilder(object):
                     # db_balanceに追加
                     ntype, movement, ntime = self.memory_movement[tx.hash].get_tuple_data()
                     self.db_balance += movement
+                    self.chain_balance += movement
                     # memory_movementから削除
                     del self.memory_movement[tx.hash]
                     # insert_log
@@ -0,0 +1,175 @@
+from logging import getLogger
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+log = getLogger('bc4py')
+
+"""
+fork tree
+====
+memory blocks linked by parent and children, each node keeps cumulative score from root block
+best tip is updated on insert, reorg is a walk to the common ancestor
+tie of cumulative score keeps the first seen tip (same as sorting by `create_time`)
+"""
+
+if TYPE_CHECKING:
+    from bc4py.chain.block import Block
+
+
+class ForkNode(object):
+    __slots__ = ("block", "parent", "children", "height", "cumulative")
+
+    def __init__(self, block: 'Block', parent: Optional['ForkNode'], cumulative: float):
+        self.block = block
+        self.parent = parent
+        self.children: List['ForkNode'] = list()
+        self.height: int = block.height
+        self.cumulative = cumulative
+
+    def __repr__(self):
+        return "<ForkNode {} height={} score={}>".format(
+            self.block.hash.hex()[:16], self.height, round(self.cumulative, 4))
+
+
+class ForkTree(object):
+    """blocks on memory, root block is on database and not included"""
+
+    def __init__(self, root_block: 'Block'):
+        self.root_hash = root_block.hash
+        self.nodes: Dict[bytes, ForkNode] = dict()
+        self.best: Optional[ForkNode] = None
+        # previous hash -> blocks, waiting for unknown parent
+        self.unlinked: Dict[bytes, List['Block']] = dict()
+        # blocks being written to database, best tip must be its descendant
+        self.pinned: Optional[ForkNode] = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, blockhash):
+        return blockhash in self.nodes
+
+    def __repr__(self):
+        return "<ForkTree nodes={} unlinked={} best={}>".format(
+            len(self.nodes), sum(len(blocks) for blocks in self.unlinked.values()), self.best)
+
+    def add(self, block: 'Block') -> bool:
+        """insert block and its waiting descendants, return True if best tip is changed"""
+        f_changed = False
+        pending = [block]
+        while pending:
+            block = pending.pop()
+            if block.hash in self.nodes:
+                continue
+            if block.previous_hash == self.root_hash:
+                parent = None
+                cumulative = block.score
+            elif block.previous_hash in self.nodes:
+                parent = self.nodes[block.previous_hash]
+                cumulative = parent.cumulative + block.score
+            else:
+                # not linked to root yet, like `get_best_chain` ignored it
+                self.unlinked.setdefault(block.previous_hash, list()).append(block)
+                continue
+            node = ForkNode(block, parent, cumulative)
+            self.nodes[block.hash] = node
+            if parent is not None:
+                parent.children.append(node)
+            if (self.best is None or self.best.cumulative < cumulative) and self.is_on_pinned(node):
+                self.best = node
+                f_changed = True
+            pending.extend(self.unlinked.pop(block.hash, ()))
+        return f_changed
+
+    def pin(self, blockhash):
+        self.pinned = self.nodes[blockhash]
+
+    def unpin(self) -> bool:
+        """release pin, return True if a fork limited by it becomes best tip"""
+        self.pinned = None
+        best = max(self.nodes.values(), key=lambda x: x.cumulative, default=None)
+        if best is None or (self.best is not None and best.cumulative <= self.best.cumulative):
+            return False
+        self.best = best
+        return True
+
+    def is_on_pinned(self, node: ForkNode) -> bool:
+        """node is pinned block or its descendant"""
+        pinned = self.pinned
+        if pinned is None:
+            return True
+        while node is not None and pinned.height < node.height:
+            node = node.parent
+        return node is pinned
+
+    def path(self, node: Optional[ForkNode]) -> List['Block']:
+        """[<height=n>, <height=n-1>, .., <height=root+1>]"""
+        blocks = list()
+        while node is not None:
+            blocks.append(node.block)
+            node = node.parent
+        return blocks
+
+    def best_chain(self) -> List['Block']:
+        return self.path(self.best)
+
+    def chain_of(self, blockhash) -> Optional[List['Block']]:
+        """best chain when the block is best tip, None if not linked to root"""
+        node = self.nodes.get(blockhash)
+        if node is None:
+            return None
+        return self.path(node)
+
+    @staticmethod
+    def reorg(old: Optional[ForkNode], new: ForkNode) -> Tuple[List['Block'], List['Block']]:
+        """
+        walk to the common ancestor
+        return disconnect [old tip, .., fork+1] and connect [fork+1, .., new tip]
+        """
+        disconnect = list()
+        connect = list()
+        while old is not None and new is not None and old is not new:
+            if old.height >= new.height:
+                disconnect.append(old.block)
+                old = old.parent
+            else:
+                connect.append(new.block)
+                new = new.parent
+        while old is not None and old is not new:
+            disconnect.append(old.block)
+            old = old.parent
+        while new is not None and new is not old:
+            connect.append(new.block)
+            new = new.parent
+        connect.reverse()
+        return disconnect, connect
+
+    def set_root(self, root_block: 'Block') -> List['Block']:
+        """root moved to a best chain block, remove nodes not descendant of it and return removed"""
+        root = self.nodes.get(root_block.hash)
+        assert root is not None, 'new root is not on fork tree {}'.format(root_block)
+        keep = dict()
+        stack = list(root.children)
+        while stack:
+            node = stack.pop()
+            keep[node.block.hash] = node
+            stack.extend(node.children)
+        removed = [node.block for blockhash, node in self.nodes.items() if blockhash not in keep]
+        for node in root.children:
+            node.parent = None
+        self.nodes = keep
+        self.root_hash = root_block.hash
+        # waiting blocks never linked below root
+        for previous_hash in list(self.unlinked):
+            self.unlinked[previous_hash] = [
+                block for block in self.unlinked[previous_hash] if root_block.height < block.height]
+            if len(self.unlinked[previous_hash]) == 0:
+                del self.unlinked[previous_hash]
+        if self.best is not None and self.best.block.hash not in keep:
+            self.best = max(keep.values(), key=lambda x: x.cumulative, default=None)
+        return removed
+
+
+__all__ = [
+    "ForkNode",
+    "ForkTree",
+]
@@ -0,0 +1,67 @@
+from bc4py.chain.block import BlockHeader, get_block_header_from_bin
+from logging import getLogger
+from typing import Dict, Optional
+import struct
+
+log = getLogger('bc4py')
+
+"""
+block header array
+====
+headers of blocks on database are kept on one contiguous bytearray indexed by height,
+ancestor walks and difficulty calculation never read block bodies
+"""
+
+struct_header = struct.Struct('>32s32s80sB')  # [blockhash][work][b_block][flag]
+
+
+class HeaderArray(object):
+    """fixed size header records, record N is height N"""
+    __slots__ = ("array", "hash2height")
+
+    def __init__(self):
+        self.array = bytearray()
+        self.hash2height: Dict[bytes, int] = dict()
+
+    def __len__(self):
+        return len(self.array) // struct_header.size
+
+    def __repr__(self):
+        return "<HeaderArray len={} size={}kb>".format(len(self), len(self.array) // 1000)
+
+    def append(self, height, blockhash, work, b_block, flag):
+        assert height == len(self), "header is not continuous {}!={}".format(height, len(self))
+        self.array += struct_header.pack(blockhash, work, b_block, flag)
+        self.hash2height[blockhash] = height
+
+    def append_binary(self, height, b):
+        """append record stored on `_block_header` table"""
+        blockhash, work, b_block, flag = struct_header.unpack(b)
+        self.append(height, blockhash, work, b_block, flag)
+
+    def get_height(self, blockhash) -> Optional[int]:
+        return self.hash2height.get(blockhash)
+
+    def get_hash(self, height) -> Optional[bytes]:
+        if 0 <= height < len(self):
+            offset = height * struct_header.size
+            return bytes(self.array[offset:offset + 32])
+        return None
+
+    def get_header(self, height) -> Optional[BlockHeader]:
+        if 0 <= height < len(self):
+            _blockhash, work, b_block, flag = struct_header.unpack_from(self.array, height * struct_header.size)
+            return get_block_header_from_bin(height, work, b_block, flag)
+        return None
+
+    def get_header_by_hash(self, blockhash) -> Optional[BlockHeader]:
+        height = self.hash2height.get(blockhash)
+        if height is None:
+            return None
+        return self.get_header(height)
+
+
+__all__ = [
+    "struct_header",
+    "HeaderArray",
+]
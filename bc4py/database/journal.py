@@ -0,0 +1,131 @@
+from bc4py.chain.block import Block
+import bc4py.chain.msgpack as bc4py_msgpack
+from logging import getLogger
+from typing import Dict, Iterator, List
+from zlib import crc32
+import struct
+import re
+import os
+
+log = getLogger('bc4py')
+
+"""
+memory journal
+====
+append only journal of memory blocks, replace `memory.mpac`
+file: `journal/NNNNNNNN.log` segments, new segment is started on every batch apply
+record: [payload length][crc32 of payload][payload] payload=msgpack (block, work_hash)
+segments only with blocks under root are removed, a torn last record is cut on recovery
+"""
+
+struct_frame = struct.Struct('>II')  # [length][crc32]
+SEGMENT_RE = re.compile(r'^(\d{8})\.log$')
+MAX_RECORD_SIZE = 32 * 1024 * 1024
+
+
+class Journal(object):
+
+    def __init__(self, dirs):
+        self.dirs = os.path.join(dirs, 'journal')
+        if not os.path.exists(self.dirs):
+            os.mkdir(self.dirs)
+        # segment number -> max block height
+        self.segments: Dict[int, int] = dict()
+        for name in os.listdir(self.dirs):
+            m = SEGMENT_RE.match(name)
+            if m:
+                self.segments[int(m.group(1))] = -1
+        self.segment_no = max(self.segments) if self.segments else 0
+        self.fp = None
+
+    def __repr__(self):
+        return "<Journal segments={} current={:08d}>".format(len(self.segments), self.segment_no)
+
+    def get_path(self, segment_no):
+        return os.path.join(self.dirs, '{:08d}.log'.format(segment_no))
+
+    def close(self):
+        if self.fp:
+            self.fp.close()
+            self.fp = None
+
+    def append(self, block: Block):
+        """write one record, cost is only the block size"""
+        if self.fp is None:
+            self.fp = open(self.get_path(self.segment_no), mode='ab')
+            self.segments.setdefault(self.segment_no, -1)
+        payload = bc4py_msgpack.dumps((block, block.work_hash))
+        self.fp.write(struct_frame.pack(len(payload), crc32(payload)) + payload)
+        self.fp.flush()
+        self.segments[self.segment_no] = max(self.segments[self.segment_no], block.height)
+
+    def truncate(self, root_height):
+        """called after batch apply, start new segment and remove segments under root"""
+        self.close()
+        for segment_no, max_height in list(self.segments.items()):
+            if max_height <= root_height:
+                os.remove(self.get_path(segment_no))
+                del self.segments[segment_no]
+        self.segment_no += 1
+
+    def read_segment(self, segment_no) -> Iterator[Block]:
+        """stream records of segment, cut a torn tail"""
+        path = self.get_path(segment_no)
+        position = 0
+        with open(path, mode='rb') as fp:
+            while True:
+                head = fp.read(struct_frame.size)
+                if len(head) == 0:
+                    break
+                if len(head) < struct_frame.size:
+                    log.warning("journal {:08d} torn frame header at {}".format(segment_no, position))
+                    break
+                length, checksum = struct_frame.unpack(head)
+                payload = fp.read(length) if length <= MAX_RECORD_SIZE else b''
+                if len(payload) != length or crc32(payload) != checksum:
+                    log.warning("journal {:08d} broken record at {}".format(segment_no, position))
+                    break
+                position += struct_frame.size + length
+                block, work_hash = bc4py_msgpack.loads(payload)
+                block.work_hash = work_hash
+                yield block
+        if position < os.path.getsize(path):
+            # new records are appended after good records
+            os.truncate(path, position)
+
+    def recover(self, root_block: Block) -> List[Block]:
+        """blocks over root in written order, forks included"""
+        blocks: Dict[bytes, Block] = dict()
+        for segment_no in sorted(self.segments):
+            max_height = -1
+            for block in self.read_segment(segment_no):
+                max_height = max(max_height, block.height)
+                if root_block.height is None or root_block.height < block.height:
+                    blocks.setdefault(block.hash, block)
+            self.segments[segment_no] = max_height
+        return list(blocks.values())
+
+
+def read_memory_file(path, root_block: Block) -> List[Block]:
+    """blocks of old `memory.mpac` on the chain of root block"""
+    memorized_blocks = list()
+    try:
+        with open(path, mode='br') as fp:
+            block_list: List[Block] = list()
+            for block, work_hash in reversed(tuple(bc4py_msgpack.stream_unpacker(fp))):
+                block.work_hash = work_hash
+                if len(block_list) == 0 or block.hash == block_list[0].previous_hash:
+                    block_list.insert(0, block)
+            for block in block_list:
+                if root_block.hash == block.previous_hash:
+                    memorized_blocks.append(block)
+                    root_block = block
+    except Exception:
+        log.warning("failed to read old memory file", exc_info=True)
+    return memorized_blocks
+
+
+__all__ = [
+    "Journal",
+    "read_memory_file",
+]
@@ -0,0 +1,114 @@
+from logging import getLogger
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Tuple
+
+log = getLogger('bc4py')
+
+"""
+memory overlay
+====
+outputs created and spent by the memory section of best chain, updated by connect/disconnect of blocks
+lookup cost of one outpoint is not related to memory size, database is checked by caller
+a fork (or the chain of a checking block) is a small delta over the overlay of best chain
+"""
+
+if TYPE_CHECKING:
+    from bc4py.chain.block import Block
+    from bc4py_extension import PyAddress
+
+
+class MemoryOverlay(object):
+    __slots__ = ("created", "spent", "tx_height")
+
+    def __init__(self):
+        # {(txhash, txindex): (address, coin_id, amount)}
+        self.created: Dict[Tuple[bytes, int], Tuple['PyAddress', int, int]] = dict()
+        # {(txhash, txindex): (spending txhash, input index, height)}
+        self.spent: Dict[Tuple[bytes, int], Tuple[bytes, int, int]] = dict()
+        # {txhash: height}
+        self.tx_height: Dict[bytes, int] = dict()
+
+    def __repr__(self):
+        return "<MemoryOverlay txs={} created={} spent={}>".format(
+            len(self.tx_height), len(self.created), len(self.spent))
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable['Block']) -> 'MemoryOverlay':
+        """connect blocks by the order"""
+        self = cls()
+        for block in blocks:
+            self.connect(block)
+        return self
+
+    def copy(self) -> 'MemoryOverlay':
+        overlay = MemoryOverlay()
+        overlay.created = self.created.copy()
+        overlay.spent = self.spent.copy()
+        overlay.tx_height = self.tx_height.copy()
+        return overlay
+
+    def connect(self, block: 'Block'):
+        for tx in block.txs:
+            self.tx_height[tx.hash] = block.height
+            for index, pair in enumerate(tx.inputs):
+                self.spent[pair] = (tx.hash, index, block.height)
+            for index, output in enumerate(tx.outputs):
+                self.created[(tx.hash, index)] = output
+
+    def disconnect(self, block: 'Block'):
+        for tx in block.txs:
+            if self.tx_height.get(tx.hash) == block.height:
+                del self.tx_height[tx.hash]
+            for pair in tx.inputs:
+                info = self.spent.get(pair)
+                if info is not None and info[0] == tx.hash:
+                    del self.spent[pair]
+            for index in range(len(tx.outputs)):
+                self.created.pop((tx.hash, index), None)
+
+    def get_output(self, txhash, txindex) -> Optional[Tuple['PyAddress', int, int]]:
+        return self.created.get((txhash, txindex))
+
+    def get_spent(self, txhash, txindex) -> Optional[Tuple[bytes, int, int]]:
+        return self.spent.get((txhash, txindex))
+
+    def get_height(self, txhash) -> Optional[int]:
+        return self.tx_height.get(txhash)
+
+
+class ForkOverlay(object):
+    """overlay of best chain with disconnected and connected blocks"""
+    __slots__ = ("base", "removed", "added")
+
+    def __init__(self, base: MemoryOverlay, disconnect: Iterable['Block'], connect: Iterable['Block']):
+        self.base = base
+        self.removed = MemoryOverlay.from_blocks(disconnect)
+        self.added = MemoryOverlay.from_blocks(connect)
+
+    def __repr__(self):
+        return "<ForkOverlay removed={} added={}>".format(len(self.removed.tx_height), len(self.added.tx_height))
+
+    def get_output(self, txhash, txindex) -> Optional[Tuple['PyAddress', int, int]]:
+        pair = (txhash, txindex)
+        output = self.added.created.get(pair)
+        if output is None and pair not in self.removed.created:
+            output = self.base.created.get(pair)
+        return output
+
+    def get_spent(self, txhash, txindex) -> Optional[Tuple[bytes, int, int]]:
+        pair = (txhash, txindex)
+        info = self.added.spent.get(pair)
+        if info is None and pair not in self.removed.spent:
+            info = self.base.spent.get(pair)
+        return info
+
+    def get_height(self, txhash) -> Optional[int]:
+        height = self.added.tx_height.get(txhash)
+        if height is None and txhash not in self.removed.tx_height:
+            height = self.base.tx_height.get(txhash)
+        return height
+
+
+__all__ = [
+    "MemoryOverlay",
+    "ForkOverlay",
+]
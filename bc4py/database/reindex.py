@@ -0,0 +1,314 @@
+from bc4py.config import C, V
+from bc4py.chain.tx import TX
+from bc4py.database.builder import Tables, struct_block, struct_tx, struct_address_idx, struct_coins, \
+    ITER_ORDER, DB_VERSION, STATE_PRUNED_HEIGHT
+from bc4py.database.storage import SINGLE_DB_NAME, MIGRATE_CHUNK_SIZE, get_db_options, merge_db_options, \
+    get_legacy_path
+from bc4py.database.blockfile import BlockFiles, is_locator
+from bc4py.database.utxo import struct_unused_idx
+from msgpack import Unpacker, packb
+from multiprocessing import Pool
+from collections import deque
+from logging import getLogger
+from typing import Dict, Set
+from time import time
+import heapq
+import sqlite3
+import shutil
+import re
+import os
+import plyvel
+
+log = getLogger('bc4py')
+
+"""
+offline reindex
+====
+rebuild `_tx_index`, `_address_index`, `_unused_index` and `_coins` from `_block` without network
+workers parse height ranges and write sorted runs, main process merges runs into fresh tables
+run by `python -m bc4py.database.reindex --txindex --addrindex` while the node is stopped
+"""
+
+REINDEX_RANGE_SIZE = 2000  # blocks of one worker task
+COPY_TABLES = ('_block', '_block_index', '_block_header', '_state')
+DB_DIR_RE = re.compile(r'^db-tx([01])-addr([01])-ver(\d+)$')
+RUN_KINDS = ('txindex', 'created', 'spent', 'coins')
+
+# worker globals, set by initializer
+_account_addresses: Set[bytes] = set()
+
+
+def _init_worker(hrp, account_addresses):
+    global _account_addresses
+    V.BECH32_HRP = hrp
+    _account_addresses = account_addresses
+
+
+def _write_run(path, items):
+    with open(path, mode='wb') as fp:
+        for item in sorted(items):
+            fp.write(packb(item, use_bin_type=True))
+
+
+def _read_run(path):
+    with open(path, mode='rb') as fp:
+        for item in Unpacker(fp, raw=False, use_list=False):
+            yield item
+
+
+def _reindex_worker(run_dir, range_no, blocks):
+    """parse blocks and write sorted runs of one height range"""
+    runs: Dict[str, list] = {kind: list() for kind in RUN_KINDS}
+    account_txs = list()
+    tx_count = 0
+    for b in blocks:
+        height, _work, _b_block, _flag, tx_len = struct_block.unpack_from(b)
+        b_height = height.to_bytes(4, ITER_ORDER)
+        offset = struct_block.size
+        for tx_no in range(tx_len):
+            tx_offset = offset
+            bin_len, sign_len, r_len = struct_tx.unpack_from(b, offset)
+            offset += struct_tx.size
+            tx = TX.from_binary(binary=b[offset:offset + bin_len])
+            offset += bin_len + sign_len + r_len
+            runs['txindex'].append((tx.hash, b_height + tx_offset.to_bytes(4, ITER_ORDER)))
+            for txhash, txindex in tx.inputs:
+                runs['spent'].append((txhash + txindex.to_bytes(1, ITER_ORDER), tx.hash))
+            is_account_tx = False
+            for index, (address, coin_id, amount) in enumerate(tx.outputs):
+                b_address = address.binary()
+                runs['created'].append((tx.hash + index.to_bytes(1, ITER_ORDER),
+                                        struct_unused_idx.pack(b_address, coin_id, amount)))
+                is_account_tx = is_account_tx or b_address in _account_addresses
+            if is_account_tx:
+                account_txs.append(tx.hash)
+            if tx.type == C.TX_MINT_COIN:
+                mint_id, params, setting = tx.encoded_message()
+                runs['coins'].append((struct_coins.pack(mint_id, height, tx_no),
+                                      tx.hash + packb((params, setting), use_bin_type=True)))
+            tx_count += 1
+    for kind, items in runs.items():
+        _write_run(os.path.join(run_dir, '{:08d}.{}'.format(range_no, kind)), items)
+    return range_no, len(blocks), tx_count, account_txs
+
+
+class TableWriter(object):
+    """chunked write batches of one table"""
+
+    def __init__(self, db):
+        self.db = db
+        self.batch = db.write_batch()
+        self.count = 0
+
+    def put(self, key, value):
+        self.batch.put(key, value)
+        self.count += 1
+        if self.count % MIGRATE_CHUNK_SIZE == 0:
+            self.batch.write()
+            self.batch = self.db.write_batch()
+
+    def close(self):
+        self.batch.write()
+
+
+def open_tables(dirs, single_db, create):
+    """open all tables of `Tables` by the layout, return (close list, name->db)"""
+    if single_db:
+        db_options = merge_db_options([get_db_options(name) for name in Tables.table_list])
+        db = plyvel.DB(os.path.join(dirs, SINGLE_DB_NAME), create_if_missing=create, **db_options)
+        tables = {
+            name: db.prefixed_db(Tables.table_list.index(name).to_bytes(1, ITER_ORDER))
+            for name in Tables.table_list}
+        return [db], tables
+    tables = dict()
+    for name in Tables.table_list:
+        path = get_legacy_path(dirs, name)
+        if not create and not os.path.exists(path):
+            continue
+        tables[name] = plyvel.DB(path, create_if_missing=create, **get_db_options(name))
+    return list(tables.values()), tables
+
+
+def read_account_addresses() -> Set[bytes]:
+    """addresses of wallet, indexed even if txindex/addrindex is disabled"""
+    if not os.path.exists(V.DB_ACCOUNT_PATH):
+        return set()
+    conn = sqlite3.connect(V.DB_ACCOUNT_PATH)
+    try:
+        return {bytes(ck) for (ck,) in conn.execute("SELECT `ck` FROM `pool`")}
+    finally:
+        conn.close()
+
+
+def find_source_dir(source=None):
+    if source:
+        return source
+    names = [name for name in os.listdir(V.DB_HOME_DIR)
+             if DB_DIR_RE.match(name) and int(DB_DIR_RE.match(name).group(3)) == DB_VERSION]
+    if len(names) != 1:
+        raise Exception('select source database by --source from {}'.format(names))
+    return names[0]
+
+
+def reindex(txindex, addrindex, source=None, workers=None, range_size=REINDEX_RANGE_SIZE):
+    """rebuild indexes of source database to the database of txindex/addrindex setting"""
+    s = time()
+    workers = workers or os.cpu_count() or 1
+    src_name = find_source_dir(source)
+    dst_name = f"db-tx{int(txindex)}-addr{int(addrindex)}-ver{DB_VERSION}"
+    src_dirs = os.path.join(V.DB_HOME_DIR, src_name)
+    # same name is rebuilt on temporary path and swapped after
+    build_dirs = os.path.join(V.DB_HOME_DIR, dst_name + ('.reindex' if src_name == dst_name else ''))
+    if os.path.exists(build_dirs):
+        raise Exception('target database already exists {}'.format(build_dirs))
+    single_db = os.path.exists(os.path.join(src_dirs, SINGLE_DB_NAME))
+    src_closes, src = open_tables(src_dirs, single_db, create=False)
+    block_files = BlockFiles(src_dirs) if os.path.exists(os.path.join(src_dirs, 'blocks')) else None
+    try:
+        if '_state' in src and int.from_bytes(src['_state'].get(STATE_PRUNED_HEIGHT, b'\x00' * 4), ITER_ORDER):
+            raise Exception('pruned database cannot be reindexed, old block bodies are removed')
+        account_addresses = read_account_addresses()
+        log.info("reindex {} -> {} workers={} accounts={}".format(src_name, dst_name, workers,
+                                                                  len(account_addresses)))
+        os.mkdir(build_dirs)
+        run_dir = os.path.join(build_dirs, 'runs')
+        os.mkdir(run_dir)
+        dst_closes, dst = open_tables(build_dirs, single_db, create=True)
+        try:
+            # copy block data
+            for name in COPY_TABLES:
+                if name not in src:
+                    continue
+                writer = TableWriter(dst[name])
+                for k, v in src[name].iterator():
+                    writer.put(k, v)
+                writer.close()
+                log.info("copy table {} {} items".format(name, writer.count))
+            if block_files:
+                shutil.copytree(block_files.dirs, os.path.join(build_dirs, 'blocks'), copy_function=_link_or_copy)
+
+            # parse blocks on workers
+            parse_start = time()
+            total_blocks = total_txs = 0
+            account_txs: Set[bytes] = set()
+            pending = deque()
+            range_count = 0
+            with Pool(workers, initializer=_init_worker, initargs=(V.BECH32_HRP, account_addresses)) as pool:
+                block_iter = src['_block_index'].iterator(include_key=False)
+                while True:
+                    blocks = list()
+                    for blockhash in block_iter:
+                        b = src['_block'].get(blockhash)
+                        blocks.append(bytes(block_files.read(b)) if is_locator(b) else b)
+                        if range_size <= len(blocks):
+                            break
+                    if blocks:
+                        pending.append(pool.apply_async(_reindex_worker, (run_dir, range_count, blocks)))
+                        range_count += 1
+                    # keep only a few ranges on memory
+                    while pending and (workers * 2 <= len(pending) or not blocks):
+                        _range_no, block_count, tx_count, txs = pending.popleft().get()
+                        total_blocks += block_count
+                        total_txs += tx_count
+                        account_txs.update(txs)
+                        log.info("parsed {} blocks {} blocks/Sec".format(
+                            total_blocks, round(total_blocks / max(0.001, time() - parse_start))))
+                    if not blocks:
+                        break
+            parse_time = time() - parse_start
+
+            # merge runs
+            def merged(kind):
+                return heapq.merge(*[
+                    _read_run(os.path.join(run_dir, '{:08d}.{}'.format(range_no, kind)))
+                    for range_no in range(range_count)])
+
+            unused_writer = TableWriter(dst['_unused_index'])
+            address_writer = TableWriter(dst['_address_index'])
+            spent_iter = merged('spent')
+            spent = next(spent_iter, None)
+            for key, value in merged('created'):
+                spent_txhash = None
+                while spent and spent[0] < key:
+                    # coinbase input or an output of no exist tx
+                    spent = next(spent_iter, None)
+                if spent and spent[0] == key:
+                    spent_txhash = spent[1]
+                    spent = next(spent_iter, None)
+                b_address, coin_id, amount = struct_unused_idx.unpack(value)
+                is_account = b_address in account_addresses
+                if spent_txhash is None:
+                    unused_writer.put(key, value)
+                elif is_account:
+                    account_txs.add(spent_txhash)
+                if addrindex or is_account:
+                    address_writer.put(b_address + key,
+                                       struct_address_idx.pack(coin_id, amount, spent_txhash is not None))
+            unused_writer.close()
+            address_writer.close()
+            tx_writer = TableWriter(dst['_tx_index'])
+            for txhash, value in merged('txindex'):
+                if txindex or txhash in account_txs:
+                    tx_writer.put(txhash, value)
+            tx_writer.close()
+            coins_writer = TableWriter(dst['_coins'])
+            for key, value in merged('coins'):
+                coins_writer.put(key, value)
+            coins_writer.close()
+            log.info("merge unused={} address={} tx={} coins={}".format(
+                unused_writer.count, address_writer.count, tx_writer.count, coins_writer.count))
+        finally:
+            for db in dst_closes:
+                db.close()
+        shutil.rmtree(run_dir)
+    finally:
+        if block_files:
+            block_files.close()
+        for db in src_closes:
+            db.close()
+    if src_name == dst_name:
+        os.rename(src_dirs, src_dirs + '.old')
+        os.rename(build_dirs, src_dirs)
+        log.info("old database is moved to {}.old, remove it after check".format(src_dirs))
+    log.info("finish reindex {} blocks {} txs, parse {} blocks/Sec, total {}Sec".format(
+        total_blocks, total_txs, round(total_blocks / max(0.001, parse_time)), round(time() - s, 3)))
+
+
+def _link_or_copy(src, dst):
+    """block files are append only, hard link is enough"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def main():
+    from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+    from bc4py.utils import set_database_path, set_blockchain_params
+    from bc4py.user.boot import load_boot_file
+    import logging
+    p = ArgumentParser(description='rebuild indexes from blocks, stop the node before',
+                       formatter_class=ArgumentDefaultsHelpFormatter)
+    p.add_argument('--sub-dir', help='setup blockchain folder path', default=None, type=str)
+    p.add_argument('--source', help='source database folder name, auto detected if only one', default=None)
+    p.add_argument('--txindex', help='index all txs', action='store_true')
+    p.add_argument('--addrindex', help='index all addresses', action='store_true')
+    p.add_argument('--workers', help='worker processes, default is cpu count', default=None, type=int)
+    p.add_argument('--range-size', help='blocks of one worker task', default=REINDEX_RANGE_SIZE, type=int)
+    args = p.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s %(levelname)s] %(message)s')
+    set_database_path(sub_dir=args.sub_dir)
+    genesis_block, genesis_params, _network_ver, _connections = load_boot_file()
+    set_blockchain_params(genesis_block, genesis_params)
+    reindex(txindex=args.txindex, addrindex=args.addrindex, source=args.source,
+            workers=args.workers, range_size=args.range_size)
+
+
+__all__ = [
+    "REINDEX_RANGE_SIZE",
+    "reindex",
+]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+from bc4py.database import obj
+from bc4py.database.headers import HeaderArray, struct_header
+from bc4py.database.utxo import struct_unused_idx
+from bc4py_extension import sha256d_hash, merkleroot_hash
+from hashlib import sha256
+from logging import getLogger
+from time import time
+from typing import Optional, Tuple
+import shutil
+import struct
+import os
+import plyvel
+import asyncio
+
+loop = asyncio.get_event_loop()
+log = getLogger('bc4py')
+
+"""
+UTXO snapshot
+====
+height stamped dump of headers, recent block bodies, `_unused_index` and `_coins`
+file: [meta] [chunk] [chunk] ... [end chunk with commitment]
+chunk: [section][item count][payload length] payload=[key length][value length][key][value]..
+commitment is sha256 of meta and all chunks, new node imports it and sync forward from the height
+"""
+
+SNAPSHOT_MAGIC = b'bc4py-snapshot01'
+SNAPSHOT_BLOCKS = 288  # recent block bodies included, same as minimum prune heights
+SNAPSHOT_CHUNK_SIZE = 4 * 1024 * 1024  # bytes
+struct_meta = struct.Struct('>16sI32s')  # [magic][height][blockhash]
+struct_chunk = struct.Struct('>BII')  # [section][item count][payload length]
+struct_record = struct.Struct('>HI')  # [key length][value length]
+struct_body_head = struct.Struct('>I32s80s')  # [height][work][b_block] head of `_block` value
+
+SECTION_HEADER = 1  # [height] -> header
+SECTION_BODY = 2  # [blockhash] -> serialized block
+SECTION_UNUSED = 3  # `_unused_index`
+SECTION_COINS = 4  # `_coins`
+SECTION_END = 255  # payload is commitment
+
+STATE_SNAPSHOT_HEIGHT = b'snapshot_height'
+STATE_SNAPSHOT_UTXO_DIGEST = b'snapshot_utxo_digest'
+STATE_SNAPSHOT_VERIFIED = b'snapshot_verified'
+STATE_SNAPSHOT_IMPORTING = b'snapshot_importing'  # import is not finished, tables have partial data
+
+# tables written by import, cleared when previous import is interrupted
+IMPORT_TABLES = ('_block_header', '_block_index', '_block', '_unused_index', '_coins')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class ChunkWriter(object):
+    """buffer records and write a chunk when it is large enough"""
+
+    def __init__(self, fp, hasher):
+        self.fp = fp
+        self.hasher = hasher
+        self.section = None
+        self.count = 0
+        self.buffer = bytearray()
+
+    async def add(self, section, key, value):
+        if self.section != section or SNAPSHOT_CHUNK_SIZE < len(self.buffer):
+            await self.flush()
+            self.section = section
+        self.buffer += struct_record.pack(len(key), len(value))
+        self.buffer += key
+        self.buffer += value
+        self.count += 1
+
+    async def flush(self):
+        if self.count == 0:
+            return
+        b = struct_chunk.pack(self.section, self.count, len(self.buffer)) + self.buffer
+        self.hasher.update(b)
+        await loop.run_in_executor(None, self.fp.write, b)
+        self.count = 0
+        self.buffer = bytearray()
+
+
+def iter_chunks(fp):
+    """yield (section, count, chunk binary, payload) until end chunk"""
+    while True:
+        b_chunk = fp.read(struct_chunk.size)
+        if len(b_chunk) != struct_chunk.size:
+            raise SnapshotError('snapshot file is truncated')
+        section, count, length = struct_chunk.unpack(b_chunk)
+        payload = fp.read(length)
+        if len(payload) != length:
+            raise SnapshotError('snapshot file is truncated')
+        yield section, count, b_chunk, payload
+        if section == SECTION_END:
+            return
+
+
+def iter_records(payload):
+    pos = 0
+    while pos < len(payload):
+        key_len, value_len = struct_record.unpack_from(payload, pos)
+        pos += struct_record.size
+        key = payload[pos:pos + key_len]
+        pos += key_len
+        value = payload[pos:pos + value_len]
+        pos += value_len
+        yield key, value
+
+
+async def dump_snapshot(path, snapshot_blocks=SNAPSHOT_BLOCKS) -> Tuple[int, bytes]:
+    """dump snapshot of database (root block of one read view) and return height and commitment"""
+    from bc4py.database.view import acquire_view
+    # batches committed by background flush while dumping are not seen
+    with acquire_view() as view:
+        return await _dump_view(path, view, snapshot_blocks)
+
+
+async def _dump_view(path, view, snapshot_blocks) -> Tuple[int, bytes]:
+    s = time()
+    root_block = view.root_block
+    height = root_block.height
+    # headers under root never change, bodies are read before prune task runs
+    headers = obj.tables.headers
+    assert height + 1 <= len(headers), 'header array is not synced with root block'
+    b_headers = bytes(headers.array[:(height + 1) * struct_header.size])
+    bodies = list()
+    for h in [0] + list(range(max(1, height + 1 - snapshot_blocks), height + 1)):
+        blockhash = view.read_block_hash(h)
+        b = None if blockhash is None else view.read_block_binary(blockhash)
+        if b is None:
+            raise SnapshotError('block body of height {} is not found (pruned {})'.format(
+                h, obj.tables.pruned_height))
+        bodies.append((blockhash, bytes(b)))
+    unused_snapshot = view._unused_index
+    coins_snapshot = view._coins
+
+    hasher = sha256()
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, mode='wb') as fp:
+            b_meta = struct_meta.pack(SNAPSHOT_MAGIC, height, root_block.hash)
+            hasher.update(b_meta)
+            fp.write(b_meta)
+            writer = ChunkWriter(fp, hasher)
+            for h in range(height + 1):
+                offset = h * struct_header.size
+                await writer.add(SECTION_HEADER, h.to_bytes(4, 'big'),
+                                 b_headers[offset:offset + struct_header.size])
+            for blockhash, b in bodies:
+                await writer.add(SECTION_BODY, blockhash, b)
+            count = 0
+            for k, v in unused_snapshot.iterator():
+                await writer.add(SECTION_UNUSED, k, v)
+                count += 1
+            for k, v in coins_snapshot.iterator():
+                await writer.add(SECTION_COINS, k, v)
+            await writer.flush()
+            commitment = hasher.digest()
+            fp.write(struct_chunk.pack(SECTION_END, 1, len(commitment)) + commitment)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    log.info("dump snapshot height={} unspents={} commitment={} {}Sec".format(
+        height, count, commitment.hex(), round(time() - s, 3)))
+    return height, commitment
+
+
+def verify_snapshot_file(path) -> Tuple[int, bytes, bytes]:
+    """first pass, check file integrity and return height, blockhash and commitment"""
+    hasher = sha256()
+    with open(path, mode='rb') as fp:
+        b_meta = fp.read(struct_meta.size)
+        if len(b_meta) != struct_meta.size:
+            raise SnapshotError('snapshot file is truncated')
+        magic, height, blockhash = struct_meta.unpack(b_meta)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError('not a snapshot file {}'.format(magic))
+        hasher.update(b_meta)
+        commitment = None
+        for section, count, b_chunk, payload in iter_chunks(fp):
+            if section == SECTION_END:
+                commitment = payload
+            else:
+                hasher.update(b_chunk)
+                hasher.update(payload)
+    if commitment != hasher.digest():
+        raise SnapshotError('snapshot commitment mismatch {}!={}'.format(commitment.hex(), hasher.hexdigest()))
+    return height, blockhash, commitment
+
+
+def is_importing() -> bool:
+    """previous import is interrupted, import again before `ChainBuilder.init()`"""
+    return obj.tables.read_state(STATE_SNAPSHOT_IMPORTING) is not None
+
+
+def clear_partial_import():
+    """remove data of interrupted import, chunks are written by separate batches"""
+    tables = obj.tables
+    log.warning("remove data of interrupted snapshot import")
+    for name in IMPORT_TABLES:
+        tables.clear_table(name)
+    tables.headers = HeaderArray()
+
+
+def load_snapshot(path, genesis_hash, expected_commitment: Optional[bytes] = None) -> int:
+    """
+    import snapshot to empty database before `ChainBuilder.init()`
+    blocks before snapshot height are marked as pruned
+    note: interrupted import is cleared and imported again by next call
+    """
+    tables = obj.tables
+    s = time()
+    if is_importing():
+        clear_partial_import()
+    elif len(tables.headers) != 0:
+        raise SnapshotError('snapshot is imported only to empty database')
+    if tables.table_config['addrbalance'] or tables.table_config['spentindex']:
+        raise SnapshotError('addrbalance and spentindex require full history, disable them')
+    height, root_hash, commitment = verify_snapshot_file(path)
+    if expected_commitment is not None and expected_commitment != commitment:
+        raise SnapshotError('not expected snapshot {}!={}'.format(commitment.hex(), expected_commitment.hex()))
+    log.info("start import snapshot height={} commitment={}".format(height, commitment.hex()))
+    tables.write_state(STATE_SNAPSHOT_IMPORTING, b'')
+
+    utxo_hasher = sha256()
+    previous_hash = None
+    min_body_height = height
+    with open(path, mode='rb') as fp:
+        fp.read(struct_meta.size)
+        for section, count, b_chunk, payload in iter_chunks(fp):
+            if section == SECTION_END:
+                break
+            elif section == SECTION_HEADER:
+                header_batch = tables._block_header.write_batch()
+                index_batch = tables._block_index.write_batch()
+                for b_height, b_header in iter_records(payload):
+                    h = int.from_bytes(b_height, 'big')
+                    blockhash, work, b_block, flag = struct_header.unpack(b_header)
+                    if blockhash != sha256d_hash(b_block):
+                        raise SnapshotError('header hash mismatch at {}'.format(h))
+                    elif h == 0 and blockhash != genesis_hash:
+                        raise SnapshotError('genesis hash mismatch {}'.format(blockhash.hex()))
+                    elif 0 < h and b_block[4:36] != previous_hash:
+                        raise SnapshotError('header is not chained at {}'.format(h))
+                    header_batch.put(b_height, b_header)
+                    index_batch.put(b_height, blockhash)
+                    tables.headers.append(h, blockhash, work, b_block, flag)
+                    previous_hash = blockhash
+                header_batch.write()
+                index_batch.write()
+            elif section == SECTION_BODY:
+                batch = tables._block.write_batch()
+                for blockhash, b in iter_records(payload):
+                    h, work, b_block = struct_body_head.unpack_from(b)
+                    if tables.read_block_hash(h) != blockhash or sha256d_hash(b_block) != blockhash:
+                        raise SnapshotError('block body mismatch at {}'.format(h))
+                    if 0 < h:
+                        min_body_height = min(min_body_height, h)
+                    batch.put(blockhash, b)
+                batch.write()
+            elif section == SECTION_UNUSED:
+                batch = tables._unused_index.write_batch()
+                for k, v in iter_records(payload):
+                    utxo_hasher.update(k)
+                    utxo_hasher.update(v)
+                    batch.put(k, v)
+                batch.write()
+            elif section == SECTION_COINS:
+                batch = tables._coins.write_batch()
+                for k, v in iter_records(payload):
+                    batch.put(k, v)
+                batch.write()
+            else:
+                raise SnapshotError('unknown section {}'.format(section))
+    if tables.read_block_hash(height) != root_hash:
+        raise SnapshotError('root block of snapshot is not found')
+    # bodies before the snapshot are not on database
+    tables.set_pruned(min_body_height)
+    tables.write_state(STATE_SNAPSHOT_HEIGHT, height.to_bytes(4, 'big'))
+    tables.write_state(STATE_SNAPSHOT_UTXO_DIGEST, utxo_hasher.digest())
+    # all data is written
+    tables._state.delete(STATE_SNAPSHOT_IMPORTING, sync=tables.table_config['sync'])
+    log.info("finish import snapshot height={} {}Sec".format(height, round(time() - s, 3)))
+    return height
+
+
+class HistoryReplay(object):
+    """
+    replay blocks before snapshot and check the UTXO set is same with snapshot
+    note: outputs are kept on temporary database, progress is kept by restart
+    """
+
+    def __init__(self):
+        self.path = os.path.join(obj.tables.dirs, 'snapshot-check')
+        self.db = plyvel.DB(self.path, create_if_missing=True)
+        self.next_height = int.from_bytes(self.db.get(b'height', b'\x00' * 4), 'big')
+        self.snapshot_height = int.from_bytes(obj.tables.read_state(STATE_SNAPSHOT_HEIGHT), 'big')
+
+    def is_finished(self):
+        return self.snapshot_height < self.next_height
+
+    def apply_block(self, block):
+        """apply outputs change of the block"""
+        assert block.height == self.next_height, 'block is not next {}!={}'.format(block.height, self.next_height)
+        if block.hash != obj.tables.read_block_hash(block.height):
+            raise SnapshotError('block hash is not same with header at {}'.format(block.height))
+        if block.merkleroot != merkleroot_hash([tx.hash for tx in block.txs]):
+            raise SnapshotError('merkleroot mismatch at {}'.format(block.height))
+        batch = self.db.write_batch()
+        spent = set()
+        created = dict()
+        for tx in block.txs:
+            for txhash, txindex in tx.inputs:
+                k = txhash + txindex.to_bytes(1, 'big')
+                if k in created:
+                    del created[k]
+                elif k in spent or self.db.get(k) is None:
+                    raise SnapshotError('input is not found {}:{} at {}'.format(txhash.hex(), txindex,
+                                                                                block.height))
+                else:
+                    spent.add(k)
+                    batch.delete(k)
+            for index, (address, coin_id, amount) in enumerate(tx.outputs):
+                k = tx.hash + index.to_bytes(1, 'big')
+                created[k] = struct_unused_idx.pack(address.binary(), coin_id, amount)
+        for k, v in created.items():
+            batch.put(k, v)
+        self.next_height += 1
+        batch.put(b'height', self.next_height.to_bytes(4, 'big'))
+        batch.write()
+
+    def finish(self) -> bool:
+        """compare replayed UTXO set with snapshot"""
+        hasher = sha256()
+        for k, v in self.db.iterator():
+            if k == b'height':
+                continue
+            hasher.update(k)
+            hasher.update(v)
+        f_match = hasher.digest() == obj.tables.read_state(STATE_SNAPSHOT_UTXO_DIGEST)
+        if f_match:
+            obj.tables.write_state(STATE_SNAPSHOT_VERIFIED, b'\x01')
+            log.info("snapshot history check success height={}".format(self.snapshot_height))
+        else:
+            log.error("snapshot history check failed, UTXO set is not same height={}".format(self.snapshot_height))
+        self.close()
+        shutil.rmtree(self.path)
+        return f_match
+
+    def close(self):
+        self.db.close()
+
+
+__all__ = [
+    "SNAPSHOT_BLOCKS",
+    "SnapshotError",
+    "dump_snapshot",
+    "verify_snapshot_file",
+    "is_importing",
+    "load_snapshot",
+    "HistoryReplay",
+    "STATE_SNAPSHOT_HEIGHT",
+    "STATE_SNAPSHOT_VERIFIED",
+]
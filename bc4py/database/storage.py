@@ -0,0 +1,189 @@
+from logging import getLogger
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from time import time
+import shutil
+import os
+import plyvel
+
+log = getLogger('bc4py')
+
+"""
+LevelDB storage helpers
+====
+single database mode puts every table of `Tables` on one LevelDB with a 1byte prefix,
+all tables are committed by one write batch (one WAL append, atomic)
+"""
+
+SINGLE_DB_NAME = 'tables'
+MIGRATE_CHUNK_SIZE = 10000
+
+# LevelDB options accepted by `plyvel.DB()`
+DB_OPTION_NAMES = (
+    'lru_cache_size',  # block cache size (bytes)
+    'bloom_filter_bits',  # bloom filter bits per key, 0 is disable
+    'write_buffer_size',  # memtable size (bytes)
+    'max_open_files',  # table file handles
+    'compression',  # 'snappy' or None
+)
+# same as LevelDB defaults, caches are summed on single database (11 tables about 100MB)
+# raise by `--db-option` ex. "block:lru_cache_size=134217728"
+DEFAULT_DB_OPTIONS = {
+    'lru_cache_size': 8 * 1024 * 1024,
+    'bloom_filter_bits': 0,
+    'write_buffer_size': 4 * 1024 * 1024,
+    'max_open_files': 500,
+    'compression': 'snappy',
+}
+TABLE_DB_OPTIONS = {
+    # large values, read by block hash
+    '_block': {'write_buffer_size': 8 * 1024 * 1024},
+    # random point lookups, many misses
+    '_tx_index': {'bloom_filter_bits': 10},
+    # random point lookups, misses on spent outpoints
+    '_unused_index': {'bloom_filter_bits': 16, 'lru_cache_size': 16 * 1024 * 1024,
+                      'write_buffer_size': 8 * 1024 * 1024},
+    '_address_index': {'bloom_filter_bits': 10},
+}
+
+
+def get_legacy_path(dirs, name):
+    """path of one table database on six databases mode"""
+    return os.path.join(dirs, name.lstrip('_'))
+
+
+def get_db_options(name, options=None) -> dict:
+    """LevelDB options of the table, default <- per table default <- user setting"""
+    params = DEFAULT_DB_OPTIONS.copy()
+    params.update(TABLE_DB_OPTIONS.get(name, {}))
+    if options:
+        params.update(options.get(name, {}))
+    return params
+
+
+def merge_db_options(params_list) -> dict:
+    """LevelDB options of single database shared by all tables"""
+    params = {
+        'lru_cache_size': sum(p['lru_cache_size'] for p in params_list),
+        'bloom_filter_bits': max(p['bloom_filter_bits'] for p in params_list),
+        'write_buffer_size': sum(p['write_buffer_size'] for p in params_list),
+        'max_open_files': max(p['max_open_files'] for p in params_list),
+        'compression': None,
+    }
+    if any(p['compression'] for p in params_list):
+        params['compression'] = 'snappy'
+    return params
+
+
+def parse_db_options(args) -> Dict[str, dict]:
+    """
+    parse console args to table options
+    format: `TABLE:NAME=VALUE` ex. "unused_index:bloom_filter_bits=16"
+    """
+    options = dict()
+    for arg in args or ():
+        try:
+            table, params = arg.split(':', 1)
+            key, value = params.split('=', 1)
+        except ValueError:
+            raise ValueError('db option format is "TABLE:NAME=VALUE" not "{}"'.format(arg))
+        if key not in DB_OPTION_NAMES:
+            raise ValueError('unknown db option "{}", select from {}'.format(key, DB_OPTION_NAMES))
+        if key == 'compression':
+            value = None if value.lower() in ('none', 'false', '0') else value
+        else:
+            value = int(value)
+        options.setdefault('_' + table.lstrip('_'), dict())[key] = value
+    return options
+
+
+class PrefixedWriteBatch(object):
+    """write batch of one table over a shared root batch"""
+    __slots__ = ("batch", "prefix")
+
+    def __init__(self, batch: plyvel._plyvel.WriteBatch, prefix: bytes):
+        self.batch = batch
+        self.prefix = prefix
+
+    def put(self, key, value):
+        self.batch.put(self.prefix + key, value)
+
+    def delete(self, key):
+        self.batch.delete(self.prefix + key)
+
+    def clear(self):
+        self.batch.clear()
+
+    def write(self):
+        self.batch.write()
+
+
+def seek_many(db, keys: Iterable[bytes]) -> Iterator[Tuple[bytes, Optional[bytes]]]:
+    """
+    point lookup of many keys by one iterator sweep
+    keys are sorted and sought forward, clustered keys are found on same table block
+    """
+    db_iter = db.iterator()
+    try:
+        for key in sorted(keys):
+            db_iter.seek(key)
+            k, v = next(db_iter, (None, None))
+            yield key, (v if k == key else None)
+    finally:
+        db_iter.close()
+
+
+def migrate_to_single_db(dirs, prefixes: Dict[str, bytes], **db_options):
+    """
+    stream six table databases into one prefixed database
+    note: write to temporary path and rename after, interrupted migration restart from first
+    """
+    s = time()
+    tmp_path = os.path.join(dirs, SINGLE_DB_NAME + '.migrating')
+    if os.path.exists(tmp_path):
+        log.warning("remove interrupted migration data")
+        shutil.rmtree(tmp_path)
+    new_db = plyvel.DB(tmp_path, create_if_missing=True, **db_options)
+    try:
+        for name, prefix in prefixes.items():
+            path = get_legacy_path(dirs, name)
+            if not os.path.exists(path):
+                log.debug("skip migration, not found table {}".format(name))
+                continue
+            old_db = plyvel.DB(path, create_if_missing=False)
+            count = 0
+            batch = new_db.write_batch()
+            for k, v in old_db.iterator():
+                batch.put(prefix + k, v)
+                count += 1
+                if count % MIGRATE_CHUNK_SIZE == 0:
+                    batch.write()
+                    batch = new_db.write_batch()
+            batch.write()
+            old_db.close()
+            # check all items are moved
+            moved = sum(1 for _ in new_db.iterator(prefix=prefix, include_value=False))
+            if moved != count:
+                raise Exception('migration of {} failed {}!={}'.format(name, moved, count))
+            log.info("migrate table {} {} items".format(name, count))
+    finally:
+        new_db.close()
+    os.rename(tmp_path, os.path.join(dirs, SINGLE_DB_NAME))
+    # old tables are not referred anymore
+    for name in prefixes:
+        path = get_legacy_path(dirs, name)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+    log.info("finish migration to single database {}Sec".format(round(time() - s, 3)))
+
+
+__all__ = [
+    "SINGLE_DB_NAME",
+    "DB_OPTION_NAMES",
+    "get_db_options",
+    "merge_db_options",
+    "parse_db_options",
+    "get_legacy_path",
+    "PrefixedWriteBatch",
+    "seek_many",
+    "migrate_to_single_db",
+]
@@ -1,7 +1,12 @@
 from bc4py.config import C, BlockChainError
 from bc4py.database import obj
 from bc4py.database.account import read_all_pooled_address_set
-from typing import TYPE_CHECKING, List, AsyncGenerator
+from bc4py.database.view import acquire_view
+from bc4py.database.overlay import MemoryOverlay
+from typing import TYPE_CHECKING, List, Optional, Tuple, AsyncGenerator
+from logging import getLogger
+
+log = getLogger('bc4py')
 
 best_block_cache = None
 best_chain_cache = None
@@ -9,6 +14,8 @@ target_address_cache = set()
 
 if TYPE_CHECKING:
     from bc4py.chain.block import Block
+    from bc4py.database.view import ReadView
+    from bc4py_extension import PyAddress
 
 
 def _get_best_chain_all(best_block):
@@ -29,31 +36,82 @@ def _get_best_chain_all(best_block):
         return best_chain
 
 
-async def get_unspents_iter(target_address, best_block=None, best_chain=None) -> AsyncGenerator:
-    """get unspents related by `target_address`"""
+def _get_source(best_block, best_chain, view: Optional['ReadView']):
+    """tables and overlay to read, memory section of the view is used with it"""
+    if view is not None:
+        assert best_block is None and best_chain is None, 'view has own best chain'
+        return view, view.get_overlay()
     if best_chain is None:
         best_chain = _get_best_chain_all(best_block)
+    return obj.tables, obj.chain_builder.get_overlay(best_chain)
+
+
+def _is_spent_on_memory(overlay, best_block, txhash, txindex) -> bool:
+    """output is used on memory (or unconfirmed)"""
+    if overlay.get_spent(txhash, txindex) is not None:
+        return True
+    if best_block is None:
+        return obj.tx_builder.get_unconfirmed_spender(txhash, txindex) is not None
+    return False
+
+
+async def get_unspents_iter(target_address, best_block=None, best_chain=None, view=None) -> AsyncGenerator:
+    """get unspents related by `target_address`, database and memory are read on one view"""
+    if view is None:
+        with acquire_view() as view:
+            async for unspent in _get_unspents_iter(view, target_address, best_block, best_chain):
+                yield unspent
+    else:
+        async for unspent in _get_unspents_iter(view, target_address, best_block, best_chain):
+            yield unspent
+
+
+async def _get_unspents_iter(view: 'ReadView', target_address, best_block, best_chain) -> AsyncGenerator:
+    if best_block is None and best_chain is None:
+        best_chain = view.best_chain
+    elif best_chain is None:
+        best_chain = _get_best_chain_all(best_block)
     assert best_chain is not None, 'Cannot get best_chain by {}'.format(best_block)
     allow_mined_height = best_chain[0].height - C.MATURE_HEIGHT
+    # used over awaits of caller, best overlay is updated in place by new blocks
+    overlay = MemoryOverlay.from_blocks(reversed(best_chain))
 
     # database
-    for address in target_address:
-        for dummy, txhash, txindex, coin_id, amount, f_used in obj.tables.read_address_idx_iter(address):
-            if f_used is False:
-                if not is_unused_index(input_hash=txhash, input_index=txindex, best_block=best_block, best_chain=best_chain):
+    if view.table_config['addrbalance']:
+        # unspent-only index, cost is not related to history
+        for address in target_address:
+            for txhash, txindex, coin_id, amount, height, f_reward in view.read_address_unspent_iter(address):
+                if _is_spent_on_memory(overlay, best_block, txhash, txindex):
                     continue  # used
-                tx = obj.tx_builder.get_account_tx(txhash)
-                if tx.type in (C.TX_POW_REWARD, C.TX_POS_REWARD):
-                    if tx.height is not None and tx.height < allow_mined_height:
-                        yield address, tx.height, txhash, txindex, coin_id, amount
-                else:
+                if f_reward and allow_mined_height <= height:
+                    continue  # not mature
+                yield address, height, txhash, txindex, coin_id, amount
+    else:
+        candidates = list()
+        for address in target_address:
+            for dummy, txhash, txindex, coin_id, amount, f_used in view.read_address_idx_iter(address):
+                if f_used is False and not _is_spent_on_memory(overlay, best_block, txhash, txindex):
+                    candidates.append((address, txhash, txindex, coin_id, amount))
+        unused_outputs = view.read_unused_index_many((txhash, txindex) for _, txhash, txindex, _, _ in candidates)
+        txs = obj.tx_builder.get_tx_many({txhash for _, txhash, _, _, _ in candidates}, view)
+        for address, txhash, txindex, coin_id, amount in candidates:
+            if unused_outputs[(txhash, txindex)] is None:
+                continue  # used
+            tx = txs[txhash]
+            if tx is None:
+                log.debug("not found unspent tx {}".format(txhash.hex()))
+                continue
+            if tx.type in (C.TX_POW_REWARD, C.TX_POS_REWARD):
+                if tx.height is not None and tx.height < allow_mined_height:
                     yield address, tx.height, txhash, txindex, coin_id, amount
+            else:
+                yield address, tx.height, txhash, txindex, coin_id, amount
 
     # memory
     for block in reversed(best_chain):
         for tx in block.txs:
             for index, (address, coin_id, amount) in enumerate(tx.outputs):
-                if not is_unused_index(input_hash=tx.hash, input_index=index, best_block=best_block, best_chain=best_chain):
+                if _is_spent_on_memory(overlay, best_block, tx.hash, index):
                     continue  # used
                 elif address in target_address:
                     if tx.type in (C.TX_POW_REWARD, C.TX_POS_REWARD):
@@ -66,7 +124,7 @@ async def get_unspents_iter(target_address, best_block=None, best_chain=None) ->
     if best_block is None:
         for tx in obj.tx_builder.memory_pool.list_all_obj(False):
             for index, (address, coin_id, amount) in enumerate(tx.outputs):
-                if not is_unused_index(input_hash=tx.hash, input_index=index, best_block=best_block, best_chain=best_chain):
+                if _is_spent_on_memory(overlay, best_block, tx.hash, index):
                     continue  # used
                 elif address in target_address:
                     yield address, None, tx.hash, index, coin_id, amount
@@ -74,43 +132,107 @@ async def get_unspents_iter(target_address, best_block=None, best_chain=None) ->
     # address, height, txhash, index, coin_id, amount
 
 
-async def get_my_unspents_iter(cur, best_chain=None) -> AsyncGenerator:
+async def get_my_unspents_iter(cur, best_chain=None, view=None) -> AsyncGenerator:
     """get unspents of account control (for private)"""
     last_uuid = len(target_address_cache)
     target_address_cache.update(await read_all_pooled_address_set(cur=cur, last_uuid=last_uuid))
-    return get_unspents_iter(target_address=target_address_cache, best_block=None, best_chain=best_chain)
+    return get_unspents_iter(target_address=target_address_cache,
+                             best_block=None,
+                             best_chain=best_chain,
+                             view=view)
 
 
-def get_output_from_input(input_hash, input_index, best_block=None, best_chain=None):
-    """get OutputType from InputType"""
+def get_output_from_input(input_hash, input_index, best_block=None, best_chain=None, view: 'ReadView' = None):
+    """get OutputType from InputType, database and memory are read on the view if given"""
     assert obj.chain_builder.best_block, 'Not Tables init'
-    if best_chain is None:
-        best_chain = _get_best_chain_all(best_block)
+    tables, overlay = _get_source(best_block, best_chain, view)
 
     # check database
-    pair = obj.tables.read_unused_index(input_hash, input_index)
+    pair = tables.read_unused_index(input_hash, input_index)
     if pair is not None:
         return pair
 
     # check memory
-    for block in best_chain:
-        for tx in block.txs:
-            if tx.hash == input_hash:
-                if input_index < len(tx.outputs):
-                    return tx.outputs[input_index]
+    pair = overlay.get_output(input_hash, input_index)
+    if pair is not None:
+        return pair
 
     # check unconfirmed
     if best_block is None:
-        for txhash in obj.tx_builder.memory_pool.list_all_hash():
-            if txhash == input_hash:
-                tx = obj.tx_builder.memory_pool.get_obj(txhash)
-                if input_index < len(tx.outputs):
-                    return tx.outputs[input_index]
+        outputs = obj.tx_builder.get_unconfirmed_outputs(input_hash)
+        if outputs is not None and input_index < len(outputs):
+            return outputs[input_index]
 
     # not found
     return None
 
 
+def get_outputs_from_inputs(
+        inputs: List[Tuple[bytes, int]],
+        best_block: 'Block' = None,
+        best_chain: List['Block'] = None,
+        view: 'ReadView' = None,
+) -> List[Optional[Tuple['PyAddress', int, int]]]:
+    """batched `get_output_from_input`, database is read by one sweep"""
+    assert obj.chain_builder.best_block, 'Not Tables init'
+    tables, overlay = _get_source(best_block, best_chain, view)
+
+    # check database
+    unused_outputs = tables.read_unused_index_many(inputs)
+    missed = {txhash for txhash, txindex in inputs if unused_outputs[(txhash, txindex)] is None}
+    if len(missed) == 0:
+        return [unused_outputs[pair] for pair in inputs]
+
+    # check memory and unconfirmed
+    outputs = list()
+    for txhash, txindex in inputs:
+        pair = unused_outputs[(txhash, txindex)]
+        if pair is None:
+            pair = overlay.get_output(txhash, txindex)
+        if pair is None and best_block is None:
+            unconfirmed_outputs = obj.tx_builder.get_unconfirmed_outputs(txhash)
+            if unconfirmed_outputs is not None and txindex < len(unconfirmed_outputs):
+                pair = unconfirmed_outputs[txindex]
+        outputs.append(pair)
+    return outputs
+
+
+def get_spending_info(
+        inputs: List[Tuple[bytes, int]],
+        best_block: 'Block' = None,
+        best_chain: List['Block'] = None,
+        view: 'ReadView' = None,
+) -> List[Optional[Tuple[bytes, int, Optional[int]]]]:
+    """
+    return (spending txhash, input index, height) of outpoints, None if unspent
+    note: spent on database require `spentindex`, height is None if spent by unconfirmed
+    """
+    assert obj.chain_builder.best_block, 'Not Tables init'
+    tables, overlay = _get_source(best_block, best_chain, view)
+    targets = set(inputs)
+
+    # check memory and unconfirmed
+    spending = dict()
+    for pair in targets:
+        info = overlay.get_spent(*pair)
+        if info is not None:
+            spending[pair] = info
+    if best_block is None:
+        for pair in targets - spending.keys():
+            spender = obj.tx_builder.get_unconfirmed_spender(*pair)
+            if spender is not None:
+                tx = obj.tx_builder.memory_pool.get_obj(spender)
+                spending[pair] = (spender, tx.inputs.index(pair), None)
+
+    # check database
+    missed = targets - spending.keys()
+    if missed and tables.table_config['spentindex']:
+        for pair, info in tables.read_spent_index_many(missed).items():
+            if info is not None:
+                spending[pair] = info
+    return [spending.get(pair) for pair in inputs]
+
+
 def is_unused_index(
         input_hash: bytes,
         input_index: int,
@@ -123,7 +245,6 @@ def is_unused_index(
     assert obj.chain_builder.best_block, 'Not Tables init'
     if best_chain is None:
         best_chain = _get_best_chain_all(best_block)
-    input_pair_tuple = (input_hash, input_index)
 
     is_unused = False
 
@@ -132,22 +253,20 @@ def is_unused_index(
         is_unused = True
 
     # check memory
-    for block in best_chain:
-        for tx in block.txs:
-            if tx.hash == input_hash:
-                assert input_index < len(tx.outputs)
-                is_unused = True
-            if input_pair_tuple in tx.inputs:
-                return False
+    overlay = obj.chain_builder.get_overlay(best_chain)
+    if overlay.get_spent(input_hash, input_index) is not None:
+        return False
+    if overlay.get_output(input_hash, input_index) is not None:
+        is_unused = True
 
     # check unconfirmed
     if best_block is None:
-        for tx in obj.tx_builder.memory_pool.list_all_obj(False):
-            if tx.hash == input_hash:
-                assert input_index < len(tx.outputs)
-                is_unused = True
-            if input_pair_tuple in tx.inputs:
-                return False
+        if obj.tx_builder.get_unconfirmed_spender(input_hash, input_index) is not None:
+            return False
+        outputs = obj.tx_builder.get_unconfirmed_outputs(input_hash)
+        if outputs is not None:
+            assert input_index < len(outputs)
+            is_unused = True
 
     # all check passed
     return is_unused
@@ -166,7 +285,6 @@ def is_unused_index_except_me(
     assert obj.chain_builder.best_block, 'Not Tables init'
     if best_chain is None:
         best_chain = _get_best_chain_all(best_block)
-    input_pair_tuple = (input_hash, input_index)
 
     is_unused = False
 
@@ -175,26 +293,22 @@ def is_unused_index_except_me(
         is_unused = True
 
     # check memory
-    for block in best_chain:
-        for tx in block.txs:
-            if tx.hash == except_hash:
-                continue
-            if tx.hash == input_hash:
-                assert input_index < len(tx.outputs)
-                is_unused = True
-            if input_pair_tuple in tx.inputs:
-                return False
+    overlay = obj.chain_builder.get_overlay(best_chain)
+    spent = overlay.get_spent(input_hash, input_index)
+    if spent is not None and spent[0] != except_hash:
+        return False
+    if input_hash != except_hash and overlay.get_output(input_hash, input_index) is not None:
+        is_unused = True
 
     # check unconfirmed
     if best_block is None:
-        for tx in obj.tx_builder.memory_pool.list_all_obj(False):
-            if tx.hash == except_hash:
-                continue
-            if tx.hash == input_hash:
-                assert input_index < len(tx.outputs)
-                is_unused = True
-            if input_pair_tuple in tx.inputs:
-                return False
+        spender = obj.tx_builder.get_unconfirmed_spender(input_hash, input_index)
+        if spender is not None and spender != except_hash:
+            return False
+        outputs = obj.tx_builder.get_unconfirmed_outputs(input_hash) if input_hash != except_hash else None
+        if outputs is not None:
+            assert input_index < len(outputs)
+            is_unused = True
 
     # all check passed
     return is_unused
@@ -204,6 +318,8 @@ __all__ = [
     "get_unspents_iter",
     "get_my_unspents_iter",
     "get_output_from_input",
+    "get_outputs_from_inputs",
+    "get_spending_info",
     "is_unused_index",
     "is_unused_index_except_me",
 ]
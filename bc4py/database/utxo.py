@@ -0,0 +1,145 @@
+from bc4py.config import V
+from bc4py.bip32 import ADDR_SIZE
+from bc4py.database.storage import seek_many
+from bc4py_extension import PyAddress
+from collections import OrderedDict
+from logging import getLogger
+from typing import Dict, Iterable, Optional, Tuple
+import struct
+
+log = getLogger('bc4py')
+
+"""
+UTXO cache
+====
+write-back cache in front of `_unused_index`, all outpoint lookups are served by this
+clean entries: same as database (None is a cached miss), evicted by LRU
+dirty entries: changed by the batch, visible only to the batch task and flushed on commit
+"""
+
+struct_unused_idx = struct.Struct('>{}sIQ'.format(ADDR_SIZE))
+UTXO_CACHE_SIZE = 64 * 1024 * 1024  # bytes
+UTXO_ENTRY_SIZE = 200  # approximate bytes of one entry (key, tuple, PyAddress, OrderedDict link)
+
+Output = Tuple[PyAddress, int, int]
+
+
+class UTXOCache(object):
+
+    def __init__(self, db, max_memory=UTXO_CACHE_SIZE):
+        self.db = db
+        self.max_entries = max(1, max_memory // UTXO_ENTRY_SIZE)
+        self.clean: 'OrderedDict[bytes, Optional[Output]]' = OrderedDict()
+        # key -> (output or None, fresh), fresh output is not on database
+        self.dirty: Dict[bytes, Tuple[Optional[Output], bool]] = dict()
+        # counters
+        self.hit = 0
+        self.miss = 0
+        self.flushed = 0
+        self.evicted = 0
+
+    def __repr__(self):
+        return "<UTXOCache clean={} dirty={} hit_rate={}>".format(
+            len(self.clean), len(self.dirty), round(self.hit_rate(), 3))
+
+    def hit_rate(self) -> float:
+        total = self.hit + self.miss
+        return self.hit / total if total else 0.0
+
+    def getinfo(self):
+        return {
+            'clean': len(self.clean),
+            'dirty': len(self.dirty),
+            'max_entries': self.max_entries,
+            'hit': self.hit,
+            'miss': self.miss,
+            'hit_rate': round(self.hit_rate(), 4),
+            'flushed': self.flushed,
+            'evicted': self.evicted,
+        }
+
+    def get(self, key, with_dirty=False) -> Optional[Output]:
+        """return unused output, dirty entries are seen by batch task only"""
+        if with_dirty and key in self.dirty:
+            self.hit += 1
+            return self.dirty[key][0]
+        if key in self.clean:
+            self.hit += 1
+            self.clean.move_to_end(key)
+            return self.clean[key]
+        self.miss += 1
+        output = self._decode(self.db.get(key, default=None))
+        self._put_clean(key, output)
+        return output
+
+    def get_many(self, keys: Iterable[bytes], with_dirty=False) -> Dict[bytes, Optional[Output]]:
+        """return unused outputs, missed keys are read by one iterator sweep"""
+        result = dict()
+        missed = list()
+        for key in keys:
+            if with_dirty and key in self.dirty:
+                self.hit += 1
+                result[key] = self.dirty[key][0]
+            elif key in self.clean:
+                self.hit += 1
+                self.clean.move_to_end(key)
+                result[key] = self.clean[key]
+            else:
+                missed.append(key)
+        self.miss += len(missed)
+        for key, b in seek_many(self.db, missed):
+            output = result[key] = self._decode(b)
+            self._put_clean(key, output)
+        return result
+
+    def put(self, key, output: Output, fresh=True):
+        """new unused output, outputs of new tx are fresh"""
+        self.dirty[key] = (output, fresh)
+
+    def delete(self, key):
+        """output is used"""
+        if key in self.dirty and self.dirty[key][1]:
+            # created and used by the same batch, never reach database
+            del self.dirty[key]
+            return
+        self.dirty[key] = (None, False)
+
+    def flush(self, batch):
+        """write dirty entries to the batch before commit"""
+        for key, (output, _fresh) in self.dirty.items():
+            if output is None:
+                batch.delete(key)
+            else:
+                address, coin_id, amount = output
+                batch.put(key, struct_unused_idx.pack(address.binary(), coin_id, amount))
+        self.flushed += len(self.dirty)
+
+    def commit(self):
+        """database is written, dirty entries become clean"""
+        for key, (output, _fresh) in self.dirty.items():
+            self._put_clean(key, output)
+        self.dirty.clear()
+
+    def rollback(self):
+        self.dirty.clear()
+
+    @staticmethod
+    def _decode(b) -> Optional[Output]:
+        if b is None:
+            return None
+        b_address, coin_id, amount = struct_unused_idx.unpack(b)
+        return PyAddress.from_binary(V.BECH32_HRP, b_address), coin_id, amount
+
+    def _put_clean(self, key, output):
+        self.clean[key] = output
+        self.clean.move_to_end(key)
+        while self.max_entries < len(self.clean):
+            self.clean.popitem(last=False)
+            self.evicted += 1
+
+
+__all__ = [
+    "struct_unused_idx",
+    "UTXO_CACHE_SIZE",
+    "UTXOCache",
+]
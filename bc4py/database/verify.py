@@ -0,0 +1,160 @@
+from bc4py.config import C
+from bc4py.chain.utils import bits2target
+from bc4py.chain.tx import TX
+from bc4py.chain.block import struct_block as struct_b_block
+from bc4py.database.builder import Tables, BlockBuilderError, struct_block, struct_tx
+from bc4py.database.headers import struct_header
+from bc4py_extension import sha256d_hash, merkleroot_hash
+from multiprocessing import Pool
+from collections import deque
+from logging import getLogger
+from typing import List, NamedTuple, Optional
+from time import time
+import os
+
+log = getLogger('bc4py')
+
+"""
+parallel chain verification
+====
+height range is split to slices and verified by worker processes, boundary hashes are stitched by main process
+levels: `header` linkage and blockhash, `pow` + target and recalculated proof of work,
+        `full` + tx body and merkleroot
+run on boot by `--verify-level`, bodies of `full` level are read by main process (LevelDB is not shared)
+"""
+
+VERIFY_LEVELS = ('header', 'pow', 'full')
+VERIFY_RANGE_SIZE = {'header': 20000, 'pow': 2000, 'full': 200}  # blocks of one worker task
+PROGRESS_SPAN = 10.0  # seconds between progress logs
+PROOF_OF_WORK_FLAGS = {C.BLOCK_YES_POW, C.BLOCK_X11_POW, C.BLOCK_X16S_POW}
+
+
+class SliceResult(NamedTuple):
+    start: int
+    stop: int
+    first_previous_hash: bytes
+    last_hash: bytes
+    error: Optional[str]
+
+
+def _verify_body(height, record, b) -> Optional[str]:
+    """body must match header and txs must match merkleroot"""
+    blockhash, work, b_block, flag = record
+    b_height, b_work, b_b_block, b_flag, tx_len = struct_block.unpack_from(b)
+    if (b_height, b_work, b_b_block, b_flag) != (height, work, b_block, flag):
+        return "body is not match header on height {}".format(height)
+    if tx_len == 0:
+        return "no tx found on height {}".format(height)
+    offset = struct_block.size
+    txhashs = list()
+    for _ in range(tx_len):
+        bin_len, sign_len, r_len = struct_tx.unpack_from(b, offset)
+        offset += struct_tx.size
+        tx = TX.from_binary(binary=b[offset:offset + bin_len])
+        offset += bin_len + sign_len + r_len
+        txhashs.append(tx.hash)
+    if offset != len(b):
+        return "body size is not match on height {}".format(height)
+    if merkleroot_hash(txhashs) != struct_b_block.unpack(b_block)[2]:
+        return "merkleroot is not match on height {}".format(height)
+    return None
+
+
+def _verify_worker(start, records: bytes, bodies: Optional[List[Optional[bytes]]], level) -> SliceResult:
+    """verify one slice of header records, linkage to outside is checked by caller"""
+    if level != 'header':
+        from bc4py.chain.workhash import get_workhash_fnc
+    first_previous_hash = before_hash = None
+    stop = start + len(records) // struct_header.size
+    for height in range(start, stop):
+        record = struct_header.unpack_from(records, (height - start) * struct_header.size)
+        blockhash, work, b_block, flag = record
+        _version, previous_hash, _merkleroot, _time, bits, _nonce = struct_b_block.unpack(b_block)
+        if before_hash is None:
+            first_previous_hash = previous_hash
+        elif previous_hash != before_hash:
+            return SliceResult(start, stop, first_previous_hash, before_hash,
+                               "PreviousHash != BlockHash on height {}".format(height))
+        if sha256d_hash(b_block) != blockhash:
+            return SliceResult(start, stop, first_previous_hash, before_hash,
+                               "BlockHash is not match header on height {}".format(height))
+        if level != 'header':
+            if bits2target(bits) <= int.from_bytes(work, 'little'):
+                return SliceResult(start, stop, first_previous_hash, before_hash,
+                                   "work is over target on height {}".format(height))
+            if flag in PROOF_OF_WORK_FLAGS and get_workhash_fnc(flag)(b_block) != work:
+                return SliceResult(start, stop, first_previous_hash, before_hash,
+                                   "proof of work is not match on height {}".format(height))
+        if bodies is not None and bodies[height - start] is not None:
+            error = _verify_body(height, record, bodies[height - start])
+            if error:
+                return SliceResult(start, stop, first_previous_hash, before_hash, error)
+        before_hash = blockhash
+    return SliceResult(start, stop, first_previous_hash, before_hash, None)
+
+
+def _iter_slices(tables: Tables, level, start, stop, range_size):
+    headers = tables.headers
+    for slice_start in range(start, stop, range_size):
+        slice_stop = min(stop, slice_start + range_size)
+        records = bytes(headers.array[slice_start * struct_header.size:slice_stop * struct_header.size])
+        if level == 'full':
+            bodies = list()
+            for height in range(slice_start, slice_stop):
+                b = tables.read_block_binary(headers.get_hash(height))
+                bodies.append(None if b is None else bytes(b))
+        else:
+            bodies = None
+        yield slice_start, records, bodies, level
+
+
+def verify_chain(tables: Tables, level='header', start=1, stop=None, workers=None, range_size=None) -> int:
+    """
+    verify heights start <= height < stop by worker processes, return verified count
+    raise BlockBuilderError if found broken header or body
+    note: blocking, run on I/O thread
+    """
+    assert level in VERIFY_LEVELS, 'unknown verify level {}'.format(level)
+    stop = len(tables.headers) if stop is None else stop
+    if stop <= start:
+        return 0
+    workers = workers or os.cpu_count() or 1
+    range_size = range_size or VERIFY_RANGE_SIZE[level]
+    s = report_time = time()
+    results: List[SliceResult] = list()
+    verified = 0
+    log.info("start {} verification {}->{} by {} workers".format(level, start, stop - 1, workers))
+    with Pool(workers) as pool:
+        # bodies of full level are large, keep in-flight slices small
+        running = deque()
+        for args in _iter_slices(tables, level, start, stop, range_size):
+            running.append(pool.apply_async(_verify_worker, args))
+            while running and (workers * 2 <= len(running) or running[0].ready()):
+                results.append(running.popleft().get())
+                verified += results[-1].stop - results[-1].start
+                if results[-1].error:
+                    raise BlockBuilderError("verification failed, {}".format(results[-1].error))
+                if PROGRESS_SPAN < time() - report_time:
+                    report_time = time()
+                    log.info("verified {}/{} blocks {}% {}blocks/Sec".format(
+                        verified, stop - start, round(verified / (stop - start) * 100, 1),
+                        round(verified / (time() - s))))
+        while running:
+            results.append(running.popleft().get())
+            verified += results[-1].stop - results[-1].start
+            if results[-1].error:
+                raise BlockBuilderError("verification failed, {}".format(results[-1].error))
+    # stitch boundaries
+    before_hash = tables.read_block_hash(start - 1)
+    for result in results:
+        if result.first_previous_hash != before_hash:
+            raise BlockBuilderError("PreviousHash != BlockHash on height {}".format(result.start))
+        before_hash = result.last_hash
+    log.info("finish {} verification {} blocks {}Sec".format(level, verified, round(time() - s, 3)))
+    return verified
+
+
+__all__ = [
+    "VERIFY_LEVELS",
+    "verify_chain",
+]
@@ -0,0 +1,200 @@
+from bc4py.database import obj, aio
+from bc4py.database.builder import Tables, ITER_ORDER
+from bc4py.database.storage import seek_many
+from bc4py.database.utxo import UTXOCache
+from bc4py.database.overlay import MemoryOverlay
+from bc4py.chain.block import Block
+from logging import getLogger
+from typing import Dict, Iterable, List, Optional, Tuple
+
+log = getLogger('bc4py')
+
+"""
+read view
+====
+LevelDB snapshots of all tables with the memory chain on top of them, acquire once per request
+snapshots are shared by views of one generation (a batch commit), closed when the last view released
+tables are never seen half written and `root_block` never moves while the request is running
+"""
+
+
+class TableSnapshots(object):
+    """snapshots of all tables at one generation"""
+    __slots__ = ("generation", "tables", "refs", "expired")
+
+    def __init__(self, tables: Tables):
+        self.generation = tables.generation
+        self.tables = {name: tables.dbs[name].snapshot() for name in tables.table_list}
+        self.refs = 0
+        self.expired = False
+
+    def __repr__(self):
+        return "<TableSnapshots gen={} refs={} expired={}>".format(self.generation, self.refs, self.expired)
+
+    def release(self):
+        self.refs -= 1
+        self.close_if_unused()
+
+    def expire(self):
+        self.expired = True
+        self.close_if_unused()
+
+    def close_if_unused(self):
+        if self.expired and self.refs == 0 and self.tables:
+            for snapshot in self.tables.values():
+                snapshot.close()
+            self.tables.clear()
+
+
+# snapshots of latest generation
+current_snapshots: Optional[TableSnapshots] = None
+
+
+def pin_snapshots() -> TableSnapshots:
+    """snapshots of current generation, `batch_commit()` takes them before write"""
+    global current_snapshots
+    tables = obj.tables
+    if current_snapshots is None or current_snapshots.generation != tables.generation:
+        # note: tables may be half written while batches are written by I/O thread
+        assert not tables.writing, 'cannot take snapshots while writing'
+        if current_snapshots is not None:
+            current_snapshots.expire()
+        current_snapshots = TableSnapshots(tables)
+    return current_snapshots
+
+
+def acquire_view() -> 'ReadView':
+    """view of current generation, use by `with` statement"""
+    if obj.tables.writing:
+        # state before the write, pinned by `batch_commit()`
+        return ReadView(current_snapshots)
+    return ReadView(pin_snapshots())
+
+
+class ReadView(object):
+    """
+    consistent read of database and memory chain
+    database part is pinned by snapshots, memory part is pinned by `root_block` and `best_chain`
+    """
+
+    # pure read methods of tables work on snapshots as they are
+    read_tx = Tables.read_tx
+    read_tx_many = Tables.read_tx_many
+    _read_tx_from_block_binary = Tables._read_tx_from_block_binary
+    have_tx = Tables.have_tx
+    read_address_idx = Tables.read_address_idx
+    read_address_idx_iter = Tables.read_address_idx_iter
+    read_address_balance = Tables.read_address_balance
+    read_address_unspent_iter = Tables.read_address_unspent_iter
+    read_spent_index = Tables.read_spent_index
+    read_spent_index_many = Tables.read_spent_index_many
+    read_coins_iter = Tables.read_coins_iter
+
+    def __init__(self, snapshots: TableSnapshots):
+        snapshots.refs += 1
+        self.snapshots = snapshots
+        self.generation = snapshots.generation
+        self.root_block: Block = obj.chain_builder.root_block
+        self.best_block: Block = obj.chain_builder.best_block
+        # [<height=n+m>, .., <height=n+1>], list and indexes are replaced (not modified) by new block
+        self.best_chain: List[Block] = obj.chain_builder.best_chain
+        self.best_height2block: Dict[int, Block] = obj.chain_builder.best_height2block
+        self.best_hash2index: Dict[bytes, int] = obj.chain_builder.best_hash2index
+        self.table_config = obj.tables.table_config
+        for name, snapshot in snapshots.tables.items():
+            setattr(self, name, snapshot)
+
+    def __repr__(self):
+        return "<ReadView gen={} root={} best={}>".format(
+            self.generation, self.root_block.height, self.best_block.height)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.snapshots is not None:
+            self.snapshots.release()
+            self.snapshots = None
+
+    def read_block_hash(self, height) -> Optional[bytes]:
+        if height <= self.root_block.height:
+            return obj.tables.read_block_hash(height)
+        block = self.best_height2block.get(height)
+        return None if block is None else block.hash
+
+    def read_block_binary(self, blockhash, db=None):
+        return obj.tables.read_block_binary(blockhash, db or self._block)
+
+    def read_block(self, blockhash):
+        if blockhash in self.best_hash2index:
+            return self.best_chain[self.best_hash2index[blockhash]]
+        return obj.tables.read_block(blockhash, self._block)
+
+    def get_block(self, height):
+        """block of best chain on this view"""
+        blockhash = self.read_block_hash(height)
+        if blockhash is None:
+            return None
+        return self.read_block(blockhash)
+
+    def get_overlay(self):
+        """overlay of memory section of this view, do not keep it over await"""
+        if self.root_block is obj.chain_builder.root_block:
+            return obj.chain_builder.get_overlay(self.best_chain)
+        # root moved after acquired, blocks over old root are not on best overlay
+        return MemoryOverlay.from_blocks(reversed(self.best_chain))
+
+    def read_block_many(self, blockhashs) -> List[Optional[Block]]:
+        """run on I/O thread, snapshot is kept until the view is closed"""
+        return [obj.tables.read_block(blockhash, self._block) for blockhash in blockhashs]
+
+    async def get_block_range(self, start, stop) -> List[Block]:
+        """blocks of start <= height < stop on this view, database blocks are read on I/O thread"""
+        blockhashs = list()
+        for height in range(max(0, start), min(stop, self.best_block.height + 1)):
+            blockhash = self.read_block_hash(height)
+            if blockhash is None:
+                break
+            blockhashs.append(blockhash)
+        db_hashs = [blockhash for blockhash in blockhashs if blockhash not in self.best_hash2index]
+        db_blocks = dict()
+        if db_hashs:
+            db_blocks.update(zip(db_hashs, await aio.run_io('read_block_many', self.read_block_many, db_hashs)))
+        blocks = list()
+        for blockhash in blockhashs:
+            if blockhash in self.best_hash2index:
+                block = self.best_chain[self.best_hash2index[blockhash]]
+            else:
+                block = db_blocks[blockhash]
+            if block is None:
+                break
+            blocks.append(block)
+        return blocks
+
+    async def get_block_by_hash(self, blockhash) -> Optional[Block]:
+        """block of best chain, fork on memory or database"""
+        if blockhash in self.best_hash2index:
+            return self.best_chain[self.best_hash2index[blockhash]]
+        block = obj.chain_builder.chain.get(blockhash)
+        if block is not None:
+            return block
+        return await aio.run_io('read_block', obj.tables.read_block, blockhash, self._block)
+
+    def read_unused_index(self, txhash, txindex):
+        """return unused outputs info on database, UTXO cache is not used because it is newer"""
+        return UTXOCache._decode(self._unused_index.get(txhash + txindex.to_bytes(1, ITER_ORDER)))
+
+    def read_unused_index_many(
+            self, pairs: Iterable[Tuple[bytes, int]]) -> Dict[Tuple[bytes, int], Optional[tuple]]:
+        keys = {txhash + txindex.to_bytes(1, ITER_ORDER): (txhash, txindex) for txhash, txindex in pairs}
+        return {keys[key]: UTXOCache._decode(b) for key, b in seek_many(self._unused_index, keys)}
+
+
+__all__ = [
+    "pin_snapshots",
+    "acquire_view",
+    "ReadView",
+]
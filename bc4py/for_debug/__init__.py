@@ -1,5 +1,6 @@
 from bc4py.config import P, stream
 from logging import *
+from collections import deque
 from time import time
 import socket
 import asyncio
@@ -56,6 +57,36 @@ def stream_printer():
     stream.subscribe(on_next=log.debug, on_error=log.error)
 
 
+class LatencyStats(object):
+    """recent latency samples"""
+
+    def __init__(self, maxlen=600):
+        self.samples = deque(maxlen=maxlen)
+        self.slow = 0
+
+    def add(self, latency, limit):
+        self.samples.append(latency)
+        if limit < latency:
+            self.slow += 1
+
+    def getinfo(self):
+        if len(self.samples) == 0:
+            return None
+        samples = sorted(self.samples)
+        return {
+            'samples': len(samples),
+            'last_ms': round(self.samples[-1] * 1000, 3),
+            'avg_ms': round(sum(samples) / len(samples) * 1000, 3),
+            'p99_ms': round(samples[max(0, int(len(samples) * 0.99) - 1)] * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3),
+            'slow': self.slow,
+        }
+
+
+loop_lag = LatencyStats()  # event loop delay
+block_accept_latency = LatencyStats(maxlen=1000)  # `new_insert_block()` call to finish
+
+
 async def slow_event_loop_detector(span=1.0, limit=0.1):
     """find event loop delay and detect blocking"""
     log.info(f"setup slow_event_loop_detector limit={limit}s")
@@ -63,6 +94,7 @@ async def slow_event_loop_detector(span=1.0, limit=0.1):
         try:
             s = time()
             await asyncio.sleep(0.0)
+            loop_lag.add(time() - s, limit)
             if limit < time() - s:
                 log.debug(f"slow event loop {int((time()-s)*1000)}mS!")
             await asyncio.sleep(span)
@@ -74,5 +106,8 @@ __all__ = [
     "f_already_bind",
     "set_logger",
     "stream_printer",
+    "LatencyStats",
+    "loop_lag",
+    "block_accept_latency",
     "slow_event_loop_detector",
 ]
@@ -0,0 +1,371 @@
+from logging import getLogger
+from tempfile import TemporaryDirectory
+from time import time
+import random
+import os
+
+log = getLogger('bc4py')
+
+"""
+benchmarks for developer
+====
+run by `python -m bc4py.for_debug.benchmark NAME`
+"""
+
+
+def _latency_report(label, latency_list):
+    latency_list = sorted(latency_list)
+    avg = sum(latency_list) / len(latency_list)
+    p99 = latency_list[int(len(latency_list) * 0.99) - 1]
+    print("{:32s} avg={:8.2f}uS p99={:8.2f}uS n={}".format(
+        label, avg * 1000000, p99 * 1000000, len(latency_list)))
+
+
+def bench_leveldb_options(n_items=200000, n_reads=50000, miss_ratio=0.5):
+    """
+    random point lookup latency of `read_unused_index` / `read_tx` index
+    compare plyvel defaults (before) with `get_db_options()` (after)
+    """
+    import plyvel
+    from bc4py.database.storage import get_db_options
+    for name, value_size in (('_unused_index', 21 + 4 + 8), ('_tx_index', 4 + 4)):
+        key_size = 33 if name == '_unused_index' else 32
+        exist_keys = [os.urandom(key_size) for _ in range(n_items)]
+        # spent outpoints or unknown txs
+        missed_keys = [os.urandom(key_size) for _ in range(n_items)]
+        for label, options in (('before', dict()), ('after', get_db_options(name))):
+            with TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, name)
+                db = plyvel.DB(path, create_if_missing=True, **options)
+                batch = db.write_batch()
+                for key in exist_keys:
+                    batch.put(key, os.urandom(value_size))
+                batch.write()
+                db.compact_range()
+                db.close()
+                # reopen to read from table files
+                db = plyvel.DB(path, **options)
+                latency_list = list()
+                for _ in range(n_reads):
+                    if random.random() < miss_ratio:
+                        key = random.choice(missed_keys)
+                    else:
+                        key = random.choice(exist_keys)
+                    s = time()
+                    db.get(key)
+                    latency_list.append(time() - s)
+                db.close()
+            _latency_report("{} {}".format(name, label), latency_list)
+
+
+class _DummyBlock(object):
+    __slots__ = ("hash", "previous_hash", "height", "score", "create_time")
+
+    def __init__(self, previous_hash, height):
+        self.hash = os.urandom(32)
+        self.previous_hash = previous_hash
+        self.height = height
+        self.score = random.random()
+        self.create_time = time()
+
+
+def _legacy_best_block(chain, root_hash):
+    """`ChainBuilder.get_best_chain()` before fork tree"""
+    best_score = 0.0
+    best_block = None
+    best_sets = set()
+    for block in sorted(chain.values(), key=lambda x: x.create_time, reverse=True):
+        if block in best_sets:
+            continue
+        tmp_best_score = block.score
+        tmp_best_block = block
+        tmp_best_sets = {block}
+        while block.previous_hash in chain:
+            block = chain[block.previous_hash]
+            tmp_best_score += block.score
+            tmp_best_sets.add(block)
+        else:
+            if root_hash != block.previous_hash:
+                continue
+        if best_score > tmp_best_score:
+            continue
+        best_score = tmp_best_score
+        best_block = tmp_best_block
+        best_sets = tmp_best_sets
+    return best_block, sorted(best_sets, key=lambda x: x.height, reverse=True)
+
+
+def bench_fork_tree(cache_sizes=(250, 1000, 5000), n_inserts=20, fork_ratio=0.1):
+    """
+    cost of one `new_block()` best chain update at memory cache size
+    compare sorting all blocks (before) with fork tree insert and reorg walk (after)
+    """
+    from bc4py.database.forktree import ForkTree
+    for cache_size in cache_sizes:
+        root = _DummyBlock(b'\x00' * 32, 0)
+        blocks = list()
+        tip = root
+        for height in range(1, cache_size + n_inserts + 1):
+            if blocks and random.random() < fork_ratio:
+                # orphan block on a recent height
+                parent = random.choice(blocks[-10:])
+                blocks.append(_DummyBlock(parent.hash, parent.height + 1))
+            tip = _DummyBlock(tip.hash, height)
+            blocks.append(tip)
+        filled, inserted = blocks[:-n_inserts], blocks[-n_inserts:]
+        # before
+        chain = {block.hash: block for block in filled}
+        latency_list = list()
+        for block in inserted:
+            s = time()
+            chain[block.hash] = block
+            _legacy_best_block(chain, root.hash)
+            latency_list.append(time() - s)
+        _latency_report("fork_tree {} before".format(cache_size), latency_list)
+        # after
+        tree = ForkTree(root)
+        for block in filled:
+            tree.add(block)
+        latency_list = list()
+        for block in inserted:
+            s = time()
+            old_best = tree.best
+            if tree.add(block):
+                tree.reorg(old_best, tree.best)
+                tree.best_chain()
+            latency_list.append(time() - s)
+        _latency_report("fork_tree {} after".format(cache_size), latency_list)
+
+
+class _DummyTX(object):
+    __slots__ = ("hash", "inputs", "outputs")
+
+    def __init__(self, inputs, n_outputs):
+        self.hash = os.urandom(32)
+        self.inputs = inputs
+        self.outputs = [(os.urandom(21), 0, random.randint(1, 100000000)) for _ in range(n_outputs)]
+
+
+class _DummyTXBlock(_DummyBlock):
+    __slots__ = ("txs",)
+
+    def __init__(self, previous_hash, height, txs):
+        super().__init__(previous_hash, height)
+        self.txs = txs
+
+
+def _legacy_validate_block(block, best_chain):
+    """memory part of `check_tx()` for block txs before validation context"""
+    def get_output(txhash, txindex):
+        for b in best_chain:
+            for tx in b.txs:
+                if tx.hash == txhash and txindex < len(tx.outputs):
+                    return tx.outputs[txindex]
+        return None
+
+    for tx in block.txs:
+        for txhash, txindex in tx.inputs:
+            # inputs_origin_check
+            assert get_output(txhash, txindex) is not None
+            is_unused = False
+            for b in best_chain:
+                for check_tx in b.txs:
+                    if check_tx.hash == tx.hash:
+                        continue
+                    if check_tx.hash == txhash:
+                        is_unused = True
+                    if (txhash, txindex) in check_tx.inputs:
+                        is_unused = False
+            assert is_unused
+            for input_tx in block.txs:
+                if input_tx is not tx:
+                    assert (txhash, txindex) not in input_tx.inputs
+        # amount_check and signature_check
+        for _ in range(2):
+            for txhash, txindex in tx.inputs:
+                assert get_output(txhash, txindex) is not None
+
+
+def _context_validate_block(block, base_overlay):
+    """memory part of `check_tx()` for block txs with overlay and context"""
+    from bc4py.database.overlay import ForkOverlay
+    overlay = ForkOverlay(base_overlay, (), (block,))
+    outputs = {pair: overlay.get_output(*pair) for tx in block.txs for pair in tx.inputs}
+    spent = dict()
+    for tx in block.txs:
+        for pair in tx.inputs:
+            assert outputs[pair] is not None
+            info = overlay.get_spent(*pair)
+            assert info is None or info[0] == tx.hash
+            assert spent.setdefault(pair, tx.hash) == tx.hash
+        for _ in range(2):
+            for pair in tx.inputs:
+                assert outputs[pair] is not None
+
+
+def bench_block_validation(cache_sizes=(50, 250), block_size=300 * 1000, tx_size=250, txs_per_block=10):
+    """
+    memory part of full block validation, inputs spend outputs on memory section
+    compare scanning best chain per input (before) with overlay and validation context (after)
+    note: database reads are not included, they are one sweep by context
+    """
+    from bc4py.database.overlay import MemoryOverlay
+    n_txs = block_size // tx_size
+    for cache_size in cache_sizes:
+        root = _DummyBlock(b'\x00' * 32, 0)
+        best_chain = list()
+        tip = root
+        for height in range(1, cache_size + 1):
+            txs = [_DummyTX(list(), 4) for _ in range(txs_per_block)]
+            tip = _DummyTXBlock(tip.hash, height, txs)
+            best_chain.insert(0, tip)
+        unspents = [
+            (tx.hash, index) for block in best_chain for tx in block.txs for index in range(len(tx.outputs))
+        ]
+        random.shuffle(unspents)
+        inputs = unspents[:n_txs * 2]
+        txs = [_DummyTX(inputs[i:i + 2], 2) for i in range(0, len(inputs), 2)]
+        block = _DummyTXBlock(tip.hash, tip.height + 1, txs)
+        # before
+        s = time()
+        _legacy_validate_block(block, [block] + best_chain)
+        _latency_report("validation {} {}txs before".format(cache_size, len(txs)), [time() - s])
+        # after, best chain overlay is kept by `new_block()`
+        base_overlay = MemoryOverlay.from_blocks(reversed(best_chain))
+        s = time()
+        _context_validate_block(block, base_overlay)
+        _latency_report("validation {} {}txs after".format(cache_size, len(txs)), [time() - s])
+
+
+def bench_tx_admission(n_txs=2000, batch_sizes=(1, 50, 500), tx_size=250):
+    """
+    signature verification and account database write of incoming txs
+    batch size 1 is one executor call and one SQLite connection per tx (before),
+    others are admission batches (after)
+    """
+    from multi_party_schnorr import PyKeyPair, verify_auto_multi
+    from bc4py.database.create import create_db
+    import sqlite3
+    import asyncio
+    tasks = list()
+    addresses = list()
+    for _ in range(n_txs):
+        keypair = PyKeyPair.from_secret_key(os.urandom(32))
+        binary = os.urandom(tx_size)
+        r, s = keypair.get_single_sign(binary)
+        tasks.append((s, r, keypair.get_public_key(), binary))
+        addresses.append(os.urandom(21))
+
+    async def admit(path, batch_size):
+        loop = asyncio.get_event_loop()
+        for i in range(0, n_txs, batch_size):
+            task_list = tasks[i:i + batch_size]
+            result_list = await loop.run_in_executor(None, verify_auto_multi, task_list, os.cpu_count(), False)
+            assert all(result_list)
+            async with create_db(path) as db:
+                cur = await db.cursor()
+                for (_s, _r, _pk, binary), address in zip(task_list, addresses[i:i + batch_size]):
+                    await cur.execute("UPDATE `pool` SET `is_used` = ? WHERE `ck`=? AND `is_used` IS NULL",
+                                      (binary[:32], address))
+                await db.commit()
+
+    for batch_size in batch_sizes:
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'account.db')
+            with sqlite3.connect(path) as db:
+                db.execute("CREATE TABLE `pool` (`ck` BINARY PRIMARY KEY, `is_used` BINARY)")
+                db.executemany("INSERT INTO `pool` VALUES (?, NULL)", [(address,) for address in addresses])
+            s = time()
+            asyncio.get_event_loop().run_until_complete(admit(path, batch_size))
+            elapsed = time() - s
+            label = "before" if batch_size == 1 else "after"
+            print("{:32s} {:8.1f}tx/s n={}".format(
+                "admission batch={} {}".format(batch_size, label), n_txs / elapsed, n_txs))
+
+
+def bench_block_accept(boot_path=None, n_blocks=3000, cache_limit=250, batch_size=50):
+    """
+    `new_insert_block()` latency by replaying bootstrap blocks to temporary database
+    compare waiting batch apply under `new_block_lock` (before) with background flush (after)
+    note: run on the directory of `boot.json`, bootstrap file is made by `create_bootstrap` API
+    """
+    from bc4py import __chain_version__
+    from bc4py.config import V
+    from bc4py.chain import msgpack
+    from bc4py.chain.checking import new_insert_block
+    from bc4py.database import obj
+    from bc4py.database.builder import ChainBuilder, setup_database_obj
+    from bc4py.database.create import check_account_db
+    from bc4py.user.boot import load_boot_file
+    from bc4py.utils import set_blockchain_params
+    import asyncio
+    import gzip
+    boot_path = boot_path or os.path.join(
+        os.path.expanduser("~"), 'blockchain-py', 'bootstrap-ver{}.dat.gz'.format(__chain_version__))
+    genesis_block, genesis_params, _network_ver, _connections = load_boot_file()
+    set_blockchain_params(genesis_block, genesis_params)
+
+    async def replay(background):
+        await check_account_db()
+        obj.chain_builder = ChainBuilder(cache_limit=cache_limit, batch_size=batch_size)
+        chain_builder = obj.chain_builder
+        if not background:
+            async def wait_inline():
+                if chain_builder.flush_task is not None:
+                    await chain_builder.flush_task
+            chain_builder.wait_for_flush = wait_inline
+        await chain_builder.init(genesis_block)
+        latency_list = list()
+        with gzip.open(boot_path, mode='rb') as fp:
+            for block, work_hash, _bias in msgpack.stream_unpacker(fp):
+                block.work_hash = work_hash
+                block._bias = _bias
+                for tx in block.txs:
+                    tx.height = block.height
+                s = time()
+                if not await new_insert_block(block=block, f_time=False, f_sign=True):
+                    raise Exception('failed to accept {}'.format(block))
+                latency_list.append(time() - s)
+                if n_blocks <= len(latency_list):
+                    break
+        await chain_builder.close()
+        return latency_list
+
+    for label, background in (('before', False), ('after', True)):
+        with TemporaryDirectory() as tmp_dir:
+            V.DB_HOME_DIR = tmp_dir
+            V.DB_ACCOUNT_PATH = os.path.join(tmp_dir, 'wallet.dat')
+            setup_database_obj()
+            latency_list = asyncio.get_event_loop().run_until_complete(replay(background))
+        _latency_report("block_accept {} {}".format(cache_limit, label), latency_list)
+
+
+BENCHMARKS = {
+    'leveldb_options': bench_leveldb_options,
+    'fork_tree': bench_fork_tree,
+    'block_validation': bench_block_validation,
+    'tx_admission': bench_tx_admission,
+    'block_accept': bench_block_accept,
+}
+
+
+def main():
+    from argparse import ArgumentParser
+    p = ArgumentParser(description='bc4py benchmarks')
+    p.add_argument('name', choices=list(BENCHMARKS))
+    args = p.parse_args()
+    BENCHMARKS[args.name]()
+
+
+__all__ = [
+    "bench_leveldb_options",
+    "bench_fork_tree",
+    "bench_block_validation",
+    "bench_tx_admission",
+    "bench_block_accept",
+    "BENCHMARKS",
+]
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,8 @@ from bc4py.user import Balance
 from bc4py.database import obj
 from bc4py.database.create import create_db
 from bc4py.database.account import *
-from bc4py.database.tools import get_unspents_iter, get_my_unspents_iter
+from bc4py.database.tools import get_unspents_iter, get_my_unspents_iter, get_outputs_from_inputs
+from bc4py.database.view import acquire_view
 from bc4py.user.api.utils import error_response
 from pydantic import BaseModel
 from bc4py_extension import PyAddress
@@ -83,31 +84,32 @@ async def list_unspents(address: str, page: int = 0, limit: int = 25):
     * About
         * display from Database -> Memory -> Unconfirmed
     """
-    if not obj.tables.table_config['addrindex']:
-        return error_response('Cannot use this API, please set `addrindex` true if you want full indexed')
+    if not (obj.tables.table_config['addrindex'] or obj.tables.table_config['addrbalance']):
+        return error_response('Cannot use this API, please set `addrindex` or `addrbalance` true')
     try:
-        best_height = obj.chain_builder.best_block.height
         start = page * limit
         finish = (page+1) * limit - 1
         f_next_page = False
         target_address = set(map(lambda x: PyAddress.from_string(x), address.split(',')))
-        unspents_iter = get_unspents_iter(target_address=target_address)
         data = list()
-        async for index, (address, height, txhash, txindex, coin_id, amount) in aioenumerate(unspents_iter):
-            if finish < index:
-                f_next_page = True
-                break
-            if index < start:
-                continue
-            data.append({
-                'address': address.string,
-                'height': height,
-                'confirmed': None if height is None else best_height - height,
-                'txhash': txhash.hex(),
-                'txindex': txindex,
-                'coin_id': coin_id,
-                'amount': amount
-            })
+        with acquire_view() as view:
+            best_height = view.best_block.height
+            unspents_iter = get_unspents_iter(target_address=target_address, view=view)
+            async for index, (address, height, txhash, txindex, coin_id, amount) in aioenumerate(unspents_iter):
+                if finish < index:
+                    f_next_page = True
+                    break
+                if index < start:
+                    continue
+                data.append({
+                    'address': address.string,
+                    'height': height,
+                    'confirmed': None if height is None else best_height - height,
+                    'txhash': txhash.hex(),
+                    'txindex': txindex,
+                    'coin_id': coin_id,
+                    'amount': amount
+                })
         return {
             'data': data,
             'next': f_next_page,
@@ -116,6 +118,55 @@ async def list_unspents(address: str, page: int = 0, limit: int = 25):
         return error_response()
 
 
+async def address_balance(address: str):
+    """
+    This end-point show confirmed balance of addresses.
+    * Arguments
+        1. **address** : some addresses joined with comma
+    * About
+        * require `addrbalance` index
+        * `unspents` is number of unspent outputs
+        * unconfirmed txs are not included
+    """
+    if not obj.tables.table_config['addrbalance']:
+        return error_response('Cannot use this API, please set `addrbalance` true')
+    try:
+        target_address = set(map(lambda x: PyAddress.from_string(x), address.split(',')))
+        balances = {address: Balance() for address in target_address}
+        counts = dict.fromkeys(target_address, 0)
+        # database and memory of one generation, batch on the way of commit is counted once
+        with acquire_view() as view:
+            # database
+            for address in target_address:
+                for coin_id, (amount, utxo_count) in view.read_address_balance(address).items():
+                    balances[address][coin_id] += amount
+                    counts[address] += utxo_count
+            # memory
+            inputs = list()
+            for block in view.best_chain:
+                for tx in block.txs:
+                    inputs.extend(tx.inputs)
+                    for address, coin_id, amount in tx.outputs:
+                        if address in target_address:
+                            balances[address][coin_id] += amount
+                            counts[address] += 1
+            for pair in get_outputs_from_inputs(inputs, view=view):
+                if pair is None:
+                    continue
+                address, coin_id, amount = pair
+                if address in target_address:
+                    balances[address][coin_id] -= amount
+                    counts[address] -= 1
+        return {
+            address.string: {
+                'balance': dict(balances[address]),
+                'unspents': counts[address],
+            } for address in target_address
+        }
+    except Exception:
+        return error_response()
+
+
 async def list_private_unspents():
     """
     This end-point show all unspents of account have.
@@ -123,20 +174,21 @@ async def list_private_unspents():
         * just looks same with /public/listunspents
     """
     data = list()
-    best_height = obj.chain_builder.best_block.height
     async with create_db(V.DB_ACCOUNT_PATH) as db:
         cur = await db.cursor()
-        unspent_iter = await get_my_unspents_iter(cur)
-        async for address, height, txhash, txindex, coin_id, amount in unspent_iter:
-            data.append({
-                'address': address.string,
-                'height': height,
-                'confirmed': None if height is None else best_height - height,
-                'txhash': txhash.hex(),
-                'txindex': txindex,
-                'coin_id': coin_id,
-                'amount': amount
-            })
+        with acquire_view() as view:
+            best_height = view.best_block.height
+            unspent_iter = await get_my_unspents_iter(cur, view=view)
+            async for address, height, txhash, txindex, coin_id, amount in unspent_iter:
+                data.append({
+                    'address': address.string,
+                    'height': height,
+                    'confirmed': None if height is None else best_height - height,
+                    'txhash': txhash.hex(),
+                    'txindex': txindex,
+                    'coin_id': coin_id,
+                    'amount': amount
+                })
     return data
 
 
@@ -221,6 +273,7 @@ __all__ = [
     "list_balance",
     "list_transactions",
     "list_unspents",
+    "address_balance",
     "list_private_unspents",
     "list_account_address",
     "move_one",
@@ -1,9 +1,31 @@
 from bc4py.database import obj
+from bc4py.database.view import acquire_view
 from bc4py.database.mintcoin import get_mintcoin_object
+from bc4py.database.tools import get_spending_info
 from bc4py.user.api.utils import error_response
+from pydantic import BaseModel
+from typing import List, Tuple
 from binascii import a2b_hex
 
 
+class SpendingInputs(BaseModel):
+    inputs: List[Tuple[(str, int)]]
+
+
+def _spending_info_format(txhash, txindex, info):
+    data = {
+        'txhash': txhash.hex(),
+        'txindex': txindex,
+        'spent': info is not None,
+    }
+    if info is not None:
+        spent_txhash, input_index, height = info
+        data['spent_txhash'] = spent_txhash.hex()
+        data['input_index'] = input_index
+        data['height'] = height
+    return data
+
+
 async def get_block_by_height(height: int, txinfo: bool = False):
     """
     show block info from height
@@ -11,13 +33,14 @@ async def get_block_by_height(height: int, txinfo: bool = False):
         1. **height** :  block height
         2. **txinfo** :  show tx info if true, only txhash if false
     """
-    blockhash = obj.chain_builder.get_block_hash(height)
-    if blockhash is None:
-        return error_response("Not found height")
-    block = obj.chain_builder.get_block(blockhash)
-    data = block.getinfo(txinfo)
-    data['hex'] = block.b.hex()
-    return data
+    with acquire_view() as view:
+        blocks = await view.get_block_range(height, height + 1)
+        if len(blocks) == 0:
+            return error_response("Not found height")
+        block = blocks[0]
+        data = block.getinfo(txinfo)
+        data['hex'] = block.b.hex()
+        return data
 
 
 async def get_block_by_hash(hash: str, txinfo: bool = False):
@@ -29,12 +52,13 @@ async def get_block_by_hash(hash: str, txinfo: bool = False):
     """
     try:
         blockhash = a2b_hex(hash)
-        block = obj.chain_builder.get_block(blockhash)
-        if block is None:
-            return error_response("Not found block")
-        data = block.getinfo(txinfo)
-        data['hex'] = block.b.hex()
-        return data
+        with acquire_view() as view:
+            block = await view.get_block_by_hash(blockhash)
+            if block is None:
+                return error_response("Not found block")
+            data = block.getinfo(txinfo)
+            data['hex'] = block.b.hex()
+            return data
     except Exception:
         return error_response()
 
@@ -48,7 +72,8 @@ async def get_tx_by_hash(hash: str):
     try:
         txhash = a2b_hex(hash)
         # if you cannot get TX, please check DB config `txindex`
-        tx = obj.tx_builder.get_tx(txhash)
+        with acquire_view() as view:
+            tx = obj.tx_builder.get_tx(txhash, view=view)
         if tx is None:
             if obj.tables.table_config['txindex']:
                 return error_response("not found the tx in this chain")
@@ -61,6 +86,43 @@ async def get_tx_by_hash(hash: str):
         return error_response()
 
 
+async def get_spending_info_one(hash: str, index: int):
+    """
+    show tx spending the output
+    * Arguments
+        1. **hash** : txhash of output
+        2. **index** : output index
+    * About
+        * `height` is null if spent by unconfirmed tx
+        * outputs spent on database is found only with `spentindex`
+    """
+    try:
+        txhash = a2b_hex(hash)
+        with acquire_view() as view:
+            info, = get_spending_info([(txhash, index)], view=view)
+        return _spending_info_format(txhash, index, info)
+    except Exception:
+        return error_response()
+
+
+async def get_spending_info_many(data: SpendingInputs):
+    """
+    show txs spending the outputs
+    * Arguments
+        1. **inputs** : list of [txhash, index]
+    * About
+        * same with `/public/getspendinginfo` by one request
+    """
+    try:
+        inputs = [(a2b_hex(txhash), txindex) for txhash, txindex in data.inputs]
+        with acquire_view() as view:
+            spending_info = get_spending_info(inputs, view=view)
+        return [_spending_info_format(txhash, txindex, info)
+                for (txhash, txindex), info in zip(inputs, spending_info)]
+    except Exception:
+        return error_response()
+
+
 async def get_mintcoin_info(mint_id: int = 0):
     """
     show mint coin info by coinId
@@ -87,14 +149,15 @@ async def get_mintcoin_history(mint_id: int = 0):
     try:
         data = list()
         # from only database
-        for height, index, txhash, params, setting in obj.tables.read_coins_iter(coin_id=mint_id):
-            data.append({
-                'height': height,
-                'index': index,
-                'txhash': txhash.hex(),
-                'params': params,
-                'setting': setting,
-            })
+        with acquire_view() as view:
+            for height, index, txhash, params, setting in view.read_coins_iter(coin_id=mint_id):
+                data.append({
+                    'height': height,
+                    'index': index,
+                    'txhash': txhash.hex(),
+                    'params': params,
+                    'setting': setting,
+                })
         return data
     except Exception:
         return error_response()
@@ -104,6 +167,8 @@ __all__ = [
     "get_block_by_height",
     "get_block_by_hash",
     "get_tx_by_hash",
+    "get_spending_info_one",
+    "get_spending_info_many",
     "get_mintcoin_info",
     "get_mintcoin_history",
 ]
@@ -1,7 +1,7 @@
 from bc4py import __chain_version__
 from bc4py.config import V
 from bc4py.chain import msgpack
-from bc4py.database import obj
+from bc4py.database import obj, aio
 from bc4py.user.api.utils import error_response
 from logging import getLogger
 from time import time
@@ -26,6 +26,8 @@ async def create_bootstrap():
             os.remove(boot_path)
         if obj.chain_builder.root_block is None:
             Exception('root block is None?')
+        if obj.tables.pruned_height:
+            raise Exception('cannot create bootstrap, block bodies are pruned')
 
         s = time()
         block = None
@@ -33,10 +35,7 @@ async def create_bootstrap():
         stop_height = obj.chain_builder.root_block.height
         log.info("start create bootstrap.dat.gz data to {}".format(stop_height))
         with gzip.open(boot_path, mode='wb') as fp:
-            for height, blockhash in obj.tables.read_block_hash_iter(start_height=1):
-                if stop_height <= height:
-                    break
-                block = obj.chain_builder.get_block(blockhash=blockhash)
+            async for height, block in aio.read_block_iter(1, stop_height):
                 if block is None:
                     break
                 await loop.run_in_executor(
@@ -58,6 +57,29 @@ async def create_bootstrap():
         return error_response()
 
 
+async def create_snapshot():
+    """
+    This end-point create UTXO snapshot file.
+    * About
+        * snapshot of database (root block), a new node import it by `--snapshot` option.
+        * share `commitment` by other way and check by `--snapshot-hash` option.
+    """
+    try:
+        snapshot_path = os.path.join(V.DB_HOME_DIR, 'snapshot-ver{}.dat'.format(__chain_version__))
+        s = time()
+        height, commitment = await obj.chain_builder.dump_snapshot(snapshot_path)
+        return {
+            "height": height,
+            "commitment": commitment.hex(),
+            "total_size": os.path.getsize(snapshot_path) / 1000000,
+            "start_time": int(s),
+            "finish_time": int(time()),
+        }
+    except Exception:
+        return error_response()
+
+
 __all__ = [
     "create_bootstrap",
+    "create_snapshot",
 ]
@@ -2,7 +2,11 @@ from bc4py import __version__, __chain_version__, __message__
 from bc4py.config import C, V, P
 from bc4py.chain.utils import GompertzCurve, DEFAULT_TARGET
 from bc4py.chain.difficulty import get_bits_by_hash, get_bias_by_hash
+from bc4py.chain.checking import tx_admission
+from bc4py.chain.signature import signature_cache
 from bc4py.database import obj
+from bc4py.database.aio import io_stats
+from bc4py.for_debug import loop_lag, block_accept_latency
 from bc4py.user.api.utils import error_response, local_address
 from bc4py.user.generate import generating_threads
 from time import time
@@ -52,7 +56,8 @@ async def chain_info():
         if F_ADD_CACHE_INFO:
             data['cache'] = {
                 'get_bits_by_hash': str(get_bits_by_hash.cache_info()),
-                'get_bias_by_hash': str(get_bias_by_hash.cache_info())
+                'get_bias_by_hash': str(get_bias_by_hash.cache_info()),
+                'utxo_cache': obj.tables.utxo_cache.getinfo(),
             }
         return data
     except Exception:
@@ -66,7 +71,8 @@ async def chain_fork_info():
     try:
         best_chain = obj.chain_builder.best_chain
         main_chain = [block.getinfo() for block in best_chain]
-        orphan_chain = [block.getinfo() for block in obj.chain_builder.chain.values() if block not in best_chain]
+        orphan_chain = [block.getinfo() for block in obj.chain_builder.chain.values()
+                        if not obj.chain_builder.is_best_block(block)]
         return {
             'main': main_chain,
             'orphan': sorted(orphan_chain, key=lambda x: x['height']),
@@ -109,6 +115,11 @@ async def system_private_info():
             'local_address': list(local_address),
             'prefetch_address': len(obj.account_builder.pre_fetch_addr),
             'extended_key': repr(V.EXTENDED_KEY_OBJ),
+            'loop_lag': loop_lag.getinfo(),
+            'block_accept_latency': block_accept_latency.getinfo(),
+            'db_io': io_stats.getinfo(),
+            'signature_cache': signature_cache.getinfo(),
+            'tx_admission': tx_admission.getinfo(),
         }
     except Exception:
         return error_response()
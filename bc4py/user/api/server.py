@@ -50,6 +50,7 @@ async def setup_rest_server(port=3000, host='127.0.0.1', extra_locals=None, **kw
     app.add_api_route('/private/listbalance', list_balance, **api_kwargs)
     app.add_api_route('/private/listtransactions', list_transactions, **api_kwargs)
     app.add_api_route('/public/listunspents', list_unspents, **api_kwargs)
+    app.add_api_route('/public/getaddressbalance', address_balance, **api_kwargs)
     app.add_api_route('/private/listunspents', list_private_unspents, **api_kwargs)
     app.add_api_route('/private/listaccountaddress', list_account_address, **api_kwargs)
     app.add_api_route('/private/move', move_one, methods=['POST'], **api_kwargs)
@@ -73,11 +74,14 @@ async def setup_rest_server(port=3000, host='127.0.0.1', extra_locals=None, **kw
     app.add_api_route('/public/getblockbyheight', get_block_by_height, **api_kwargs)
     app.add_api_route('/public/getblockbyhash', get_block_by_hash, **api_kwargs)
     app.add_api_route('/public/gettxbyhash', get_tx_by_hash, **api_kwargs)
+    app.add_api_route('/public/getspendinginfo', get_spending_info_one, **api_kwargs)
+    app.add_api_route('/public/getspendinginfomany', get_spending_info_many, methods=['POST'], **api_kwargs)
     app.add_api_route('/public/getmintinfo', get_mintcoin_info, **api_kwargs)
     app.add_api_route('/public/getminthistory', get_mintcoin_history, **api_kwargs)
     # Others
     api_kwargs = dict(tags=['Others'], response_class=IndentResponse)
     app.add_api_route('/private/createbootstrap', create_bootstrap, **api_kwargs)
+    app.add_api_route('/private/createsnapshot', create_snapshot, **api_kwargs)
     app.add_api_websocket_route('/public/ws', websocket_route)
     app.add_api_route('/public/ws', websocket_route, **api_kwargs)
     app.add_api_websocket_route('/private/ws', private_websocket_route)
@@ -183,7 +183,7 @@ class Generate(object):
             staking_block.txs.append(None)  # Dummy proof tx
 
             deadline = int(time() - V.BLOCK_GENESIS_TIME - C.ACCEPT_MARGIN_TIME)
-            obj.tx_builder.memory_pool.clear_by_deadline(deadline)
+            obj.tx_builder.clear_unconfirmed_by_deadline(deadline)
             staking_block.txs.extend(obj.tx_builder.memory_pool.list_size_limit(C.SIZE_BLOCK_LIMIT - 80))
 
             calculate_nam = 0
@@ -283,7 +283,7 @@ class Generate(object):
 
                 # Staked by capacity yay!!
                 deadline = int(time() - V.BLOCK_GENESIS_TIME - C.ACCEPT_MARGIN_TIME)
-                obj.tx_builder.memory_pool.clear_by_deadline(deadline)
+                obj.tx_builder.clear_unconfirmed_by_deadline(deadline)
                 unconfirmed: List[TX] = obj.tx_builder.memory_pool.list_size_limit(C.SIZE_BLOCK_LIMIT - 80)
 
                 total_fee = sum(tx.gas_price * tx.gas_amount for tx in unconfirmed)
@@ -345,7 +345,7 @@ async def create_mining_block(consensus):
     # create proof_tx
     reward = GompertzCurve.calc_block_reward(previous_block.height + 1)
     deadline = int(time() - V.BLOCK_GENESIS_TIME - C.ACCEPT_MARGIN_TIME)
-    obj.tx_builder.memory_pool.clear_by_deadline(deadline)
+    obj.tx_builder.clear_unconfirmed_by_deadline(deadline)
     unconfirmed: List[TX] = obj.tx_builder.memory_pool.list_size_limit(C.SIZE_BLOCK_LIMIT - 80)
     fees = sum(tx.gas_amount * tx.gas_price for tx in unconfirmed)
     proof_tx = TX.from_dict(
@@ -2,7 +2,7 @@ from bc4py.user.network.broadcast import BroadcastCmd, broadcast_check
 from bc4py.user.network.sendnew import mined_newblock
 from bc4py.user.network.directcmd import DirectCmd
 from bc4py.user.network.update import update_info_for_generate
-from bc4py.user.network.fastsync import sync_chain_loop
+from bc4py.user.network.fastsync import sync_chain_loop, snapshot_history_check
 
 __all__ = [
     "BroadcastCmd",
@@ -11,4 +11,5 @@ __all__ = [
     "DirectCmd",
     "update_info_for_generate",
     "sync_chain_loop",
+    "snapshot_history_check",
 ]
@@ -1,7 +1,7 @@
 from bc4py.config import C, V, P, BlockChainError
 from bc4py.chain.block import Block
 from bc4py.chain.tx import TX
-from bc4py.chain.checking import new_insert_block, check_tx, check_tx_time
+from bc4py.chain.checking import new_insert_block, new_insert_tx, check_tx
 from bc4py.chain.signature import fill_verified_addr_tx
 from bc4py.chain.workhash import update_work_hash
 from bc4py.database import obj
@@ -55,12 +55,8 @@ class BroadcastCmd:
             if obj.tx_builder.get_memorized_tx(new_tx.hash) is not None:
                 log.debug("high latency node? already memorized new tx")
                 return False
-            check_tx_time(new_tx)
-            await fill_verified_addr_tx(new_tx)
-            check_tx(tx=new_tx, include_block=None)
-            async with create_db(V.DB_ACCOUNT_PATH) as db:
-                cur = await db.cursor()
-                await obj.tx_builder.put_unconfirmed(cur=cur, tx=new_tx)
+            # checked with other txs of the moment
+            await new_insert_tx(new_tx)
             log.info("Accept new tx {}".format(new_tx))
             update_info_for_generate(u_block=False, u_unspent=False)
             return True
@@ -1,5 +1,6 @@
 from bc4py.config import P, BlockChainError
 from bc4py.database import obj
+from bc4py.database.view import acquire_view
 
 
 """
@@ -19,42 +20,48 @@ class DirectCmd(object):
                 return {
                     'hash': obj.chain_builder.best_block.hash,
                     'height': obj.chain_builder.best_block.height,
+                    'pruned_height': obj.tables.pruned_height,
                     'booting': P.F_NOW_BOOTING,
                 }
             else:
                 return {
                     'hash': None,
                     'height': None,
+                    'pruned_height': None,
                     'booting': True,
                 }
         except BlockChainError as e:
             return str(e)
 
     @staticmethod
-    def block_by_height(user, data):
+    async def block_by_height(user, data):
         height = data.get('height')
         if height is None:
             return 'do not find key "height"'
         if not isinstance(height, int):
             return f"height is not int! {height}"
+        if obj.tables.is_pruned(height):
+            return f"block height {height} is pruned, pruned_height={obj.tables.pruned_height}"
         try:
-            block = obj.chain_builder.get_block(height=height)
-            if block:
-                return block
+            with acquire_view() as view:
+                blocks = await view.get_block_range(height, height + 1)
+            if blocks:
+                return blocks[0]
             else:
                 return f"Not found block height {height}"
         except BlockChainError as e:
             return str(e)
 
     @staticmethod
-    def block_by_hash(user, data):
+    async def block_by_hash(user, data):
         blockhash = data.get('blockhash')
         if blockhash is None:
             return 'do not find key "blockhash"'
         if not isinstance(blockhash, bytes):
             return f"blockhash is not bytes! {blockhash}"
         try:
-            block = obj.chain_builder.get_block(blockhash=blockhash)
+            with acquire_view() as view:
+                block = await view.get_block_by_hash(blockhash)
             if block is None:
                 return f"Not found blockhash {blockhash.hex()}"
             return block
@@ -69,7 +76,8 @@ class DirectCmd(object):
         elif not isinstance(txhash, bytes):
             return f"txhash is not bytes! {txhash}"
         try:
-            tx = obj.tx_builder.get_memorized_tx(txhash)
+            with acquire_view() as view:
+                tx = obj.tx_builder.get_memorized_tx(txhash, view=view)
             if tx is None:
                 return f"Not found tx {txhash.hex()}"
             return tx
@@ -87,7 +95,7 @@ class DirectCmd(object):
             return str(e)
 
     @staticmethod
-    def big_blocks(user, data):
+    async def big_blocks(user, data):
         try:
             index_height = data.get('height')
             if index_height is None:
@@ -96,13 +104,10 @@ class DirectCmd(object):
             request_len = max(0, min(100, request_len))
             if not isinstance(request_len, int):
                 return f"request_len is int! {request_len}"
-            data = list()
-            for height in range(index_height, index_height + max(0, request_len)):
-                block = obj.chain_builder.get_block(height=height)
-                if block is None:
-                    break
-                data.append(block)
-            return data
+            if obj.tables.is_pruned(index_height):
+                return f"block height {index_height} is pruned, pruned_height={obj.tables.pruned_height}"
+            with acquire_view() as view:
+                return await view.get_block_range(index_height, index_height + request_len)
         except BlockChainError as e:
             return str(e)
 
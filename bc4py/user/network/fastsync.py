@@ -9,6 +9,7 @@ from bc4py.user.network.update import update_info_for_generate
 from bc4py.user.network.directcmd import DirectCmd
 from bc4py.database import obj
 from bc4py.database.create import create_db
+from bc4py.database.snapshot import HistoryReplay, STATE_SNAPSHOT_HEIGHT, STATE_SNAPSHOT_VERIFIED
 from logging import getLogger
 from time import time
 from typing import List
@@ -22,6 +23,8 @@ stack_lock = asyncio.Lock()
 stack_dict = dict()
 stack_event = asyncio.Event()
 STACK_CHUNK_SIZE = 100
+HISTORY_RETRY_SPAN = 5.0  # Sec, wait for peers when history replay makes no progress
+HISTORY_MAX_RETRY = 20  # give up history replay after retries without progress
 PROOF_OF_WORK_FLAGS = {
     C.BLOCK_YES_POW, C.BLOCK_X11_POW, C.BLOCK_X16S_POW
 }
@@ -208,6 +211,57 @@ async def sync_chain_loop():
     asyncio.ensure_future(back_sync_loop())
 
 
+async def snapshot_history_check():
+    """replay blocks before snapshot from network and check the UTXO set on background"""
+    if obj.tables.read_state(STATE_SNAPSHOT_HEIGHT) is None:
+        return
+    if obj.tables.read_state(STATE_SNAPSHOT_VERIFIED) is not None:
+        log.debug("snapshot is already verified")
+        return
+    replay = HistoryReplay()
+    log.info("start snapshot history check {}->{}".format(replay.next_height, replay.snapshot_height))
+    s = time()
+    retry = 0
+    try:
+        while not P.F_STOP and not replay.is_finished():
+            before_height = replay.next_height
+            if replay.next_height == 0:
+                block_list = [obj.chain_builder.get_block(height=0)]
+            else:
+                try:
+                    block_list = await ask_random_node(
+                        cmd=DirectCmd.big_blocks, data={'height': replay.next_height})
+                except BlockChainError as e:
+                    log.debug("snapshot history check, no reply '{}'".format(e))
+                    block_list = list()
+            for block in block_list:
+                if replay.is_finished():
+                    break
+                replay.apply_block(block)
+            if replay.next_height == before_height:
+                # empty reply or peers do not have the height yet
+                retry += 1
+                if HISTORY_MAX_RETRY < retry:
+                    log.error("stop snapshot history check, no progress at height {} after {} retries".format(
+                        replay.next_height, HISTORY_MAX_RETRY))
+                    break
+                await asyncio.sleep(HISTORY_RETRY_SPAN * retry)
+                continue
+            retry = 0
+            if replay.next_height % 10000 < len(block_list):
+                log.info("snapshot history check height={} {}Sec".format(replay.next_height, round(time() - s)))
+            await asyncio.sleep(0.0)
+    except Exception:
+        log.error("snapshot history check failed", exc_info=True)
+        replay.close()
+        return
+    if replay.is_finished():
+        replay.finish()
+    else:
+        replay.close()
+
+
 __all__ = [
     "sync_chain_loop",
+    "snapshot_history_check",
 ]
@@ -147,6 +147,47 @@ def console_args_parser():
     p.add_argument('--addrindex',
                    help='index addr for `/public/listunspents`',
                    action='store_true')
+    p.add_argument('--addrbalance',
+                   help='index addr balance and unspents for `/public/getaddressbalance`',
+                   action='store_true')
+    p.add_argument('--spentindex',
+                   help='index spending tx of outputs for `/public/getspendinginfo`',
+                   action='store_true')
+    p.add_argument('--prune',
+                   help='keep only the last N block bodies (min 288), 0 is disable',
+                   default=0,
+                   type=int)
+    p.add_argument('--snapshot',
+                   help='import UTXO snapshot file to empty database (path)',
+                   default=None,
+                   type=str)
+    p.add_argument('--snapshot-hash',
+                   help='expected commitment of the snapshot (hex)',
+                   default=None,
+                   type=str)
+    p.add_argument('--snapshot-check',
+                   help='replay blocks before snapshot on background and check UTXO set',
+                   action='store_true')
+    p.add_argument('--single-db',
+                   help='put all tables on one LevelDB and commit atomically (migrate if old)',
+                   action='store_true')
+    p.add_argument('--blockfile',
+                   help='append blocks to flat files and read by mmap',
+                   action='store_true')
+    p.add_argument('--db-option',
+                   help='LevelDB option of table ex"unused_index:bloom_filter_bits=16", '
+                        'lru_cache_size/bloom_filter_bits/write_buffer_size/max_open_files/compression',
+                   default=[],
+                   action='append')
+    p.add_argument('--verify-level',
+                   help='verify stored chain on boot by worker processes, header linkage/proof of work/tx body',
+                   choices=('header', 'pow', 'full'),
+                   default=None,
+                   type=str)
+    p.add_argument('--utxo-cache',
+                   help='memory budget of UTXO cache (MB)',
+                   default=64,
+                   type=int)
     return p.parse_args()
 
 
@@ -12,10 +12,12 @@ from bc4py.user.api import setup_rest_server
 from bc4py.database import obj
 from bc4py.database.create import check_account_db
 from bc4py.database.builder import setup_database_obj
+from bc4py.database.storage import parse_db_options
+from bc4py.database.snapshot import load_snapshot, is_importing
 from bc4py.chain.msgpack import default_hook, object_hook
 from p2p_python.utils import setup_p2p_params, setup_server_hostname
 from p2p_python.server import Peer2Peer
-from bc4py.for_debug import set_logger
+from bc4py.for_debug import set_logger, slow_event_loop_detector
 import asyncio
 import logging
 import os
@@ -24,7 +26,7 @@ import os
 loop = asyncio.get_event_loop()
 
 
-async def setup_chain(connections):
+async def setup_chain(connections, snapshot=None, snapshot_hash=None, snapshot_check=False, verify_level=None):
     p2p = V.P2P_OBJ
 
     for host, port in connections:
@@ -37,11 +39,17 @@ async def setup_chain(connections):
     # BroadcastProcess setup
     p2p.broadcast_check = broadcast_check
 
+    # import UTXO snapshot (option)
+    if snapshot and (len(obj.tables.headers) == 0 or is_importing()):
+        load_snapshot(snapshot, V.GENESIS_BLOCK.hash, bytes.fromhex(snapshot_hash) if snapshot_hash else None)
+
     # Update to newest blockchain
-    if await obj.chain_builder.init(V.GENESIS_BLOCK, batch_size=500):
+    if await obj.chain_builder.init(V.GENESIS_BLOCK, batch_size=500, verify_level=verify_level):
         # only genesisBlock yoy have, try to import bootstrap.dat.gz
         await load_bootstrap_file()
     await sync_chain_loop()
+    if snapshot_check:
+        asyncio.ensure_future(snapshot_history_check())
 
     # Mining/Staking setup
     # Debug.F_CONSTANT_DIFF = True
@@ -58,7 +66,9 @@ def main():
     # environment
     set_database_path(sub_dir=p.sub_dir)
     check_already_started()
-    setup_database_obj(txindex=p.txindex, addrindex=p.addrindex)
+    setup_database_obj(txindex=p.txindex, addrindex=p.addrindex, addrbalance=p.addrbalance,
+                       spentindex=p.spentindex, prune=p.prune, single_db=p.single_db, blockfile=p.blockfile,
+                       options=parse_db_options(p.db_option), utxo_cache_size=p.utxo_cache * 1024 * 1024)
     import_keystone(passphrase='hello python')
     loop.run_until_complete(check_account_db())
     genesis_block, genesis_params, network_ver, connections = load_boot_file()
@@ -79,12 +89,15 @@ def main():
         port=p.rest, host=p.host, extra_locals=p.extra_locals))
 
     # setup blockchain
-    loop.run_until_complete(setup_chain(connections))
+    loop.run_until_complete(setup_chain(connections, p.snapshot, p.snapshot_hash, p.snapshot_check,
+                                        p.verify_level))
 
     # original logger
     set_logger(level=logging.getLevelName(p.log_level), path=p.log_path, f_remove=p.remove_log)
     logging.info(f"\n{__logo__}\n====\nsystem (str) = {__version__}\nchain (int) = {__chain_version__}\n"
                  f"block (int) = {__block_version__}\nmessage = {__message__}")
+    # event loop delay, shown by system private info
+    asyncio.ensure_future(slow_event_loop_detector())
 
     # generate (option)
     if p.staking:
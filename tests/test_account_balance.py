@@ -0,0 +1,100 @@
+from bc4py.config import C
+from bc4py.user import Accounting
+from bc4py.database import obj
+from bc4py.database.account import insert_movelog
+from bc4py.database.builder import AccountBuilder
+from aiosqlite import connect
+from tempfile import TemporaryDirectory
+import asyncio
+import os
+
+
+class DummyTables(object):
+    """txs on database"""
+
+    def __init__(self, txhashs):
+        self.txhashs = set(txhashs)
+
+    def have_tx(self, txhash):
+        return txhash in self.txhashs
+
+
+class DummyTX(object):
+
+    def __init__(self, txhash):
+        self.hash = txhash
+
+
+class DummyBlock(object):
+
+    def __init__(self, height, txhashs):
+        self.height = height
+        self.txs = [DummyTX(txhash) for txhash in txhashs]
+
+
+def movement(user, coin_id, amount):
+    m = Accounting()
+    m[user][coin_id] += amount
+    return m
+
+
+def to_dict(balance: Accounting):
+    balance = balance.copy()
+    balance.cleanup()
+    return {user: dict(coins) for user, coins in balance.items()}
+
+
+async def create_log_table(cur):
+    await cur.execute("""
+    CREATE TABLE `log` (
+    `id` INTEGER PRIMARY KEY,
+    `hash` BINARY,
+    `index` INTEGER,
+    `type` INTEGER NOT NULL,
+    `user` INTEGER NOT NULL,
+    `coin_id` INTEGER NOT NULL,
+    `amount` INTEGER NOT NULL,
+    `time` INTEGER NOT NULL
+    )""")
+    await cur.execute("CREATE INDEX 'hash_idx' ON `log` (`hash`,`index`)")
+
+
+async def boot_twice():
+    txhash1, txhash2, txhash_memory = os.urandom(32), os.urandom(32), os.urandom(32)
+    blocks = [DummyBlock(1, [txhash1]), DummyBlock(2, [txhash2])]
+    obj.tables = DummyTables([txhash1, txhash2])
+    with TemporaryDirectory() as tmp_dir:
+        db = await connect(os.path.join(tmp_dir, 'account.db'))
+        try:
+            cur = await db.cursor()
+            await create_log_table(cur)
+            await insert_movelog(movement(1, 0, 100), cur, C.TX_TRANSFER, 1, txhash1)
+            await insert_movelog(movement(1, 0, -30), cur, C.TX_TRANSFER, 2, txhash2)
+            await insert_movelog(movement(2, 0, 40), cur, C.TX_INNER, 4)
+            # tx of memory block is not on database yet
+            await insert_movelog(movement(1, 0, 1000), cur, C.TX_TRANSFER, 3, txhash_memory)
+            await db.commit()
+
+            # first boot, no checkpoint
+            first = AccountBuilder()
+            await first.init_balance(cur)
+            # second boot, checkpoint written by first boot
+            second = AccountBuilder()
+            await second.init_balance(cur, checkpoint=first.chain_balance)
+            # crash after height 1 checkpoint, height 2 is applied again
+            third = AccountBuilder()
+            await third.init_balance(cur, checkpoint=movement(1, 0, 100))
+            await third.new_batch_apply(cur, blocks[1:])
+            return first, second, third
+        finally:
+            await db.close()
+
+
+def test_same_balance_by_boot():
+    """balance is same with and without account checkpoint"""
+    first, second, third = asyncio.get_event_loop().run_until_complete(boot_twice())
+    expected = {1: {0: 70}, 2: {0: 40}}
+    assert to_dict(first.db_balance) == expected
+    assert to_dict(second.db_balance) == expected
+    assert to_dict(third.db_balance) == expected
+    assert to_dict(first.chain_balance) == to_dict(second.chain_balance) == to_dict(third.chain_balance)
@@ -0,0 +1,91 @@
+from bc4py.database.blockfile import BlockFiles, struct_locator
+from tempfile import TemporaryDirectory
+import os
+
+
+def test_read_after_append():
+    """appended blocks are readable after commit, also after rotation"""
+    with TemporaryDirectory() as tmp_dir:
+        block_files = BlockFiles(tmp_dir, max_file_size=100)
+        blocks = [os.urandom(40) for _ in range(10)]
+        locators = list()
+        for b in blocks:
+            block_files.begin()
+            locators.append(block_files.append(b))
+            block_files.commit()
+            # map is replaced when file grows
+            assert bytes(block_files.read(locators[-1])) == b
+        assert 1 < block_files.file_no
+        for b, locator in zip(blocks, locators):
+            assert bytes(block_files.read(locator)) == b
+        block_files.close()
+
+
+def test_rollback_keeps_live_views():
+    """rollback does not shrink files, views of committed blocks stay valid"""
+    with TemporaryDirectory() as tmp_dir:
+        block_files = BlockFiles(tmp_dir, max_file_size=100)
+        block_files.begin()
+        committed = os.urandom(40)
+        locator = block_files.append(committed)
+        block_files.commit()
+        view = block_files.read(locator)
+        # failed batch across rotation
+        block_files.begin()
+        for _ in range(4):
+            block_files.append(os.urandom(40))
+        block_files.fp.flush()
+        size = os.path.getsize(block_files.get_path(0))
+        block_files.rollback()
+        assert os.path.getsize(block_files.get_path(0)) == size
+        assert bytes(view) == committed
+        # next batch is appended after dead space
+        block_files.begin()
+        new_block = os.urandom(40)
+        new_locator = block_files.append(new_block)
+        block_files.commit()
+        assert bytes(block_files.read(new_locator)) == new_block
+        assert struct_locator.unpack(new_locator)[0] == block_files.file_no
+        view.release()
+        block_files.close()
+
+
+def test_replaced_maps_are_closed():
+    """old maps are closed when no view refers them"""
+    with TemporaryDirectory() as tmp_dir:
+        block_files = BlockFiles(tmp_dir)
+        views = list()
+        for i in range(20):
+            block_files.begin()
+            locator = block_files.append(os.urandom(100))
+            block_files.commit()
+            view = block_files.read(locator)
+            if i < 2:
+                views.append(view)
+            else:
+                view.release()
+        # maps referred by kept views remain
+        assert len(block_files.retired) <= 2
+        for view in views:
+            view.release()
+        block_files.close()
+        assert len(block_files.retired) == 0
+
+
+def test_read_from_threads():
+    """reads on I/O threads while event loop appends and commits"""
+    from concurrent.futures import ThreadPoolExecutor
+    with TemporaryDirectory() as tmp_dir:
+        block_files = BlockFiles(tmp_dir, max_file_size=4096)
+        committed = list()
+        with ThreadPoolExecutor(4) as executor:
+            for _ in range(200):
+                block_files.begin()
+                b = os.urandom(100)
+                locator = block_files.append(b)
+                block_files.commit()
+                committed.append((b, locator))
+                futures = [executor.submit(lambda x: bytes(block_files.read(x[1])) == x[0], item)
+                           for item in committed[-8:]]
+                assert all(future.result() for future in futures)
+        block_files.close()
@@ -0,0 +1,115 @@
+from bc4py.database.forktree import ForkTree
+import os
+
+
+class DummyBlock(object):
+
+    def __init__(self, previous_block, score=1.0):
+        self.hash = os.urandom(32)
+        self.previous_hash = previous_block.hash if previous_block else b'\x00' * 32
+        self.height = previous_block.height + 1 if previous_block else 0
+        self.score = score
+
+
+def extend(block, length, score=1.0):
+    blocks = list()
+    for _ in range(length):
+        block = DummyBlock(block, score)
+        blocks.append(block)
+    return blocks
+
+
+def test_tie_keeps_first_seen():
+    root = DummyBlock(None)
+    tree = ForkTree(root)
+    first = extend(root, 3)
+    second = extend(first[0], 2)
+    for block in first + second:
+        tree.add(block)
+    assert tree.best.block is first[-1]
+    # higher score wins
+    assert tree.add(DummyBlock(second[-1]))
+    assert tree.best_chain()[1:] == list(reversed(first[:1] + second))
+
+
+def test_unlinked_blocks_wait_for_parent():
+    root = DummyBlock(None)
+    tree = ForkTree(root)
+    blocks = extend(root, 4)
+    for block in reversed(blocks[1:]):
+        assert not tree.add(block)
+    assert len(tree) == 0 and tree.best is None
+    assert tree.add(blocks[0])
+    assert len(tree) == 4 and tree.best.block is blocks[-1]
+
+
+def test_reorg_path():
+    root = DummyBlock(None)
+    tree = ForkTree(root)
+    common = extend(root, 2)
+    old_tail = extend(common[-1], 2)
+    new_tail = extend(common[-1], 3)
+    for block in common + old_tail:
+        tree.add(block)
+    old_best = tree.best
+    for block in new_tail:
+        tree.add(block)
+    disconnect, connect = tree.reorg(old_best, tree.best)
+    assert disconnect == list(reversed(old_tail))
+    assert connect == new_tail
+    # from empty
+    disconnect, connect = tree.reorg(None, tree.best)
+    assert disconnect == [] and connect == common + new_tail
+
+
+def test_pinned_block_limits_best():
+    """best tip must descend from the block being written"""
+    root = DummyBlock(None)
+    tree = ForkTree(root)
+    common = extend(root, 2)
+    main = extend(common[-1], 2)
+    for block in common + main:
+        tree.add(block)
+    tree.pin(main[0].hash)
+    fork = extend(common[-1], 4)
+    for block in fork:
+        assert not tree.add(block)
+    assert tree.best.block is main[-1]
+    assert not tree.is_on_pinned(tree.nodes[fork[-1].hash])
+    # longer fork is taken on release
+    assert tree.unpin()
+    assert tree.best.block is fork[-1]
+    assert tree.add(DummyBlock(fork[-1]))
+    assert tree.best.block.previous_hash == fork[-1].hash
+
+
+def test_set_root_removes_other_branches():
+    root = DummyBlock(None)
+    tree = ForkTree(root)
+    main = extend(root, 4)
+    fork = extend(main[0], 2, score=0.5)
+    for block in main + fork:
+        tree.add(block)
+    # waiting block below new root is dropped
+    orphan = DummyBlock(DummyBlock(root))
+    tree.add(orphan)
+    removed = tree.set_root(main[1])
+    assert set(removed) == set(main[:2] + fork)
+    assert len(tree) == 2 and tree.best.block is main[-1]
+    assert tree.best_chain() == list(reversed(main[2:]))
+    assert tree.unlinked == {}
+    assert tree.add(DummyBlock(main[-1]))
+
+
+def test_unpin_keeps_best_on_tie():
+    root = DummyBlock(None)
+    tree = ForkTree(root)
+    main = extend(root, 3)
+    for block in main:
+        tree.add(block)
+    tree.pin(main[1].hash)
+    fork = extend(main[0], 2)
+    for block in fork:
+        assert not tree.add(block)
+    assert not tree.unpin()
+    assert tree.best.block is main[-1]
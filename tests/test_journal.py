@@ -0,0 +1,99 @@
+from bc4py.chain.block import Block
+from bc4py.database.journal import Journal, struct_frame
+from tempfile import TemporaryDirectory
+import os
+
+
+def make_block(previous_hash, height):
+    block = Block.from_dict({
+        'previous_hash': previous_hash,
+        'merkleroot': os.urandom(32),
+        'time': height,
+        'bits': 0x1f0fffff,
+        'nonce': os.urandom(4),
+        'height': height,
+    })
+    block.work_hash = os.urandom(32)
+    return block
+
+
+def make_chain(root, length):
+    blocks = list()
+    previous = root
+    for _ in range(length):
+        previous = make_block(previous.hash, previous.height + 1)
+        blocks.append(previous)
+    return blocks
+
+
+def test_recover_written_blocks():
+    root = make_block(b'\x00' * 32, 0)
+    blocks = make_chain(root, 5)
+    with TemporaryDirectory() as tmp_dir:
+        journal = Journal(tmp_dir)
+        for block in blocks:
+            journal.append(block)
+        journal.close()
+        recovered = Journal(tmp_dir).recover(root)
+        assert [block.hash for block in recovered] == [block.hash for block in blocks]
+        assert [block.work_hash for block in recovered] == [block.work_hash for block in blocks]
+        # blocks under root are not recovered
+        assert [block.hash for block in Journal(tmp_dir).recover(blocks[2])] == [b.hash for b in blocks[3:]]
+
+
+def test_torn_tail_is_cut():
+    """crash on the way of write, broken last record is cut and appended after good records"""
+    root = make_block(b'\x00' * 32, 0)
+    blocks = make_chain(root, 4)
+    with TemporaryDirectory() as tmp_dir:
+        journal = Journal(tmp_dir)
+        for block in blocks[:3]:
+            journal.append(block)
+        journal.close()
+        path = journal.get_path(journal.segment_no)
+        good_size = os.path.getsize(path)
+        for broken in (b'\x01\x02', struct_frame.pack(100, 0) + b'\x00' * 20):
+            # torn frame header, torn payload
+            with open(path, mode='ab') as fp:
+                fp.write(broken)
+            journal = Journal(tmp_dir)
+            assert [block.hash for block in journal.recover(root)] == [block.hash for block in blocks[:3]]
+            assert os.path.getsize(path) == good_size
+        journal.append(blocks[3])
+        journal.close()
+        assert [block.hash for block in Journal(tmp_dir).recover(root)] == [block.hash for block in blocks]
+
+
+def test_crc_mismatch_stops_segment():
+    root = make_block(b'\x00' * 32, 0)
+    blocks = make_chain(root, 3)
+    with TemporaryDirectory() as tmp_dir:
+        journal = Journal(tmp_dir)
+        for block in blocks:
+            journal.append(block)
+        journal.close()
+        path = journal.get_path(journal.segment_no)
+        with open(path, mode='rb') as fp:
+            data = bytearray(fp.read())
+        # flip one byte of the last payload
+        data[-1] ^= 0xff
+        with open(path, mode='wb') as fp:
+            fp.write(data)
+        recovered = Journal(tmp_dir).recover(root)
+        assert [block.hash for block in recovered] == [block.hash for block in blocks[:2]]
+
+
+def test_truncate_removes_old_segments():
+    root = make_block(b'\x00' * 32, 0)
+    blocks = make_chain(root, 6)
+    with TemporaryDirectory() as tmp_dir:
+        journal = Journal(tmp_dir)
+        for block in blocks[:3]:
+            journal.append(block)
+        journal.truncate(root_height=0)
+        for block in blocks[3:]:
+            journal.append(block)
+        journal.truncate(root_height=3)
+        assert len(journal.segments) == 1
+        journal.close()
+        assert [block.hash for block in Journal(tmp_dir).recover(blocks[2])] == [b.hash for b in blocks[3:]]
@@ -0,0 +1,119 @@
+from bc4py.database.overlay import MemoryOverlay, ForkOverlay
+import os
+
+
+class DummyTX(object):
+
+    def __init__(self, inputs, n_outputs):
+        self.hash = os.urandom(32)
+        self.inputs = inputs
+        self.outputs = [(os.urandom(21), 0, index + 1) for index in range(n_outputs)]
+
+
+class DummyBlock(object):
+
+    def __init__(self, height, txs):
+        self.height = height
+        self.txs = txs
+
+
+def state(overlay: MemoryOverlay):
+    return dict(overlay.created), dict(overlay.spent), dict(overlay.tx_height)
+
+
+def make_chain(length, base_pairs=(), start=1):
+    """blocks spending outputs of the former block"""
+    blocks = list()
+    pairs = list(base_pairs)
+    for height in range(start, start + length):
+        tx = DummyTX(pairs[:2], 3)
+        blocks.append(DummyBlock(height, [tx]))
+        pairs = [(tx.hash, index) for index in range(3)]
+    return blocks
+
+
+def test_connect_disconnect_symmetry():
+    """disconnect of connected blocks returns to the same state"""
+    database_pairs = [(os.urandom(32), 0), (os.urandom(32), 1)]
+    blocks = make_chain(5, database_pairs)
+    overlay = MemoryOverlay.from_blocks(blocks[:3])
+    before = state(overlay)
+    for block in blocks[3:]:
+        overlay.connect(block)
+    assert overlay.get_height(blocks[4].txs[0].hash) == 5
+    for block in reversed(blocks[3:]):
+        overlay.disconnect(block)
+    assert state(overlay) == before
+    # reconnect gives same state as built from blocks
+    for block in blocks[3:]:
+        overlay.connect(block)
+    assert state(overlay) == state(MemoryOverlay.from_blocks(blocks))
+
+
+def test_spent_and_created():
+    blocks = make_chain(3)
+    overlay = MemoryOverlay.from_blocks(blocks)
+    tx1, tx2 = blocks[0].txs[0], blocks[1].txs[0]
+    assert overlay.get_output(tx1.hash, 0) == tx1.outputs[0]
+    assert overlay.get_spent(tx1.hash, 0) == (tx2.hash, 0, 2)
+    assert overlay.get_spent(tx1.hash, 2) is None
+    assert overlay.get_output(os.urandom(32), 0) is None
+
+
+def test_fork_overlay_equals_rebuilt():
+    """fork overlay over best overlay is same as overlay built from the fork chain"""
+    common = make_chain(3)
+    last_pairs = [(common[-1].txs[0].hash, index) for index in range(3)]
+    best_tail = make_chain(2, last_pairs, start=4)
+    fork_tail = make_chain(3, last_pairs[1:], start=4)
+    best = MemoryOverlay.from_blocks(common + best_tail)
+    fork = ForkOverlay(best, reversed(best_tail), fork_tail)
+    expected = MemoryOverlay.from_blocks(common + fork_tail)
+    pairs = {(tx.hash, index) for block in common + best_tail + fork_tail
+             for tx in block.txs for index in range(len(tx.outputs))}
+    pairs.update(pair for block in common + best_tail + fork_tail for tx in block.txs for pair in tx.inputs)
+    for pair in pairs:
+        assert fork.get_output(*pair) == expected.get_output(*pair)
+        assert fork.get_spent(*pair) == expected.get_spent(*pair)
+    for block in common + best_tail + fork_tail:
+        txhash = block.txs[0].hash
+        assert fork.get_height(txhash) == expected.get_height(txhash)
+
+
+class BrokenBlock(object):
+    """raise on the way of first connect"""
+
+    def __init__(self, height, tx):
+        self.height = height
+        self.tx = tx
+        self.failed = False
+
+    @property
+    def txs(self):
+        if self.failed:
+            return [self.tx]
+        self.failed = True
+        return self.iter_and_raise()
+
+    def iter_and_raise(self):
+        yield self.tx
+        raise ValueError('broken block')
+
+
+def test_best_chain_undo_on_failure():
+    """in place update of best overlay is undone when failed on the way"""
+    from bc4py.database.builder import ChainBuilder
+    blocks = make_chain(4)
+    chain_builder = ChainBuilder(cache_limit=10, batch_size=2)
+    chain_builder.set_best_chain(list(reversed(blocks[:2])), connect=blocks[:2])
+    before = state(chain_builder.best_overlay)
+    broken = BrokenBlock(3, blocks[3].txs[0])
+    try:
+        chain_builder.set_best_chain([broken, blocks[2], blocks[0]],
+                                     disconnect=blocks[1:2],
+                                     connect=[blocks[2], broken])
+        assert False, 'broken block is connected'
+    except ValueError:
+        pass
+    assert state(chain_builder.best_overlay) == before
+    assert chain_builder.best_chain == list(reversed(blocks[:2]))
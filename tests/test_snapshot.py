@@ -0,0 +1,160 @@
+from bc4py.config import C, V
+from bc4py.chain.block import Block
+from bc4py.database import obj, view
+from bc4py.database.builder import Tables, ChainBuilder
+from bc4py.database.snapshot import SnapshotError, STATE_SNAPSHOT_IMPORTING, dump_snapshot, load_snapshot, \
+    verify_snapshot_file, is_importing
+from bc4py_extension import PyAddress
+from tempfile import TemporaryDirectory
+import asyncio
+import os
+
+V.BECH32_HRP = V.BECH32_HRP or 'test'
+
+
+def make_block(previous_hash, height):
+    block = Block.from_dict({
+        'previous_hash': previous_hash,
+        'merkleroot': os.urandom(32),
+        'time': height,
+        'bits': 0x1f0fffff,
+        'nonce': os.urandom(4),
+        'height': height,
+        'flag': C.BLOCK_GENESIS if height == 0 else C.BLOCK_X16S_POW,
+    })
+    block.work_hash = os.urandom(32)
+    return block
+
+
+def open_tables(home_dir):
+    V.DB_HOME_DIR = home_dir
+    os.makedirs(home_dir)
+    obj.tables = Tables()
+    return obj.tables
+
+
+async def write_chain(tables: Tables, blocks):
+    """all blocks are on database, one output per block"""
+    await tables.batch_create()
+    for block in blocks:
+        tables.write_block(block, account_tx=set())
+        address = PyAddress.from_binary(V.BECH32_HRP, b'\x00' + os.urandom(20))
+        tables.write_unused_index(block.hash, 0, address, 0, block.height + 1)
+    await tables.batch_commit()
+    chain_builder = obj.chain_builder = ChainBuilder()
+    chain_builder.root_block = chain_builder.best_block = blocks[-1]
+    chain_builder.set_best_chain(list())
+
+
+def release_views():
+    """snapshots of read views are closed before tables"""
+    if view.current_snapshots is not None:
+        view.current_snapshots.expire()
+        view.current_snapshots = None
+
+
+def dump_table(db):
+    return {bytes(k): bytes(v) for k, v in db.iterator()}
+
+
+def test_dump_and_load():
+    """imported database has same headers, recent bodies and UTXO set"""
+    loop = asyncio.get_event_loop()
+    genesis = make_block(b'\x00' * 32, 0)
+    blocks = [genesis]
+    for height in range(1, 7):
+        blocks.append(make_block(blocks[-1].hash, height))
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'snapshot.dat')
+        src = open_tables(os.path.join(tmp_dir, 'src'))
+        loop.run_until_complete(write_chain(src, blocks))
+        height, commitment = loop.run_until_complete(dump_snapshot(path, snapshot_blocks=3))
+        assert height == 6
+        assert verify_snapshot_file(path) == (6, blocks[-1].hash, commitment)
+        src_unused = dump_table(src._unused_index)
+        src_bodies = {block.hash: bytes(src.read_block_binary(block.hash)) for block in blocks}
+        release_views()
+        src.close()
+
+        dst = open_tables(os.path.join(tmp_dir, 'dst'))
+        assert load_snapshot(path, genesis.hash, commitment) == 6
+        assert [dst.read_block_hash(h) for h in range(7)] == [block.hash for block in blocks]
+        assert dump_table(dst._unused_index) == src_unused
+        # genesis and last 3 bodies only
+        for block in blocks:
+            b = dst.read_block_binary(block.hash)
+            if block.height in (0, 4, 5, 6):
+                assert bytes(b) == src_bodies[block.hash]
+            else:
+                assert b is None
+        assert dst.pruned_height == 4
+        # second import is refused
+        try:
+            load_snapshot(path, genesis.hash)
+            assert False, 'imported twice'
+        except SnapshotError:
+            pass
+        dst.close()
+
+
+def test_broken_file_is_refused():
+    loop = asyncio.get_event_loop()
+    genesis = make_block(b'\x00' * 32, 0)
+    blocks = [genesis, make_block(genesis.hash, 1)]
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'snapshot.dat')
+        src = open_tables(os.path.join(tmp_dir, 'src'))
+        loop.run_until_complete(write_chain(src, blocks))
+        _height, commitment = loop.run_until_complete(dump_snapshot(path))
+        release_views()
+        src.close()
+        with open(path, mode='rb') as fp:
+            data = bytearray(fp.read())
+        for broken in (data[:-10], data[:70] + bytes([data[70] ^ 0xff]) + data[71:]):
+            with open(path, mode='wb') as fp:
+                fp.write(broken)
+            try:
+                verify_snapshot_file(path)
+                assert False, 'broken file is verified'
+            except SnapshotError:
+                pass
+        # not expected commitment
+        with open(path, mode='wb') as fp:
+            fp.write(data)
+        dst = open_tables(os.path.join(tmp_dir, 'dst'))
+        try:
+            load_snapshot(path, genesis.hash, os.urandom(32))
+            assert False, 'other snapshot is imported'
+        except SnapshotError:
+            pass
+        assert len(dst.headers) == 0
+        dst.close()
+
+
+def test_interrupted_import_is_retried():
+    """partial data of crashed import is cleared by next import"""
+    loop = asyncio.get_event_loop()
+    genesis = make_block(b'\x00' * 32, 0)
+    blocks = [genesis]
+    for height in range(1, 3):
+        blocks.append(make_block(blocks[-1].hash, height))
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'snapshot.dat')
+        src = open_tables(os.path.join(tmp_dir, 'src'))
+        loop.run_until_complete(write_chain(src, blocks))
+        _height, commitment = loop.run_until_complete(dump_snapshot(path))
+        src_unused = dump_table(src._unused_index)
+        release_views()
+        src.close()
+
+        dst = open_tables(os.path.join(tmp_dir, 'dst'))
+        # crash after some chunks are written
+        dst.write_state(STATE_SNAPSHOT_IMPORTING, b'')
+        dst._unused_index.put(os.urandom(33), b'partial')
+        dst.headers.append(0, genesis.hash, genesis.work_hash, genesis.b, genesis.flag)
+        assert is_importing()
+        assert load_snapshot(path, genesis.hash, commitment) == 2
+        assert not is_importing()
+        assert dump_table(dst._unused_index) == src_unused
+        assert len(dst.headers) == 3
+        dst.close()
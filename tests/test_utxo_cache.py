@@ -0,0 +1,128 @@
+from bc4py.config import V
+from bc4py.database.utxo import UTXOCache, struct_unused_idx
+from bc4py_extension import PyAddress
+from tempfile import TemporaryDirectory
+import plyvel
+import os
+
+V.BECH32_HRP = V.BECH32_HRP or 'test'
+
+
+def make_output(amount):
+    return PyAddress.from_binary(V.BECH32_HRP, b'\x00' + os.urandom(20)), 0, amount
+
+
+def to_raw(output):
+    if output is None:
+        return None
+    address, coin_id, amount = output
+    return address.binary(), coin_id, amount
+
+
+def make_db(tmp_dir, outputs):
+    db = plyvel.DB(os.path.join(tmp_dir, 'unused'), create_if_missing=True)
+    for key, (address, coin_id, amount) in outputs.items():
+        db.put(key, struct_unused_idx.pack(address.binary(), coin_id, amount))
+    return db
+
+
+def test_clean_read_and_miss():
+    with TemporaryDirectory() as tmp_dir:
+        stored = {os.urandom(33): make_output(index + 1) for index in range(10)}
+        db = make_db(tmp_dir, stored)
+        cache = UTXOCache(db, max_memory=5 * 200)
+        unknown = os.urandom(33)
+        result = cache.get_many(list(stored) + [unknown])
+        assert {key: to_raw(output) for key, output in result.items() if key in stored} == \
+            {key: to_raw(output) for key, output in stored.items()}
+        assert result[unknown] is None
+        # LRU keeps max entries
+        assert len(cache.clean) == 5 and cache.evicted == 6
+        key = next(iter(cache.clean))
+        assert to_raw(cache.get(key)) == to_raw(stored.get(key)) and cache.hit == 1
+        db.close()
+
+
+def test_dirty_is_seen_by_batch_only():
+    with TemporaryDirectory() as tmp_dir:
+        key, spent_key = os.urandom(33), os.urandom(33)
+        spent_output = make_output(100)
+        db = make_db(tmp_dir, {spent_key: spent_output})
+        cache = UTXOCache(db)
+        output = make_output(10)
+        cache.put(key, output)
+        cache.delete(spent_key)
+        assert cache.get(key) is None
+        assert to_raw(cache.get(spent_key)) == to_raw(spent_output)
+        assert to_raw(cache.get(key, with_dirty=True)) == to_raw(output)
+        assert cache.get(spent_key, with_dirty=True) is None
+        db.close()
+
+
+def test_fresh_output_never_reach_database():
+    """created and used by same batch"""
+    with TemporaryDirectory() as tmp_dir:
+        db = make_db(tmp_dir, dict())
+        cache = UTXOCache(db)
+        key = os.urandom(33)
+        cache.put(key, make_output(10))
+        cache.delete(key)
+        assert len(cache.dirty) == 0
+        # restored output on database is not fresh, deletion is written
+        cache.put(key, make_output(10), fresh=False)
+        cache.delete(key)
+        assert cache.dirty[key] == (None, False)
+        db.close()
+
+
+def test_flush_and_commit():
+    with TemporaryDirectory() as tmp_dir:
+        spent_key = os.urandom(33)
+        db = make_db(tmp_dir, {spent_key: make_output(100)})
+        cache = UTXOCache(db)
+        key = os.urandom(33)
+        output = make_output(10)
+        cache.put(key, output)
+        cache.delete(spent_key)
+        batch = db.write_batch()
+        cache.flush(batch)
+        batch.write()
+        cache.commit()
+        assert len(cache.dirty) == 0 and cache.flushed == 2
+        assert to_raw(cache.get(key)) == to_raw(output)
+        assert cache.get(spent_key) is None
+        # database is same as cache
+        fresh_cache = UTXOCache(db)
+        assert to_raw(fresh_cache.get(key)) == to_raw(output)
+        assert fresh_cache.get(spent_key) is None
+        db.close()
+
+
+def test_rollback_after_failed_commit():
+    """write of batch is failed, cache and database keep the state before batch"""
+    with TemporaryDirectory() as tmp_dir:
+        spent_key = os.urandom(33)
+        spent_output = make_output(100)
+        db = make_db(tmp_dir, {spent_key: spent_output})
+        cache = UTXOCache(db)
+        assert to_raw(cache.get(spent_key)) == to_raw(spent_output)
+        key = os.urandom(33)
+        cache.put(key, make_output(10))
+        cache.delete(spent_key)
+        batch = db.write_batch()
+        cache.flush(batch)
+        # crash before `batch.write()`
+        batch.clear()
+        cache.rollback()
+        assert len(cache.dirty) == 0
+        assert cache.get(key, with_dirty=True) is None
+        assert to_raw(cache.get(spent_key, with_dirty=True)) == to_raw(spent_output)
+        assert db.get(key) is None and db.get(spent_key) is not None
+        # next batch works as usual
+        cache.delete(spent_key)
+        batch = db.write_batch()
+        cache.flush(batch)
+        batch.write()
+        cache.commit()
+        assert cache.get(spent_key) is None and db.get(spent_key) is None
+        db.close()